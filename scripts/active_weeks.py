@@ -0,0 +1,95 @@
+import numpy as np
+
+# Keys of a weekly entry that are not metrics
+WEEK_LABEL = 'week_end_date'
+
+
+def candidate_weeks(inputs, varying=(), start=0, n_weeks=None):
+    """Returns the range of week indices whose weekly entries have to be computed.
+
+    `inputs` are the cumulative per-week series an entity's weekly entries are
+    computed from; `varying` are series shared by every entity (e.g. working
+    days) that change the entries without being activity. Before the first
+    week with a non-zero input every entry is empty, and after the last week
+    in which any series changes every entry repeats the previous one, so only
+    the weeks in between (and from `start` on) can hold anything new.
+    """
+    stacked = np.vstack([np.asarray(series, dtype=float) for series in inputs])
+    n_weeks = stacked.shape[1] if n_weeks is None else n_weeks
+    active = np.flatnonzero((stacked[:, start:] != 0).any(axis=0))
+    if len(active) == 0:
+        return range(start, start)
+    first = start + int(active[0])
+    if varying:
+        stacked = np.vstack([stacked] + [np.asarray(series, dtype=float) for series in varying])
+    # Weeks (from `start` on) that differ from the week before
+    changed = np.flatnonzero((stacked[:, max(start, 1):] != stacked[:, max(start, 1) - 1:-1]).any(axis=0))
+    last = max(start, 1) + int(changed[-1]) if len(changed) else first
+    return range(first, min(max(first, last), n_weeks - 1) + 1)
+
+
+def is_empty_entry(entry):
+    """Whether every metric of a weekly entry is zero (or an empty list)."""
+    return all(
+        (value == [] if isinstance(value, list) else value == 0)
+        for key, value in entry.items() if key != WEEK_LABEL
+    )
+
+
+def _same_entry(entry, other):
+    return all(value == other.get(key) for key, value in entry.items() if key != WEEK_LABEL) \
+        and len(entry) == len(other)
+
+
+def trim_weekly_data(weekly_data):
+    """Cuts a contiguous run of weekly entries down to the entity's active range.
+
+    Leading empty entries and trailing entries that repeat the one before are
+    dropped. Returns (weekly_data, first_week, last_week) with the week labels
+    of the kept range, or ([], None, None) when every entry is empty.
+    """
+    first = 0
+    while first < len(weekly_data) and is_empty_entry(weekly_data[first]):
+        first += 1
+    if first == len(weekly_data):
+        return [], None, None
+    last = len(weekly_data) - 1
+    while last > first and _same_entry(weekly_data[last], weekly_data[last - 1]):
+        last -= 1
+    kept = weekly_data[first:last + 1]
+    return kept, kept[0][WEEK_LABEL], kept[-1][WEEK_LABEL]
+
+
+def entity_week_slice(entity, week_positions):
+    """Slice of the week axis an entity's weekly_data covers.
+
+    Dense entities cover the whole axis; active-range entities (with
+    first_week / last_week) cover those weeks only. `week_positions` maps week
+    labels to their index on the axis.
+    """
+    if 'first_week' not in entity:
+        return slice(0, None)
+    if entity['first_week'] is None:
+        return slice(0, 0)
+    return slice(week_positions[entity['first_week']], week_positions[entity['last_week']] + 1)
+
+
+def expand_weekly_data(entity, week_labels, n_weeks=None):
+    """Returns an entity's weekly entries on the full week grid `week_labels[:n_weeks]`.
+
+    Weeks before the active range are None (no activity: every metric is
+    zero); weeks after it repeat the last entry under their own label.
+    Dense entities are returned as they are.
+    """
+    weekly_data = entity['weekly_data']
+    if 'first_week' not in entity:
+        return weekly_data
+    n_weeks = len(week_labels) if n_weeks is None else n_weeks
+    if entity['first_week'] is None:
+        return [None] * n_weeks
+    first = week_labels.index(entity['first_week'])
+    expanded = [None] * first + list(weekly_data)
+    last_entry = weekly_data[-1]
+    for week_index in range(len(expanded), n_weeks):
+        expanded.append(dict(last_entry, **{WEEK_LABEL: week_labels[week_index]}))
+    return expanded[:n_weeks]
@@ -0,0 +1,275 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Default report location (kept out of git with the rest of .cache)
+BENCHMARK_REPORT_PATH = '../.cache/benchmarks/benchmark_report.json'
+REPORT_VERSION = 1
+
+# Input scales, sized for roughly 10k / 100k / 1M / 10M ticket rows
+# (each ticket has 1 to statuses_per_ticket rows, 3 on average)
+SCALES = {
+    'small': {'projects': 5, 'users': 50, 'tickets': 3400, 'statuses_per_ticket': 5, 'weeks': 52},
+    'medium': {'projects': 20, 'users': 300, 'tickets': 34000, 'statuses_per_ticket': 5, 'weeks': 52},
+    'large': {'projects': 60, 'users': 1000, 'tickets': 340000, 'statuses_per_ticket': 5, 'weeks': 104},
+    'xlarge': {'projects': 200, 'users': 3000, 'tickets': 3400000, 'statuses_per_ticket': 5, 'weeks': 104},
+}
+
+# A stage counts as regressed when it is this much slower than the baseline report
+DEFAULT_TOLERANCE = 1.25
+
+# Outputs hashed after every pipeline run; they must not depend on how (or
+# how fast) they were computed
+OUTPUT_FILES = (
+    'processed_data.json',
+    'processed_projects.json',
+    'processed_userKpis.json',
+    'processed_charts.json',
+    'processed_flow.json',
+)
+# Contribution is reported as of today by default; pinned so that output
+# digests can be compared with a baseline report from another day
+BENCHMARK_AS_OF = '2025-12-31'
+
+CSV_LOAD_CODE = (
+    "from csv_ingest import load_ticket_data, load_timesheet_data; "
+    "load_ticket_data('../src/data/kracker_data_2024_2025.csv'); "
+    "load_timesheet_data('../src/data/time_record_2024_2025.csv')"
+)
+
+
+def _peak_rss_bytes(usage):
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+def run_measured(args, cwd, log_path):
+    """Runs a command and returns its wall time, CPU time and peak RSS.
+
+    Every stage runs in its own process, so peak RSS is that stage's alone
+    and nothing is shared (or cached in memory) between stages.
+    """
+    with open(log_path, 'a') as log:
+        log.write(f"$ {' '.join(args)}\n")
+        log.flush()
+        start = time.perf_counter()
+        process = subprocess.Popen(args, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed with exit code {process.returncode}, see {log_path}")
+    return {
+        'wall_seconds': round(wall, 4),
+        'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 4),
+        'peak_rss_bytes': _peak_rss_bytes(usage),
+    }
+
+
+def output_digests(data_dir):
+    """Returns {file name: sha256} of the OUTPUT_FILES a pipeline run wrote to `data_dir`."""
+    digests = {}
+    for file_name in OUTPUT_FILES:
+        path = os.path.join(data_dir, file_name)
+        if not os.path.exists(path):
+            continue
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        digests[file_name] = digest.hexdigest()
+    return digests
+
+
+def benchmark_scale(name, params, seed, workspace, pipeline_args=()):
+    """Generates inputs at one scale and times every stage on them.
+
+    The outputs of every pipeline run are hashed into the stage's 'outputs';
+    the cold run's are also the scale's 'outputs'.
+    """
+    data_dir = os.path.join(workspace, 'src', 'data')
+    work_dir = os.path.join(workspace, 'scripts')
+    os.makedirs(work_dir, exist_ok=True)
+    log_path = os.path.join(workspace, 'benchmark.log')
+    python = sys.executable
+    process_data = os.path.join(SCRIPTS_DIR, 'process_data.py')
+    pipeline_args = ['--as-of', BENCHMARK_AS_OF, *pipeline_args]
+
+    print(f"[{name}] generating inputs: {params}")
+    stages = {}
+    generate_args = [python, os.path.join(SCRIPTS_DIR, 'generate_scale_data.py'), data_dir, '--seed', str(seed)]
+    for key, value in params.items():
+        generate_args += [f"--{key.replace('_', '-')}", str(value)]
+    stages['generate'] = run_measured(generate_args, work_dir, log_path)
+
+    # process_data.py resolves its inputs relative to the working directory
+    # (../src/data) and imports its modules from its own directory
+    stages['csv_load'] = run_measured(
+        [python, '-c', f"import sys; sys.path.insert(0, {SCRIPTS_DIR!r}); {CSV_LOAD_CODE}"], work_dir, log_path
+    )
+    stages['pipeline_cold'] = run_measured([python, process_data, '--no-cache', *pipeline_args], work_dir, log_path)
+    stages['pipeline_cold']['outputs'] = output_digests(data_dir)
+    stages['pipeline_cache_fill'] = run_measured([python, process_data, *pipeline_args], work_dir, log_path)
+    stages['pipeline_cache_fill']['outputs'] = output_digests(data_dir)
+    stages['pipeline_cached'] = run_measured([python, process_data, *pipeline_args], work_dir, log_path)
+    stages['pipeline_cached']['outputs'] = output_digests(data_dir)
+    # Per-stage breakdown from process_data's own instrumentation; run on its
+    # own since tracing memory slows the pipeline down
+    profile_path = os.path.join(workspace, 'profile.json')
+    stages['pipeline_profiled'] = run_measured(
+        [python, process_data, '--no-cache', '--profile', profile_path, *pipeline_args], work_dir, log_path
+    )
+    stages['pipeline_profiled']['outputs'] = output_digests(data_dir)
+    with open(profile_path, 'r') as f:
+        profile = json.load(f)
+    stages['pipeline_profiled']['profile'] = {'stages': profile['stages'], 'counters': profile['counters']}
+
+    rows = {}
+    for key, file_name in (('tickets', 'kracker_data_2024_2025.csv'), ('timesheet', 'time_record_2024_2025.csv')):
+        with open(os.path.join(data_dir, file_name), 'rb') as f:
+            rows[key] = sum(1 for _ in f) - 1
+    for stage, result in stages.items():
+        print(f"[{name}] {stage:<20} {result['wall_seconds']:>9.2f}s wall "
+              f"{result['cpu_seconds']:>9.2f}s cpu {result['peak_rss_bytes'] / 1024 ** 2:>9.1f} MiB peak")
+    for stage, result in profile['stages'].items():
+        print(f"[{name}]   {stage:<24} {result['wall_seconds']:>9.2f}s wall")
+    return {
+        'name': name, 'params': params, 'seed': seed, 'rows': rows,
+        'outputs': stages['pipeline_cold']['outputs'], 'stages': stages,
+    }
+
+
+def compare_reports(report, baseline, tolerance):
+    """Returns a list of (scale, stage, baseline wall, new wall) for every regressed stage."""
+    baseline_scales = {scale['name']: scale for scale in baseline.get('scales', [])}
+    regressions = []
+    for scale in report['scales']:
+        previous = baseline_scales.get(scale['name'])
+        if previous is None or previous['params'] != scale['params']:
+            continue
+        for stage, result in scale['stages'].items():
+            before = previous['stages'].get(stage)
+            if before and result['wall_seconds'] > before['wall_seconds'] * tolerance:
+                regressions.append((scale['name'], stage, before['wall_seconds'], result['wall_seconds']))
+            # Stages inside process_data, from its --profile report
+            before_profile = (before or {}).get('profile', {}).get('stages', {})
+            for name, inner in result.get('profile', {}).get('stages', {}).items():
+                inner_before = before_profile.get(name)
+                if inner_before and inner['wall_seconds'] > inner_before['wall_seconds'] * tolerance:
+                    regressions.append((scale['name'], f"{stage}/{name}", inner_before['wall_seconds'],
+                                        inner['wall_seconds']))
+    return regressions
+
+
+def compare_outputs(report, baseline=None):
+    """Returns a list of (scale, stage, file name, reference) for every output that differs.
+
+    Every pipeline run of a scale must write the same outputs as its cold run
+    (reference 'pipeline_cold'), and the cold run the same as the baseline
+    report's for the same parameters and seed (reference 'baseline').
+    Baselines without output digests are skipped.
+    """
+    baseline_scales = {scale['name']: scale for scale in (baseline or {}).get('scales', [])}
+    mismatches = []
+    for scale in report['scales']:
+        expected = scale['outputs']
+        for stage, result in scale['stages'].items():
+            for file_name, digest in result.get('outputs', {}).items():
+                if expected.get(file_name) != digest:
+                    mismatches.append((scale['name'], stage, file_name, 'pipeline_cold'))
+        previous = baseline_scales.get(scale['name'])
+        if previous is None or previous['params'] != scale['params'] or previous.get('seed') != scale['seed']:
+            continue
+        for file_name, digest in previous.get('outputs', {}).items():
+            if expected.get(file_name) != digest:
+                mismatches.append((scale['name'], 'pipeline_cold', file_name, 'baseline'))
+    return mismatches
+
+
+def run_benchmarks(scale_names, seed=0, report_path=BENCHMARK_REPORT_PATH, pipeline_args=(), keep=False,
+                   custom_params=None):
+    """Runs the benchmark at every named scale and writes a JSON report."""
+    report = {
+        'version': REPORT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pipeline_args': list(pipeline_args),
+        'scales': [],
+    }
+    runs = [(name, SCALES[name]) for name in scale_names]
+    if custom_params:
+        runs.append(('custom', custom_params))
+
+    for name, params in runs:
+        workspace = tempfile.mkdtemp(prefix=f'kpi-benchmark-{name}-')
+        try:
+            report['scales'].append(benchmark_scale(name, params, seed, workspace, pipeline_args))
+        finally:
+            if keep:
+                print(f"[{name}] workspace kept in {workspace}")
+            else:
+                shutil.rmtree(workspace, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Benchmark report saved to {report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark process_data.py on seeded synthetic inputs.")
+    parser.add_argument('--scale', default='small',
+                        help=f"Comma separated scales to run ({', '.join(SCALES)}), or 'none' with --tickets")
+    parser.add_argument('--projects', type=int, help="Run an extra 'custom' scale with these parameters")
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--tickets', type=int)
+    parser.add_argument('--statuses-per-ticket', type=int)
+    parser.add_argument('--weeks', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help="Passed on to process_data.py")
+    parser.add_argument('--report', default=BENCHMARK_REPORT_PATH, help="Where to write the JSON report")
+    parser.add_argument('--baseline',
+                        help="Earlier report to compare against; exits with 1 on regressions or when an output "
+                             "differs from the baseline's (regenerate it after an intended output change)")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Slowdown factor over the baseline that counts as a regression")
+    parser.add_argument('--keep', action='store_true', help="Keep the generated workspaces")
+    args = parser.parse_args()
+
+    scale_names = [] if args.scale == 'none' else [name.strip() for name in args.scale.split(',')]
+    unknown = [name for name in scale_names if name not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+
+    custom = {key: getattr(args, key) for key in SCALES['small'] if getattr(args, key) is not None}
+    custom_params = dict(SCALES['small'], **custom) if custom else None
+    pipeline_args = ['--workers', str(args.workers)] if args.workers else []
+
+    report = run_benchmarks(scale_names, args.seed, args.report, pipeline_args, args.keep, custom_params)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    mismatches = compare_outputs(report, baseline)
+    for scale, stage, file_name, reference in mismatches:
+        print(f"Output mismatch: {scale}/{stage} wrote a different {file_name} than {reference}")
+    regressions = compare_reports(report, baseline, args.tolerance) if baseline else []
+    for scale, stage, before, after in regressions:
+        print(f"Regression: {scale}/{stage} took {after:.2f}s, baseline {before:.2f}s")
+    if mismatches or regressions:
+        sys.exit(1)
+    print("Outputs identical across runs" + (" and to the baseline, no regressions" if baseline else ""))
@@ -0,0 +1,115 @@
+import hashlib
+import json
+from datetime import datetime
+
+from output_writer import write_json_atomic
+
+MANIFEST_VERSION = 1
+SECTIONS = ('projects', 'users')
+
+
+def entity_hash(*values):
+    """Content hash of JSON values that does not depend on key order or output layout."""
+    digest = hashlib.blake2b(digest_size=16)
+    for value in values:
+        digest.update(json.dumps(value, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    """Returns the change manifest of the previous run, or None."""
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+class ChangeTracker:
+    """Hashes every project and user of a run and diffs them against the previous run.
+
+    An entity's hash covers its processed_data entry and its summary entry
+    (processed_projects / processed_userKpis), so it changes whenever anything
+    a consumer could read about it changes. The manifest written by `write()`
+    lists the added, changed and removed ids per section and the hashes of
+    this run, which are what the next run compares against.
+
+    With `keep_changed`, added and changed entities are also kept in memory
+    (only those, unchanged ones are dropped after hashing) for the patch file.
+    """
+
+    def __init__(self, manifest_path, keep_changed=False):
+        self.manifest_path = manifest_path
+        self.keep_changed = keep_changed
+        self.previous = load_manifest(manifest_path)
+        self.previous_hashes = self.previous['hashes'] if self.previous else {section: {} for section in SECTIONS}
+        self.hashes = {section: {} for section in SECTIONS}
+        self.changed_entities = {section: [] for section in SECTIONS}
+
+    def add(self, section, entity_id, data, summary):
+        entity_digest = entity_hash(data, summary)
+        # Keyed as the manifest reads back from JSON, so a numeric id (say a
+        # project id from projects_admin.json) matches the previous run's
+        key = str(entity_id)
+        self.hashes[section][key] = entity_digest
+        if self.keep_changed and self.previous_hashes[section].get(key) != entity_digest:
+            self.changed_entities[section].append({'id': entity_id, 'data': data, 'summary': summary})
+
+    def changes(self):
+        changes = {}
+        for section in SECTIONS:
+            current, previous = self.hashes[section], self.previous_hashes.get(section, {})
+            changes[section] = {
+                'added': [entity_id for entity_id in current if entity_id not in previous],
+                'changed': [entity_id for entity_id, digest in current.items()
+                            if entity_id in previous and previous[entity_id] != digest],
+                'removed': [entity_id for entity_id in previous if entity_id not in current],
+            }
+        return changes
+
+    def run_id(self):
+        """Hash of every entity hash in output order, i.e. of the whole run's content."""
+        return entity_hash({section: list(self.hashes[section].items()) for section in SECTIONS})
+
+    def write(self, layout, patch_path=None):
+        """Writes the change manifest (and the patch file) unless nothing changed since the last run.
+
+        `layout` describes how processed_data was written; a layout change
+        alone also counts as a change, since consumers must re-read the files.
+        Returns the manifest.
+        """
+        run_id = self.run_id()
+        if self.previous and self.previous['run'] == run_id and self.previous['layout'] == layout:
+            print(f"No project or user changed since the last run, {self.manifest_path} left as is")
+            return self.previous
+
+        changes = self.changes()
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'run': run_id,
+            'base': self.previous['run'] if self.previous else None,
+            'layout': layout,
+            'changes': changes,
+            'hashes': self.hashes,
+        }
+        if patch_path is not None:
+            patch = {'version': MANIFEST_VERSION, 'run': run_id, 'base': manifest['base']}
+            for section in SECTIONS:
+                patch[section] = self.changed_entities[section]
+            patch['removed'] = {section: changes[section]['removed'] for section in SECTIONS}
+            write_json_atomic(patch_path, patch, indent=4)
+        # The manifest goes last: once it names a run, that run's patch is in place
+        write_json_atomic(self.manifest_path, manifest, indent=4)
+
+        summary = ', '.join(
+            f"{section}: {len(changes[section]['added'])} added, {len(changes[section]['changed'])} changed, "
+            f"{len(changes[section]['removed'])} removed"
+            for section in SECTIONS
+        )
+        print(f"Changes since the last run - {summary}")
+        return manifest
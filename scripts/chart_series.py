@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+from active_weeks import WEEK_LABEL, expand_weekly_data
+from output_writer import columnar_weekly_data
+
+# Resolutions of the pre-aggregated chart series
+ROLLUP_RESOLUTIONS = ('weekly', 'monthly', 'quarterly')
+# pandas period frequency of each coarser resolution
+_PERIOD_FREQUENCIES = {'monthly': 'M', 'quarterly': 'Q'}
+
+
+def period_end_weeks(week_labels, resolution):
+    """Returns (period labels, week indices) of the last week of every period.
+
+    All the weekly series are cumulative, so a period's value is the value of
+    its last week. The last period may still be running; it then ends at the
+    last week of the grid.
+    """
+    if resolution == 'weekly':
+        return list(week_labels), list(range(len(week_labels)))
+    periods = pd.PeriodIndex(pd.to_datetime(week_labels), freq=_PERIOD_FREQUENCIES[resolution])
+    # A week closes its period when the next week falls in another one
+    ends = np.flatnonzero(np.append(periods[1:] != periods[:-1], True)) if len(periods) else np.empty(0, dtype=int)
+    return [str(periods[i]) for i in ends], ends.tolist()
+
+
+def lttb(x, series, n_out):
+    """Largest-Triangle-Three-Buckets downsampling; returns the indices of the kept points.
+
+    `series` is a list of y arrays sharing the `x` axis. Each one is scaled to
+    its own range and the triangle areas are summed over them, so the kept
+    points follow the shape of every series of the chart at once. The first
+    and last points are always kept.
+    """
+    n = len(x)
+    if n <= n_out:
+        return list(range(n))
+    if n_out < 3:
+        raise ValueError(f"LTTB needs at least 3 output points, got {n_out}")
+    x = np.asarray(x, dtype=float)
+    ys = []
+    for y in series:
+        y = np.asarray(y, dtype=float)
+        span = np.ptp(y) if len(y) else 0.0
+        ys.append(y / span if span > 0 else y * 0.0)
+    ys = np.vstack(ys) if ys else np.zeros((1, n))
+
+    # Inner points split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    kept = [0]
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # The next bucket's average (the last point for the final bucket)
+        next_start, next_end = (edges[bucket + 1], edges[bucket + 2]) if bucket + 2 < len(edges) else (n - 1, n)
+        next_x = x[next_start:next_end].mean()
+        next_y = ys[:, next_start:next_end].mean(axis=1)
+        a = kept[-1]
+        areas = np.abs(
+            (x[a] - next_x) * (ys[:, start:end] - ys[:, [a]])
+            - (x[a] - x[start:end]) * (next_y[:, None] - ys[:, [a]])
+        ).sum(axis=0)
+        kept.append(start + int(np.argmax(areas)))
+    kept.append(n - 1)
+    return kept
+
+
+def _filled_entries(entity, week_labels):
+    """An entity's weekly entries on the whole grid, with zero entries before its active range."""
+    weekly_data = expand_weekly_data(entity, week_labels)
+    template = next((entry for entry in weekly_data if entry is not None), None)
+    if template is None:
+        return []
+    empty = {key: ([] if isinstance(value, list) else 0) for key, value in template.items()}
+    return [
+        entry if entry is not None else dict(empty, **{WEEK_LABEL: week_labels[week_index]})
+        for week_index, entry in enumerate(weekly_data)
+    ]
+
+
+def _chart_columns(entries, labels):
+    columns = {WEEK_LABEL: [entry[WEEK_LABEL] for entry in entries]}
+    if labels is not None:
+        columns['period'] = labels
+    columns.update(columnar_weekly_data(entries))
+    return columns
+
+
+class ChartSeriesBuilder:
+    """Builds the chart series of every project next to its weekly snapshots.
+
+    The period boundaries are worked out once for the whole week grid. Each
+    project then gets its weekly series plus monthly and quarterly rollups
+    (the value at the end of each period, since the series are cumulative)
+    and, with `max_points`, a series downsampled with LTTB to at most that
+    many points, so chart payloads stop growing with the project's history.
+    Series are columnar: one array per metric and per department.
+    """
+
+    def __init__(self, week_labels, max_points=None, downsample_metrics=('completion_rate', 'cumulative_actual_mandays')):
+        self.week_labels = list(week_labels)
+        self.max_points = max_points
+        self.downsample_metrics = downsample_metrics
+        self.periods = {
+            resolution: period_end_weeks(self.week_labels, resolution) for resolution in ROLLUP_RESOLUTIONS
+        }
+        self.projects = []
+
+    def add_project(self, project_data):
+        entries = _filled_entries(project_data, self.week_labels)
+        chart = {'project_id': project_data['project_id'], 'project_name': project_data['project_name']}
+        for resolution in ROLLUP_RESOLUTIONS:
+            labels, week_indices = self.periods[resolution]
+            if not entries:
+                labels, week_indices = [], []
+            selected = [entries[week_index] for week_index in week_indices]
+            chart[resolution] = _chart_columns(selected, None if resolution == 'weekly' else labels)
+        if self.max_points is not None:
+            kept = lttb(
+                np.arange(len(entries)),
+                [[entry.get(metric, 0) for entry in entries] for metric in self.downsample_metrics],
+                self.max_points
+            ) if entries else []
+            chart['downsampled'] = _chart_columns([entries[week_index] for week_index in kept], None)
+        self.projects.append(chart)
+
+    def document(self):
+        return {
+            'resolutions': list(ROLLUP_RESOLUTIONS),
+            'max_points': self.max_points,
+            'projects': self.projects,
+        }
@@ -0,0 +1,127 @@
+import csv
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    FAST_ENGINE = 'pyarrow'
+except ImportError:
+    FAST_ENGINE = None
+
+# Bytes read from the top of a file to detect its delimiter
+SNIFF_SAMPLE_SIZE = 64 * 1024
+CANDIDATE_DELIMITERS = ',;\t|'
+
+# Columns the KPIs need from the ticket export, by type. Everything else
+# (ticket_name, shader_variation(if any), ...) is never parsed.
+TICKET_CATEGORY_COLUMNS = ['project_name', 'assignee', 'current_status']
+TICKET_DATE_COLUMNS = ['create_date', 'start_date', 'due_date', 'current_status_changed_date']
+TICKET_COLUMNS = ['ticket_id'] + TICKET_CATEGORY_COLUMNS + TICKET_DATE_COLUMNS
+
+# Columns the KPIs need from the timesheet export (Cost_contributions,
+# MONTH_YEAR, ... are skipped)
+TIMESHEET_CATEGORY_COLUMNS = ['USERNAME', 'PROJECT', 'Department']
+TIMESHEET_DATE_COLUMNS = ['DATE']
+TIMESHEET_NUMERIC_COLUMNS = ['HOURS']
+TIMESHEET_COLUMNS = TIMESHEET_CATEGORY_COLUMNS + TIMESHEET_DATE_COLUMNS + TIMESHEET_NUMERIC_COLUMNS
+
+
+def sniff_delimiter(path, sample_size=SNIFF_SAMPLE_SIZE):
+    """Detects the delimiter of a CSV export from a small sample of its first lines."""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        sample = f.read(sample_size)
+    # Only keep complete lines so a cut-off last line does not confuse the sniffer
+    if len(sample) == sample_size and '\n' in sample:
+        sample = sample[:sample.rindex('\n')]
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=CANDIDATE_DELIMITERS).delimiter
+    except csv.Error:
+        header = sample.split('\n', 1)[0]
+        return max(CANDIDATE_DELIMITERS, key=header.count)
+
+
+def read_header(path, delimiter):
+    """Returns the column names of a CSV export."""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f, delimiter=delimiter), [])
+
+
+def _decode(column, convert):
+    """Converts a dictionary-encoded column by converting each distinct value once.
+
+    Exports repeat the same dates and hours over and over, so this is far
+    cheaper than converting every row. The value of the first non-empty row
+    is converted first, so that format inference sees the same first value as
+    a row-by-row conversion would.
+    """
+    codes = column.cat.codes.to_numpy()
+    present = codes >= 0
+    if not present.any():
+        return convert(column.astype('object'))
+    categories = column.cat.categories
+    first = codes[np.argmax(present)]
+    values = pd.Index(convert(categories[[first]].append(categories)))[1:]
+    # Empty cells have code -1; they come out as NaT / NaN as in a row-by-row conversion
+    decoded = pd.Series(values.take(np.where(present, codes, 0)), index=column.index, name=column.name)
+    return decoded if present.all() else decoded.where(present)
+
+
+def read_export(path, columns, category_columns=(), date_columns=(), numeric_columns=()):
+    """Reads the wanted columns of a CSV export in a single typed pass.
+
+    Columns missing from the file are simply left out, so callers can warn
+    about them. Category columns are read as `category`, date columns are
+    parsed with errors coerced to NaT and numeric columns coerced to numbers
+    (unparseable values become 0).
+    """
+    delimiter = sniff_delimiter(path)
+    header = read_header(path, delimiter)
+    usecols = [col for col in header if col in columns]
+    # Dates and numbers are read dictionary-encoded as well and converted
+    # below, one distinct value at a time, so that bad values become NaT / 0
+    # instead of failing the whole parse
+    dtype = {col: 'category' for col in usecols if col != 'ticket_id'}
+
+    read_options = {
+        'sep': delimiter,
+        'usecols': usecols,
+        'dtype': dtype,
+        'encoding': 'utf-8-sig',
+    }
+    df = None
+    if FAST_ENGINE is not None:
+        try:
+            df = pd.read_csv(path, engine=FAST_ENGINE, **read_options)
+        except (ValueError, pyarrow.lib.ArrowException) as e:
+            print(f"Warning: {FAST_ENGINE} parser failed on {path}, using the default parser - {e}")
+    if df is None:
+        df = pd.read_csv(path, on_bad_lines='warn', **read_options)
+
+    for col in usecols:
+        if col in date_columns:
+            df[col] = _decode(df[col], lambda values: pd.to_datetime(values, errors='coerce'))
+        elif col in numeric_columns:
+            df[col] = _decode(df[col], lambda values: pd.to_numeric(values.astype('object'), errors='coerce')).fillna(0)
+        elif col not in category_columns and col != 'ticket_id':
+            df[col] = df[col].astype('object')
+    return df
+
+
+def load_ticket_data(path):
+    """Loads the ticket export with only the columns used by the KPIs."""
+    return read_export(
+        path, TICKET_COLUMNS,
+        category_columns=TICKET_CATEGORY_COLUMNS,
+        date_columns=TICKET_DATE_COLUMNS,
+    )
+
+
+def load_timesheet_data(path):
+    """Loads the timesheet export with only the columns used by the KPIs."""
+    return read_export(
+        path, TIMESHEET_COLUMNS,
+        category_columns=TIMESHEET_CATEGORY_COLUMNS,
+        date_columns=TIMESHEET_DATE_COLUMNS,
+        numeric_columns=TIMESHEET_NUMERIC_COLUMNS,
+    )
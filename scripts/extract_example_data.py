@@ -1,122 +1,178 @@
-import json
+import argparse
+import heapq
 import os
 import random
 
+from output_writer import iter_processed_entities, write_json_atomic
+
 # Define file paths - adjust to use absolute paths or correct relative paths
 SOURCE_FILE = 'src/data/processed_data.json'  # Remove the leading './'
+SOURCE_SHARD_DIR = 'src/data/processed'
 OUTPUT_FILE = 'src/data/processed_data_example.json'
 
-def extract_example_data():
+EXAMPLE_PROJECTS = 1
+EXAMPLE_USERS = 10
+
+
+class TopK:
+    """Keeps the `k` items with the highest score seen so far, in a heap of at most `k` entries.
+
+    Ties go to the item seen first, so the result matches a stable sort of
+    all items by descending score.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.heap = []
+
+    def add(self, score, index, item):
+        entry = (score, -index, item)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif self.k and entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+
+    def items(self):
+        return [item for _, _, item in sorted(self.heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+class Reservoir:
+    """Uniform sample of `k` of the items seen so far (reservoir sampling), in the order they were seen."""
+
+    def __init__(self, k, seed=None):
+        self.k = k
+        self.rng = random.Random(seed)
+        self.sample = []
+        self.seen = 0
+
+    def add(self, score, index, item):
+        if len(self.sample) < self.k:
+            self.sample.append((index, item))
+        else:
+            slot = self.rng.randrange(self.seen + 1)
+            if slot < self.k:
+                self.sample[slot] = (index, item)
+        self.seen += 1
+
+    def items(self):
+        return [item for _, item in sorted(self.sample, key=lambda entry: entry[0])]
+
+
+def _project_score(project):
+    # Number of weekly_data entries with non-empty department_mandays
+    return sum(1 for w in project.get("weekly_data", [])
+               if w.get("department_mandays") and len(w.get("department_mandays", [])) > 0)
+
+
+def _user_score(user):
+    # Number of weekly_data entries
+    return len(user.get("weekly_data", []))
+
+
+def _find_source(path):
+    """Returns `path`, or the same path in the parent directory when run from scripts/."""
+    if os.path.exists(path):
+        return path
+    print(f"File not found at {path}")
+    parent_path = os.path.join('..', path)
+    if os.path.exists(parent_path):
+        print(f"File found at {parent_path}")
+        return parent_path
+    print(f"File not found at {parent_path} either")
+    # List files in the data directory to help locate the file
+    for data_dir in ('src/data', '../src/data'):
+        if os.path.exists(data_dir):
+            print(f"Files in {data_dir}:")
+            for file in os.listdir(data_dir):
+                print(f"  - {file}")
+            break
+    else:
+        print("Directory src/data does not exist")
+    return path
+
+
+def extract_example_data(sharded=False, sample=False, seed=None, n_projects=EXAMPLE_PROJECTS,
+                         n_users=EXAMPLE_USERS):
     """
-    Extracts a subset of data from the existing processed_data.json file
+    Extracts a subset of data from the existing processed_data output
     to create a smaller example file with 1 project and 10 users.
+
+    The output (single file or, with `sharded`, the shard directory; pretty or
+    compact) is read one entity at a time, and only the current candidates
+    are kept, so memory stays flat however large the output is. By default
+    the projects with the most weeks of department mandays and the users with
+    the most weeks are picked; with `sample`, a seeded uniform sample of the
+    entities with weekly data is taken instead.
     """
-    # Declare global variables at the beginning of the function
-    global SOURCE_FILE
-    
+    print(f"Current working directory: {os.getcwd()}")
+    if sharded:
+        source = os.path.dirname(_find_source(os.path.join(SOURCE_SHARD_DIR, 'index.json')))
+        data_path, shard_dir = None, source
+    else:
+        source = _find_source(SOURCE_FILE)
+        data_path, shard_dir = source, None
+    print(f"Reading source data from: {os.path.abspath(source)}")
+
+    if sample:
+        selectors = {'projects': Reservoir(n_projects, seed), 'users': Reservoir(n_users, seed)}
+    else:
+        selectors = {'projects': TopK(n_projects), 'users': TopK(n_users)}
+    scores = {'projects': _project_score, 'users': _user_score}
+    # Fallback when no entity has weekly data: the first ones in the file
+    first = {'projects': [], 'users': []}
+    limits = {'projects': n_projects, 'users': n_users}
+    counts = {'projects': 0, 'users': 0}
+
     try:
-        # Check if the file exists and print the current working directory for debugging
-        print(f"Current working directory: {os.getcwd()}")
-        print(f"Checking if source file exists at: {os.path.abspath(SOURCE_FILE)}")
-        
-        if not os.path.exists(SOURCE_FILE):
-            print(f"File not found at {SOURCE_FILE}")
-            # Try to find the file in parent directory
-            parent_source = os.path.join('..', SOURCE_FILE)
-            if os.path.exists(parent_source):
-                print(f"File found at {parent_source}")
-                SOURCE_FILE = parent_source
-            else:
-                print(f"File not found at {parent_source} either")
-                # List files in the data directory to help locate the file
-                data_dir = 'src/data'
-                if os.path.exists(data_dir):
-                    print(f"Files in {data_dir}:")
-                    for file in os.listdir(data_dir):
-                        print(f"  - {file}")
-                else:
-                    print(f"Directory {data_dir} does not exist")
-                    # Try parent data directory
-                    parent_data_dir = '../src/data'
-                    if os.path.exists(parent_data_dir):
-                        print(f"Files in {parent_data_dir}:")
-                        for file in os.listdir(parent_data_dir):
-                            print(f"  - {file}")
-        
-        # Read the source data
-        with open(SOURCE_FILE, 'r') as f:
-            source_data = json.load(f)
-        
-        print(f"Successfully loaded source data from {SOURCE_FILE}")
-        
-        # Create the example data structure
-        example_data = {
-            "projects": [],
-            "users": []
-        }
-        
-        # Extract one project (preferably one with good data)
-        if source_data.get("projects"):
-            # Find projects with non-empty weekly_data
-            valid_projects = [p for p in source_data["projects"] 
-                             if p.get("weekly_data") and len(p.get("weekly_data", [])) > 0]
-            
-            if valid_projects:
-                # Sort by amount of data (number of weekly_data entries with non-empty department_mandays)
-                valid_projects.sort(
-                    key=lambda p: sum(1 for w in p.get("weekly_data", []) 
-                                     if w.get("department_mandays") and len(w.get("department_mandays", [])) > 0),
-                    reverse=True
-                )
-                # Take the project with the most data
-                selected_project = valid_projects[0]
-                example_data["projects"].append(selected_project)
-                print(f"Selected project: {selected_project.get('project_name')}")
-            else:
-                print("No valid projects found with weekly data. Using the first project.")
-                example_data["projects"].append(source_data["projects"][0])
-        else:
-            print("No projects found in source data.")
-        
-        # Extract 10 users (or all if less than 10)
-        if source_data.get("users"):
-            # Find users with non-empty weekly_data
-            valid_users = [u for u in source_data["users"] 
-                          if u.get("weekly_data") and len(u.get("weekly_data", [])) > 0]
-            
-            if valid_users:
-                # Sort by amount of data (number of weekly_data entries)
-                valid_users.sort(
-                    key=lambda u: len(u.get("weekly_data", [])),
-                    reverse=True
-                )
-                # Take up to 10 users with the most data
-                selected_users = valid_users[:min(10, len(valid_users))]
-                example_data["users"] = selected_users
-                print(f"Selected {len(selected_users)} users")
-            else:
-                print("No valid users found with weekly data. Using the first 10 users.")
-                example_data["users"] = source_data["users"][:min(10, len(source_data["users"]))]
-        else:
-            print("No users found in source data.")
-        
-        # Make sure the output directory exists
-        os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-        
-        # Write to the output file
-        with open(OUTPUT_FILE, 'w') as f:
-            json.dump(example_data, f, indent=4)
-        
-        print(f"Example data extracted and saved to {OUTPUT_FILE}")
-        print(f"Contains {len(example_data['projects'])} project and {len(example_data['users'])} users")
-        
+        for section, entity in iter_processed_entities(data_path, shard_dir):
+            if len(first[section]) < limits[section]:
+                first[section].append(entity)
+            # Only entities with non-empty weekly_data are candidates
+            if entity.get("weekly_data"):
+                selectors[section].add(scores[section](entity), counts[section], entity)
+            counts[section] += 1
     except FileNotFoundError:
-        print(f"Error: Source file not found at {SOURCE_FILE}")
-    except json.JSONDecodeError:
-        print(f"Error: Source file is not valid JSON")
+        print(f"Error: Source file not found at {source}")
+        return
+    except ValueError as e:
+        print(f"Error: Source file is not valid JSON - {e}")
+        return
     except Exception as e:
         print(f"Unexpected error: {e}")
+        return
 
-if __name__ == "__main__":
-    extract_example_data()
+    print(f"Successfully read {counts['projects']} projects and {counts['users']} users from {source}")
+
+    example_data = {"projects": [], "users": []}
+    for section in ('projects', 'users'):
+        if not counts[section]:
+            print(f"No {section} found in source data.")
+            continue
+        selected = selectors[section].items()
+        if not selected:
+            print(f"No valid {section} found with weekly data. Using the first {limits[section]}.")
+            selected = first[section]
+        example_data[section] = selected
+
+    if example_data["projects"]:
+        print(f"Selected project: {', '.join(str(p.get('project_name')) for p in example_data['projects'])}")
+    print(f"Selected {len(example_data['users'])} users")
 
+    # Make sure the output directory exists
+    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
+    write_json_atomic(OUTPUT_FILE, example_data, indent=4)
+
+    print(f"Example data extracted and saved to {OUTPUT_FILE}")
+    print(f"Contains {len(example_data['projects'])} project and {len(example_data['users'])} users")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract a small example of processed_data for development.")
+    parser.add_argument('--sharded', action='store_true', help=f"Read the sharded output in {SOURCE_SHARD_DIR}")
+    parser.add_argument('--sample', action='store_true',
+                        help="Pick a seeded random sample instead of the entities with the most data")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for --sample")
+    parser.add_argument('--projects', type=int, default=EXAMPLE_PROJECTS)
+    parser.add_argument('--users', type=int, default=EXAMPLE_USERS)
+    args = parser.parse_args()
+    extract_example_data(args.sharded, args.sample, args.seed, args.projects, args.users)
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Bump when the on-disk layout or the loaders' output changes
+CACHE_VERSION = 1
+# Default upper bound for the whole cache directory
+DEFAULT_MAX_CACHE_BYTES = 2 * 1024 ** 3
+
+HASH_CHUNK_SIZE = 1024 * 1024
+INDEX_FILE = 'index.json'
+META_FILE = 'meta.json'
+
+
+def file_content_hash(path):
+    """Returns the blake2b hash of a file's content."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _save_index(cache_dir, index):
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(cache_dir, INDEX_FILE))
+
+
+def _source_hash(cache_dir, source_path):
+    """Returns the content hash of a source file.
+
+    The hash is remembered per (path, size, mtime), so unchanged files are not
+    re-read; a touched file with identical content still maps to the same entry.
+    """
+    stat = os.stat(source_path)
+    index = _load_index(cache_dir)
+    key = os.path.abspath(source_path)
+    known = index.get(key)
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        return known['hash']
+
+    content_hash = file_content_hash(source_path)
+    index[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': content_hash}
+    _save_index(cache_dir, index)
+    return content_hash
+
+
+def _entry_name(loader, content_hash):
+    loader_key = f"{loader.__module__}.{loader.__name__}:{CACHE_VERSION}"
+    loader_hash = hashlib.blake2b(loader_key.encode('utf-8'), digest_size=6).hexdigest()
+    return f"{loader_hash}-{content_hash}"
+
+
+def write_frame(df, entry_dir):
+    """Stores a DataFrame as one .npy file per column plus a meta.json.
+
+    Category columns are stored as integer codes with their categories in the
+    metadata; columns of Python objects are kept in the metadata as lists.
+    """
+    columns = []
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        column = {'name': col}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            column['kind'] = 'category'
+            column['categories'] = series.cat.categories.tolist()
+            np.save(os.path.join(entry_dir, f'{i}.npy'), series.cat.codes.to_numpy())
+        elif series.dtype.kind in 'biufM':
+            column['kind'] = 'array'
+            np.save(os.path.join(entry_dir, f'{i}.npy'), series.to_numpy())
+        else:
+            column['kind'] = 'values'
+            column['values'] = series.astype(object).where(series.notna(), None).tolist()
+        columns.append(column)
+
+    with open(os.path.join(entry_dir, META_FILE), 'w') as f:
+        json.dump({'rows': len(df), 'columns': columns}, f)
+
+
+def read_frame(entry_dir):
+    """Loads a DataFrame written by `write_frame`, memory-mapping the column files."""
+    with open(os.path.join(entry_dir, META_FILE), 'r') as f:
+        meta = json.load(f)
+
+    data = {}
+    for i, column in enumerate(meta['columns']):
+        if column['kind'] == 'values':
+            data[column['name']] = pd.Series(column['values'], dtype=object)
+            continue
+        values = np.load(os.path.join(entry_dir, f'{i}.npy'), mmap_mode='r')
+        if column['kind'] == 'category':
+            data[column['name']] = pd.Categorical.from_codes(values, column['categories'])
+        else:
+            data[column['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def _entry_size(entry_dir):
+    return sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+
+
+def evict(cache_dir, max_bytes, keep=()):
+    """Removes least recently used entries until the cache fits in `max_bytes`."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_dir() and entry.name not in keep:
+            entries.append((entry.stat().st_mtime, entry.path, _entry_size(entry.path)))
+    total = sum(size for _, _, size in entries)
+    total += sum(_entry_size(os.path.join(cache_dir, name)) for name in keep
+                 if os.path.isdir(os.path.join(cache_dir, name)))
+
+    for _, path, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def cached_frame(source_path, loader, cache_dir, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+    """Returns `loader(source_path)`, reusing the cached frame when the file is unchanged.
+
+    Entries are keyed by the loader and the file's content hash, so editing or
+    replacing the export invalidates them automatically. Old entries are
+    evicted once the directory grows past `max_bytes`.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    content_hash = _source_hash(cache_dir, source_path)
+    entry_name = _entry_name(loader, content_hash)
+    entry_dir = os.path.join(cache_dir, entry_name)
+
+    if os.path.exists(os.path.join(entry_dir, META_FILE)):
+        try:
+            df = read_frame(entry_dir)
+            # Bump the entry's mtime so eviction treats it as recently used
+            now = time.time()
+            os.utime(entry_dir, (now, now))
+            print(f"Loaded {source_path} from cache")
+            return df
+        except (OSError, ValueError, KeyError, json.JSONDecodeError) as e:
+            print(f"Warning: Ignoring unreadable cache entry for {source_path} - {e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    df = loader(source_path)
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp-')
+    try:
+        write_frame(df, tmp_dir)
+        os.replace(tmp_dir, entry_dir)
+    except OSError as e:
+        print(f"Warning: Could not cache {source_path} - {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return df
+    evict(cache_dir, max_bytes, keep=(entry_name,))
+    return df
@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Raw export file names, as process_data.py expects them in src/data
+TICKET_FILE = 'kracker_data_2024_2025.csv'
+TIMESHEET_FILE = 'time_record_2024_2025.csv'
+STATIC_DATA_FILE = 'static_data.json'
+PROJECTS_ADMIN_FILE = 'projects_admin.json'
+STUDIO_CONFIG_FILE = 'studio_config.json'
+
+# Full column layout of the exports, including the columns the KPIs ignore
+TICKET_EXPORT_COLUMNS = [
+    'ticket_id', 'ticket_name', 'class', 'project_name', 'category/scene', 'asset/shot', 'element',
+    'shader_variation(if any)', 'assigner', 'assignee', 'create_date', 'start_date', 'due_date',
+    'current_status', 'current_status_changed_date',
+]
+TIMESHEET_EXPORT_COLUMNS = [
+    'USERNAME', 'DATE', 'RAW_PROJECT', 'PROJECT', 'HOURS', 'WEEK(month)', 'WEEK(year)', 'YEAR', 'MONTH',
+    'Department', 'Cost_contributions', 'MONTH_YEAR', 'WORKING_DAY',
+]
+
+# Status workflow in the order tickets move through it, with its weights
+STATUS_WEIGHTS = {
+    'not start': 0.0,
+    'ready to start': 0.0,
+    'work in progress': 0.25,
+    'submit': 0.30,
+    'need fixing': 0.40,
+    'publishing on queue': 0.40,
+    'wait for internal review': 0.60,
+    'publishing': 0.60,
+    'publish success': 0.65,
+    'wait for client review': 0.95,
+    'approve': 1.0,
+}
+DEPARTMENTS = ['Art', 'Anim', 'FX', 'Light', 'Comp', 'Rig']
+ELEMENTS = ['Tex', 'Mdl', 'Rig', 'Anim', 'Lgt']
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Tickets generated (and written) per chunk, to bound memory at large scales
+TICKETS_PER_CHUNK = 250000
+
+
+def _ticket_chunk(rng, first_ticket, n_tickets, projects, users, statuses_per_ticket, start, n_days):
+    """Generates the status-change rows of `n_tickets` consecutive tickets."""
+    statuses = np.array(list(STATUS_WEIGHTS))
+    ticket_ids = np.arange(first_ticket, first_ticket + n_tickets)
+    ticket_projects = rng.integers(0, len(projects), n_tickets)
+    ticket_assignees = rng.integers(0, len(users), n_tickets)
+    start_offsets = rng.integers(0, max(n_days - 14, 1) * 24 * 3600, n_tickets).astype('timedelta64[s]')
+    start_dates = start + start_offsets
+    create_dates = start_dates - rng.integers(3600, 5 * 24 * 3600, n_tickets).astype('timedelta64[s]')
+    due_dates = start_dates + rng.integers(1, 30, n_tickets).astype('timedelta64[D]')
+
+    # 1..statuses_per_ticket status changes per ticket, moving forward through the workflow
+    row_counts = rng.integers(1, statuses_per_ticket + 1, n_tickets)
+    row_tickets = np.repeat(np.arange(n_tickets), row_counts)
+    first_rows = np.cumsum(row_counts) - row_counts
+    step = np.arange(len(row_tickets)) - np.repeat(first_rows, row_counts)
+    status_index = np.minimum(
+        (step + 1) * len(statuses) // (row_counts[row_tickets] + 1) + rng.integers(0, 2, len(row_tickets)),
+        len(statuses) - 1
+    )
+    # Each change happens between 10 minutes and 4 days after the previous one
+    gaps = rng.integers(600, 4 * 24 * 3600, len(row_tickets)).astype('timedelta64[s]')
+    elapsed = np.cumsum(gaps)
+    elapsed -= np.repeat(elapsed[first_rows] - gaps[first_rows], row_counts)
+    changed_dates = start_dates[row_tickets] + elapsed
+
+    project_names = np.array(projects)[ticket_projects[row_tickets]]
+    return pd.DataFrame({
+        'ticket_id': ticket_ids[row_tickets],
+        'ticket_name': 'task',
+        'class': 'share',
+        'project_name': project_names,
+        'category/scene': 'chr',
+        'asset/shot': 'asset',
+        'element': np.array(ELEMENTS)[row_tickets % len(ELEMENTS)],
+        'shader_variation(if any)': 'default:generic',
+        'assigner': 'lead',
+        'assignee': np.array(users)[ticket_assignees[row_tickets]],
+        'create_date': pd.to_datetime(create_dates[row_tickets]),
+        'start_date': pd.to_datetime(start_dates[row_tickets]),
+        'due_date': pd.to_datetime(due_dates[row_tickets]),
+        'current_status': statuses[status_index],
+        'current_status_changed_date': pd.to_datetime(changed_dates),
+    }, columns=TICKET_EXPORT_COLUMNS)
+
+
+def _timesheet(rng, projects, users, departments, start, n_days):
+    """Generates one to two timesheet rows per user and weekday, 8 hours a day."""
+    days = np.arange(start, start + np.timedelta64(n_days, 'D'), dtype='datetime64[D]')
+    days = days[np.is_busday(days)]
+    user_index = np.repeat(np.arange(len(users)), len(days))
+    day_index = np.tile(np.arange(len(days)), len(users))
+    # Split the day over two projects for about a third of the entries
+    split = rng.random(len(user_index)) < 0.33
+    first_hours = np.where(split, rng.integers(1, 8, len(user_index)) * 1.0, 8.0)
+    rows_user = np.concatenate([user_index, user_index[split]])
+    rows_day = np.concatenate([day_index, day_index[split]])
+    rows_hours = np.concatenate([first_hours, 8.0 - first_hours[split]])
+    rows_project = rng.integers(0, len(projects), len(rows_user))
+    order = np.lexsort((rows_user, rows_day))
+    rows_user, rows_day, rows_hours, rows_project = rows_user[order], rows_day[order], rows_hours[order], rows_project[order]
+
+    dates = pd.DatetimeIndex(days[rows_day])
+    project_names = np.array(projects)[rows_project]
+    return pd.DataFrame({
+        'USERNAME': np.array(users)[rows_user],
+        'DATE': dates.strftime('%Y-%m-%d'),
+        'RAW_PROJECT': project_names,
+        'PROJECT': project_names,
+        'HOURS': rows_hours,
+        'WEEK(month)': (dates.day - 1) // 7 + 1,
+        'WEEK(year)': dates.isocalendar().week.to_numpy(),
+        'YEAR': dates.year,
+        'MONTH': dates.strftime('%b'),
+        'Department': np.array(departments)[rows_user],
+        'Cost_contributions': '4,000.00',
+        'MONTH_YEAR': dates.strftime('%b %Y'),
+        'WORKING_DAY': '1.00',
+    }, columns=TIMESHEET_EXPORT_COLUMNS)
+
+
+def _config_files(rng, projects, start, n_days):
+    """Returns the static_data, projects_admin and studio_config contents."""
+    static_data = {'default': dict(STATUS_WEIGHTS), 'config': {'hours_per_manday': 8}}
+    # Every other project gets its own (slightly stricter) weight table
+    for project_name in projects[::2]:
+        static_data[project_name] = {status: round(weight * 0.9, 4) for status, weight in STATUS_WEIGHTS.items()}
+
+    end = start + np.timedelta64(n_days, 'D')
+    projects_admin = []
+    for project_name in projects:
+        project_start = start + np.timedelta64(int(rng.integers(0, max(n_days // 4, 1))), 'D')
+        projects_admin.append({
+            'project_name': project_name,
+            'startDate': str(project_start),
+            'endDate': str(end),
+            'allocatedMandays': int(rng.integers(50, 2000)),
+        })
+
+    years = range(int(str(start)[:4]), int(str(end)[:4]) + 1)
+    studio_config = {
+        'studio_annual_config': {
+            'working_days': {str(year): 250 for year in years},
+            'holidays': {str(year): [f'{year}-01-01', f'{year}-12-25'] for year in years},
+        }
+    }
+    return static_data, projects_admin, studio_config
+
+
+def generate_inputs(output_dir, projects=5, users=50, tickets=10000, statuses_per_ticket=4, weeks=52,
+                    seed=0, start_date='2024-01-01'):
+    """Writes a seeded, synthetic set of raw inputs for process_data.py into `output_dir`.
+
+    Produces the ticket export (1 to `statuses_per_ticket` status-change rows
+    per ticket_id), the timesheet export (every user logs 8 hours per weekday)
+    and matching static_data.json, projects_admin.json and studio_config.json,
+    all spanning `weeks` weeks from `start_date`. The same arguments always
+    produce the same files. Returns the number of rows written per export.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(start_date, 's')
+    n_days = weeks * 7
+    project_names = [f'project_{i:03d}' for i in range(projects)]
+    usernames = [f'user_{i:05d}' for i in range(users)]
+    departments = [DEPARTMENTS[i] for i in rng.integers(0, len(DEPARTMENTS), users)]
+
+    ticket_rows = 0
+    ticket_path = os.path.join(output_dir, TICKET_FILE)
+    for first in range(0, tickets, TICKETS_PER_CHUNK):
+        chunk = _ticket_chunk(
+            rng, 100000 + first, min(TICKETS_PER_CHUNK, tickets - first),
+            project_names, usernames, statuses_per_ticket, start, n_days
+        )
+        chunk.to_csv(ticket_path, mode='w' if first == 0 else 'a', header=first == 0, index=False,
+                     date_format=DATE_FORMAT)
+        ticket_rows += len(chunk)
+    if tickets == 0:
+        pd.DataFrame(columns=TICKET_EXPORT_COLUMNS).to_csv(ticket_path, index=False)
+
+    timesheet = _timesheet(rng, project_names, usernames, departments, start.astype('datetime64[D]'), n_days)
+    timesheet.to_csv(os.path.join(output_dir, TIMESHEET_FILE), index=False)
+
+    static_data, projects_admin, studio_config = _config_files(rng, project_names, start.astype('datetime64[D]'), n_days)
+    for file_name, content in ((STATIC_DATA_FILE, static_data), (PROJECTS_ADMIN_FILE, projects_admin),
+                               (STUDIO_CONFIG_FILE, studio_config)):
+        with open(os.path.join(output_dir, file_name), 'w') as f:
+            json.dump(content, f, indent=2)
+
+    return {'tickets': ticket_rows, 'timesheet': len(timesheet)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic raw inputs for process_data.py.")
+    parser.add_argument('output_dir', help="Directory to write the exports and configuration files to")
+    parser.add_argument('--projects', type=int, default=5)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--tickets', type=int, default=10000)
+    parser.add_argument('--statuses-per-ticket', type=int, default=4,
+                        help="Maximum number of status-change rows per ticket_id")
+    parser.add_argument('--weeks', type=int, default=52)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start-date', default='2024-01-01')
+    args = parser.parse_args()
+    rows = generate_inputs(
+        args.output_dir, args.projects, args.users, args.tickets, args.statuses_per_ticket, args.weeks,
+        args.seed, args.start_date
+    )
+    print(f"Generated {rows['tickets']} ticket rows and {rows['timesheet']} timesheet rows in {args.output_dir}")
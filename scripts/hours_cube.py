@@ -0,0 +1,214 @@
+import argparse
+import bisect
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from snapshot_engine import assign_week_bins, cumulative_bincount, hour_units, native, to_units
+
+# Bump when the layout of a saved cube changes
+CUBE_VERSION = 1
+
+# Cube dimension -> timesheet column
+DIMENSIONS = {'project': 'PROJECT', 'department': 'Department', 'user': 'USERNAME'}
+
+
+class HoursCube:
+    """Timesheet hours indexed by project x department x user x week, built in one pass.
+
+    Every timesheet row is reduced to integer codes (labels in order of first
+    appearance, -1 for a missing value; weeks are the snapshot bins, with
+    len(weeks) for rows outside the grid) and the rows are summed per
+    distinct cell. Only the cells that occur are stored, as parallel arrays,
+    with HOURS kept in the fixed-point units of `hour_units` so that any
+    roll-up is exact. Every manday figure is then a selection of cells summed
+    per group and accumulated along the week axis, without rescanning the
+    timesheet.
+    """
+
+    def __init__(self, week_labels, labels, cells, hours, rows, scale):
+        self.week_labels = list(week_labels)
+        self.labels = labels
+        self.cells = cells
+        self.hours = hours
+        self.rows = rows
+        self.scale = scale
+
+    @classmethod
+    def build(cls, timesheet_df, weeks, bins=None):
+        if bins is None:
+            bins = assign_week_bins(timesheet_df['DATE'], weeks)
+        n_weeks = len(weeks)
+        labels, codes = {}, {}
+        for dim, col in DIMENSIONS.items():
+            if col in timesheet_df.columns:
+                codes[dim], dim_labels = pd.factorize(timesheet_df[col])
+                labels[dim] = [native(label) for label in dim_labels]
+            else:
+                codes[dim], labels[dim] = np.full(len(timesheet_df), -1), []
+        units, scale = hour_units(timesheet_df['HOURS'].to_numpy(dtype=float))
+
+        # One mixed-radix key per row; codes are shifted by one so -1 fits
+        key = np.zeros(len(timesheet_df), dtype='int64')
+        for dim in DIMENSIONS:
+            key = key * (len(labels[dim]) + 1) + (codes[dim] + 1)
+        key = key * (n_weeks + 1) + bins
+        cell_keys, inverse = np.unique(key, return_inverse=True)
+        hours = np.zeros(len(cell_keys), dtype=units.dtype)
+        np.add.at(hours, inverse, units)
+        rows = np.bincount(inverse, minlength=len(cell_keys)).astype('int64')
+
+        cells = {}
+        cell_keys, cells['week'] = np.divmod(cell_keys, n_weeks + 1)
+        for dim in reversed(list(DIMENSIONS)):
+            cell_keys, code = np.divmod(cell_keys, len(labels[dim]) + 1)
+            cells[dim] = code - 1
+        week_labels = [week.strftime('%Y-%m-%d') for week in weeks]
+        return cls(week_labels, labels, cells, hours, rows, scale)
+
+    @property
+    def n_weeks(self):
+        return len(self.week_labels)
+
+    def _cumulative(self, dims, values):
+        """Cumulative weekly sums of `values` per distinct combination of `dims`.
+
+        Cells missing any of the dimensions are left out. Returns (group codes
+        per dimension, matrix) with the groups sorted by their codes.
+        """
+        selected = np.ones(len(self.hours), dtype=bool)
+        for dim in dims:
+            selected &= self.cells[dim] >= 0
+        group_key = np.zeros(int(selected.sum()), dtype='int64')
+        for dim in dims:
+            group_key = group_key * len(self.labels[dim]) + self.cells[dim][selected]
+        groups, inverse = np.unique(group_key, return_inverse=True)
+        matrix = cumulative_bincount(
+            inverse * (self.n_weeks + 1) + self.cells['week'][selected], values[selected], len(groups), self.n_weeks
+        )
+        group_codes = {}
+        for dim in reversed(dims):
+            groups, group_codes[dim] = np.divmod(groups, len(self.labels[dim]))
+        return group_codes, matrix
+
+    def entity_hours(self, dim, initial_hours=None):
+        """Cumulative hours per week of every value of `dim`: {entity: array over the weeks}.
+
+        `initial_hours` maps entity -> hours accumulated by an earlier run; they
+        are added to every week of the entity's series.
+        """
+        initial_hours = initial_hours or {}
+        known = set(self.labels[dim])
+        entities = self.labels[dim] + [entity for entity in initial_hours if entity not in known]
+        valid = self.cells[dim] >= 0
+        keys = self.cells[dim][valid] * (self.n_weeks + 1) + self.cells['week'][valid]
+        initial = to_units([initial_hours.get(entity, 0.0) for entity in entities], self.scale)
+        cumulative = (
+            cumulative_bincount(keys, self.hours[valid], len(entities), self.n_weeks) + initial[:, None]
+        ) / self.scale
+        return {entity: cumulative[i] for i, entity in enumerate(entities)}
+
+    def group_hours(self, dim, group_dim, initial_groups=None):
+        """Cumulative (hours, rows) of every `group_dim` within every value of `dim`.
+
+        Returns {entity: [(group, hours, rows), ...]} with groups sorted, as
+        `groupby(group_col)` lists them, and hours / rows per week.
+        `initial_groups` maps entity -> list of (group, hours, rows)
+        accumulated by an earlier run.
+        """
+        initial_groups = initial_groups or {}
+        group_codes, hours = self._cumulative((dim, group_dim), self.hours)
+        _, rows = self._cumulative((dim, group_dim), self.rows)
+        group_labels = self.labels[group_dim]
+
+        merged = {entity: {} for entity in self.labels[dim]}
+        for i, (entity_code, group_code) in enumerate(zip(group_codes[dim], group_codes[group_dim])):
+            merged[self.labels[dim][entity_code]][group_labels[group_code]] = [hours[i], rows[i]]
+        for entity, entity_groups in initial_groups.items():
+            entity_merged = merged.setdefault(entity, {})
+            for group, group_hours, group_rows in entity_groups:
+                totals = entity_merged.setdefault(group, [0, 0])
+                totals[0] = totals[0] + to_units(group_hours, self.scale)
+                totals[1] = totals[1] + group_rows
+        return {
+            entity: [
+                (group, np.broadcast_to(entity_merged[group][0] / self.scale, self.n_weeks),
+                 np.broadcast_to(entity_merged[group][1], self.n_weeks))
+                for group in sorted(entity_merged)
+            ]
+            for entity, entity_merged in merged.items()
+        }
+
+    def week_index(self, date):
+        """Index of the first week ending on or after `date` ('YYYY-MM-DD'), like assign_week_bins."""
+        index = bisect.bisect_left(self.week_labels, date)
+        if index == self.n_weeks:
+            raise ValueError(f"{date} is after the last week of the cube ({self.week_labels[-1]})")
+        return index
+
+    def rollup(self, by, week=None):
+        """Hours per combination of the `by` dimensions, up to the week of `week` (default: the last week).
+
+        E.g. ('department',) gives department totals across projects and
+        ('user', 'project') every user's project split. Returns
+        {tuple of labels: hours}, leaving out zero totals.
+        """
+        week_index = self.n_weeks - 1 if week is None else self.week_index(week)
+        group_codes, hours = self._cumulative(tuple(by), self.hours)
+        totals = {}
+        for i in range(len(hours)):
+            if hours[i, week_index]:
+                key = tuple(self.labels[dim][group_codes[dim][i]] for dim in by)
+                totals[key] = float(hours[i, week_index] / self.scale)
+        return totals
+
+    def save(self, path):
+        """Writes the cube to a single .npz file (no pickled objects), replacing `path` atomically."""
+        meta = {'version': CUBE_VERSION, 'weeks': self.week_labels, 'labels': self.labels, 'scale': self.scale}
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.', suffix='.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(
+                    f, meta=np.array(json.dumps(meta)), hours=self.hours, rows=self.rows,
+                    **{f'cell_{name}': values for name, values in self.cells.items()}
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != CUBE_VERSION:
+                raise ValueError(f"{path} holds a cube of version {meta.get('version')}, expected {CUBE_VERSION}")
+            cells = {name: data[f'cell_{name}'] for name in list(DIMENSIONS) + ['week']}
+            return cls(meta['weeks'], meta['labels'], cells, data['hours'], data['rows'], meta['scale'])
+
+
+if __name__ == "__main__":
+    from process_data import HOURS_CUBE_PATH, HOURS_PER_MANDAY, STATIC_DATA_PATH
+
+    parser = argparse.ArgumentParser(description="Query the hours cube written by process_data.py.")
+    parser.add_argument('--by', nargs='+', choices=list(DIMENSIONS), default=['department'],
+                        help="Dimensions to total by, e.g. --by user project for each user's project split")
+    parser.add_argument('--week', metavar='YYYY-MM-DD', help="Total up to the end of the week containing this date (default: the last week)")
+    parser.add_argument('--cube', default=HOURS_CUBE_PATH)
+    args = parser.parse_args()
+
+    with open(STATIC_DATA_PATH, 'r') as f:
+        static_data = json.load(f)
+    # Same hours per manday as the pipeline's outputs
+    hours_per_manday = static_data.get('config', {}).get('hours_per_manday', HOURS_PER_MANDAY)
+
+    cube = HoursCube.load(args.cube)
+    try:
+        totals = cube.rollup(args.by, args.week)
+    except ValueError as e:
+        parser.error(str(e))
+    for key, hours in sorted(totals.items(), key=lambda item: -item[1]):
+        print(f"{' / '.join(str(label) for label in key):<48}{hours / hours_per_manday:>12.2f} mandays")
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from active_weeks import expand_weekly_data
+from output_writer import write_json_atomic
+
+# Bump when the layout of the state file changes
+STATE_VERSION = 2
+
+
+def config_fingerprint(*configs):
+    """Returns a stable hash of the configuration a set of snapshots was built with."""
+    payload = json.dumps(configs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def rows_digest(df, date_column, cutoff, columns):
+    """Returns a hash of the rows dated on or before `cutoff`, in file order, over `columns`.
+
+    These are the rows an incremental run resuming after `cutoff` skips, so
+    a different digest means some of them were added, removed or edited
+    since the state was saved (a late timesheet, say).
+    """
+    rows = df.loc[df[date_column] <= cutoff, [col for col in columns if col in df.columns]]
+    hashes = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()
+
+
+def load_state(path, fingerprint, week_start):
+    """Loads the incremental state file if it can be resumed from.
+
+    Returns None when the file is missing, unreadable, written by another
+    version, or built from a different configuration or week grid.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read incremental state - {e}")
+        return None
+
+    if state.get('version') != STATE_VERSION:
+        print("Incremental state was written by another version, running a full rebuild")
+        return None
+    if state.get('fingerprint') != fingerprint:
+        print("Configuration changed since the last run, running a full rebuild")
+        return None
+    if state.get('week_start') != week_start:
+        print("Week grid changed since the last run, running a full rebuild")
+        return None
+    return state
+
+
+def save_state(path, state):
+    """Writes the incremental state file next to the outputs."""
+    write_json_atomic(path, dict(state, version=STATE_VERSION))
+
+
+def load_previous_weekly_data(previous, weeks_needed, week_labels):
+    """Returns the weekly_data of the last processed_data keyed by entity.
+
+    `previous` is the last output as read by `read_processed_data`. Entities
+    written over their active range only are expanded back onto the week grid
+    `week_labels`, with None for the weeks before the range. Returns None if
+    the output is missing or holds fewer than `weeks_needed` weeks for some
+    entity, in which case the run cannot be resumed.
+    """
+    if previous is None:
+        return None
+
+    try:
+        projects = {
+            p['project_name']: expand_weekly_data(p, week_labels, weeks_needed) for p in previous.get('projects', [])
+        }
+        users = {u['username']: expand_weekly_data(u, week_labels, weeks_needed) for u in previous.get('users', [])}
+    except ValueError:
+        # An active range starting on a week that is no longer on the grid
+        return None
+    for weekly_data in list(projects.values()) + list(users.values()):
+        if len(weekly_data) < weeks_needed:
+            return None
+    return {'projects': projects, 'users': users}
@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from csv_ingest import (
+    TICKET_CATEGORY_COLUMNS,
+    TIMESHEET_CATEGORY_COLUMNS,
+    load_ticket_data,
+    load_timesheet_data,
+)
+from frame_cache import file_content_hash, read_frame, write_frame
+
+# Bump when the layout of a dataset directory changes
+STORE_VERSION = 2
+INDEX_FILE = 'index.json'
+# Partition of the rows without a (valid) partition date
+UNDATED_PARTITION = 'undated'
+# Position of every stored row in the exports (export number, then row in the
+# export), so reads come back in the order the exports listed them
+ORDER_COLUMN = '_export_order'
+
+# name: (loader, partition date column, deduplication key, category columns)
+DATASETS = {
+    'tickets': (load_ticket_data, 'current_status_changed_date',
+                ['ticket_id', 'current_status', 'current_status_changed_date'], TICKET_CATEGORY_COLUMNS),
+    'timesheets': (load_timesheet_data, 'DATE', ['USERNAME', 'DATE', 'PROJECT'], TIMESHEET_CATEGORY_COLUMNS),
+}
+
+
+def _dataset_dir(store_dir, dataset):
+    return os.path.join(store_dir, dataset)
+
+
+def load_index(store_dir, dataset):
+    """Returns the index of a dataset: its partitions and the exports appended to it."""
+    try:
+        with open(os.path.join(_dataset_dir(store_dir, dataset), INDEX_FILE), 'r') as f:
+            index = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        index = None
+    if index is None or index.get('version') != STORE_VERSION:
+        return {'version': STORE_VERSION, 'partitions': {}, 'exports': []}
+    return index
+
+
+def _save_index(store_dir, dataset, index):
+    dataset_dir = _dataset_dir(store_dir, dataset)
+    fd, tmp_path = tempfile.mkstemp(dir=dataset_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(index, f, indent=4)
+    os.replace(tmp_path, os.path.join(dataset_dir, INDEX_FILE))
+
+
+def partition_key(dates):
+    """Month partition ('YYYY-MM') of every date; UNDATED_PARTITION where the date is missing."""
+    return dates.dt.strftime('%Y-%m').fillna(UNDATED_PARTITION)
+
+
+def partition_bounds(partition):
+    """Returns the (first, last) day of a month partition, or None for UNDATED_PARTITION."""
+    if partition == UNDATED_PARTITION:
+        return None
+    first = pd.Timestamp(f"{partition}-01")
+    return first, first + pd.offsets.MonthEnd(0)
+
+
+def _concat(frames, category_columns):
+    # Partitions carry their own categories; concatenating them falls back to
+    # object columns, which are turned back into categories once
+    df = pd.concat(frames, ignore_index=True)
+    for col in category_columns:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def _replaced_rows(existing, rows, key):
+    """Mask of the `existing` rows whose key also occurs in `rows` (missing values match each other)."""
+    keys = pd.concat([rows[key], existing[key]], ignore_index=True)
+    codes = keys.groupby(key, dropna=False, observed=True, sort=False).ngroup().to_numpy()
+    return np.isin(codes[len(rows):], codes[:len(rows)])
+
+
+def _write_partition(dataset_dir, partition, df):
+    """Replaces a partition directory with `df`, so readers never see half of one."""
+    tmp_dir = tempfile.mkdtemp(dir=dataset_dir, prefix='.tmp-')
+    write_frame(df, tmp_dir)
+    partition_dir = os.path.join(dataset_dir, partition)
+    old_dir = None
+    if os.path.exists(partition_dir):
+        old_dir = tempfile.mkdtemp(dir=dataset_dir, prefix='.old-')
+        os.replace(partition_dir, os.path.join(old_dir, partition))
+    os.replace(tmp_dir, partition_dir)
+    if old_dir is not None:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def append_export(store_dir, dataset, export_path):
+    """Appends a CSV export to a month-partitioned dataset of the store.
+
+    The export is parsed with the pipeline's loader and split by the month of
+    its partition date. Only the partitions it touches are rewritten. An
+    export supersedes what earlier exports stored for the keys it contains:
+    the stored rows with one of its keys are dropped and all of its own rows
+    are added. Rows within one export are never collapsed, since a user may
+    log several rows for the same project on the same day. An export already
+    appended (same content) is skipped. Returns the number of rows added
+    minus the stored rows dropped.
+    """
+    loader, date_column, key, category_columns = DATASETS[dataset]
+    dataset_dir = _dataset_dir(store_dir, dataset)
+    os.makedirs(dataset_dir, exist_ok=True)
+    index = load_index(store_dir, dataset)
+
+    content_hash = file_content_hash(export_path)
+    if any(export['hash'] == content_hash for export in index['exports']):
+        print(f"{export_path} is already in the {dataset} store")
+        return 0
+
+    df = loader(export_path)
+    missing = [col for col in key if col not in df.columns]
+    if missing:
+        raise ValueError(f"{export_path} has no {', '.join(missing)} column(s) to deduplicate {dataset} on")
+
+    df[ORDER_COLUMN] = (np.int64(len(index['exports'])) << 32) + np.arange(len(df), dtype='int64')
+    new_rows = dropped = 0
+    for partition, rows in df.groupby(partition_key(df[date_column]), sort=True):
+        rows = rows.reset_index(drop=True)
+        known = index['partitions'].get(partition)
+        if known is not None:
+            existing = read_frame(os.path.join(dataset_dir, partition))
+            replaced = _replaced_rows(existing, rows, key)
+            dropped += int(replaced.sum())
+            merged = _concat([existing[~replaced], rows], category_columns)
+        else:
+            merged = _concat([rows], category_columns)
+        new_rows += len(merged) - (known['rows'] if known else 0)
+        _write_partition(dataset_dir, partition, merged)
+        index['partitions'][partition] = {'rows': len(merged)}
+
+    index['partitions'] = dict(sorted(index['partitions'].items()))
+    index['exports'].append({
+        'file': os.path.basename(export_path),
+        'hash': content_hash,
+        'rows': len(df),
+        'appended': datetime.now().isoformat(timespec='seconds'),
+    })
+    # The index goes last: a partition is only read once the index lists it
+    _save_index(store_dir, dataset, index)
+    print(f"Appended {export_path} to the {dataset} store: {len(df)} rows, {dropped} stored rows "
+          f"replaced by them, {len(index['partitions'])} partitions")
+    return new_rows
+
+
+def partitions_in_window(index, start=None, end=None):
+    """Partitions of a dataset overlapping [start, end] (both inclusive, either may be None).
+
+    The undated partition is always included, since its rows cannot be placed.
+    """
+    selected = []
+    for partition in index['partitions']:
+        bounds = partition_bounds(partition)
+        if bounds is not None:
+            first, last = bounds
+            if (start is not None and last < start.normalize()) or (end is not None and first > end.normalize()):
+                continue
+        selected.append(partition)
+    return selected
+
+
+def load_dataset(store_dir, dataset, start=None, end=None):
+    """Loads the rows of a dataset whose partition date is within [start, end].
+
+    Only the month partitions overlapping the window are read, so the cost
+    follows the window, not the size of the history. Rows of those partitions
+    outside the window are dropped; undated rows are kept. Rows come back in
+    the order of the exports, as one CSV of them would list them. Returns a
+    frame typed like the loader's, or None when the dataset is empty.
+    """
+    _, date_column, _, category_columns = DATASETS[dataset]
+    index = load_index(store_dir, dataset)
+    partitions = partitions_in_window(index, start, end)
+    if not index['partitions']:
+        return None
+    print(f"Reading {len(partitions)} of {len(index['partitions'])} {dataset} partitions")
+    frames = [read_frame(os.path.join(_dataset_dir(store_dir, dataset), partition)) for partition in partitions]
+    if not frames:
+        # Keep the columns (and dtypes) of an empty window
+        frames = [read_frame(os.path.join(_dataset_dir(store_dir, dataset), next(iter(index['partitions']))))[:0]]
+    df = _concat(frames, category_columns)
+    df = df.sort_values(ORDER_COLUMN, kind='stable', ignore_index=True).drop(columns=ORDER_COLUMN)
+    if start is None and end is None:
+        return df
+    dates = df[date_column]
+    in_window = dates.notna()
+    if start is not None:
+        in_window &= dates >= start.normalize()
+    if end is not None:
+        in_window &= dates < end.normalize() + pd.Timedelta(days=1)
+    return df[in_window | dates.isna()].reset_index(drop=True)
+
+if __name__ == "__main__":
+    from process_data import INPUT_STORE_DIR, TICKET_DATA_PATH, TIMESHEET_DATA_PATH
+
+    parser = argparse.ArgumentParser(description="Append ticket / timesheet exports to the month-partitioned input store.")
+    parser.add_argument('--tickets', nargs='*', default=None, metavar='CSV',
+                        help=f"Ticket exports to append (default: {TICKET_DATA_PATH})")
+    parser.add_argument('--timesheets', nargs='*', default=None, metavar='CSV',
+                        help=f"Timesheet exports to append (default: {TIMESHEET_DATA_PATH})")
+    parser.add_argument('--store', default=INPUT_STORE_DIR, help="Store directory")
+    args = parser.parse_args()
+
+    # Without any export given, append the current ones
+    if args.tickets is None and args.timesheets is None:
+        args.tickets, args.timesheets = [TICKET_DATA_PATH], [TIMESHEET_DATA_PATH]
+    for dataset, paths in (('tickets', args.tickets or []), ('timesheets', args.timesheets or [])):
+        for path in paths:
+            append_export(args.store, dataset, path)
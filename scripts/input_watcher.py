@@ -0,0 +1,77 @@
+import os
+import time
+from datetime import datetime
+
+from frame_cache import file_content_hash
+
+# Seconds between two looks at the inputs
+DEFAULT_POLL_INTERVAL = 1.0
+# Seconds the inputs must stay unchanged before a run starts, so an export
+# that is still being copied (or a burst of several files) triggers one run
+DEFAULT_DEBOUNCE = 2.0
+
+
+def stat_signature(paths):
+    """Returns (size, mtime) per path, or None for missing files."""
+    signature = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature[path] = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            signature[path] = None
+    return signature
+
+
+def _content_hashes(paths):
+    hashes = {}
+    for path in paths:
+        try:
+            hashes[path] = file_content_hash(path)
+        except OSError:
+            hashes[path] = None
+    return hashes
+
+
+def _log(message):
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+
+def watch_inputs(paths, on_change, poll_interval=DEFAULT_POLL_INTERVAL, debounce=DEFAULT_DEBOUNCE,
+                 run_initially=True):
+    """Calls `on_change()` whenever the content of any of `paths` changes. Runs until interrupted.
+
+    The files are polled with os.stat; once a change has settled for
+    `debounce` seconds their content hashes are compared with those of the
+    last run, so touched or re-copied but identical files do not trigger a
+    run. A failing run is reported and retried on the next change.
+    """
+    last_hashes = None if run_initially else _content_hashes(paths)
+    signature = stat_signature(paths)
+    settled_since = time.monotonic() - debounce
+    pending = run_initially
+    _log(f"Watching {len(paths)} input files (poll {poll_interval}s, debounce {debounce}s)")
+
+    while True:
+        current = stat_signature(paths)
+        now = time.monotonic()
+        if current != signature:
+            signature = current
+            settled_since = now
+            pending = True
+        elif pending and now - settled_since >= debounce:
+            pending = False
+            hashes = _content_hashes(paths)
+            changed = [path for path in paths if last_hashes is None or hashes[path] != last_hashes[path]]
+            if changed:
+                last_hashes = hashes
+                _log(f"Inputs changed: {', '.join(changed)}")
+                started = time.monotonic()
+                try:
+                    on_change()
+                    _log(f"Refresh finished in {time.monotonic() - started:.1f}s")
+                except Exception as e:
+                    _log(f"Error: Processing failed, waiting for the next change - {e}")
+            else:
+                _log("Inputs touched but their content is unchanged, skipping")
+        time.sleep(poll_interval)
@@ -0,0 +1,536 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+from input_watcher import stat_signature
+from output_writer import MANIFEST_FILE, WEEK_AXIS, read_processed_data
+from process_data import (
+    PROCESSED_DATA_PATH,
+    PROCESSED_PROJECTS_PATH,
+    PROCESSED_SHARD_DIR,
+    PROCESSED_USERKPIS_PATH,
+)
+
+DEFAULT_HOST = '127.0.0.1'
+# The Next.js dev server runs on 9002
+DEFAULT_PORT = 9003
+# Seconds between two looks at the published outputs
+DEFAULT_RELOAD_INTERVAL = 2.0
+# Idle keep-alive connections are closed after this many seconds
+KEEP_ALIVE_TIMEOUT = 15.0
+DEFAULT_TOP_N = 10
+# Rendered responses kept per loaded store
+RESPONSE_CACHE_SIZE = 4096
+
+DEPARTMENT_KEY = 'department_mandays'
+
+
+class BadRequest(Exception):
+    pass
+
+
+class NotFound(Exception):
+    pass
+
+
+def _log(message):
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+
+def _parse_date(value, name):
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise BadRequest(f"'{name}' must be a date as YYYY-MM-DD, got '{value}'")
+    return value
+
+
+def _latest_weeks(entity):
+    for summary in (entity.get('latest_summary'), entity.get('annual_summary', {}).get('latest_weekly_data')):
+        if summary and 'week_end_date' in summary:
+            yield summary
+
+
+def _fill_active_range(entity, columns, departments, week_positions, has_departments):
+    """Fills the weeks outside an entity's active range: zero before it, the last week repeated after it."""
+    n_weeks = len(departments)
+    if entity['first_week'] is None:
+        first = last = n_weeks
+    else:
+        first, last = week_positions[entity['first_week']], week_positions[entity['last_week']]
+    for values in columns.values():
+        values[:first] = [0] * first
+        if last < n_weeks:
+            values[last + 1:] = [values[last]] * (n_weeks - last - 1)
+    if has_departments:
+        departments[:first] = [{} for _ in range(first)]
+    if last < n_weeks:
+        departments[last + 1:] = [departments[last]] * (n_weeks - last - 1)
+
+
+class EntitySeries:
+    """Weekly KPI series of every project (or every user) on one shared week axis.
+
+    Every numeric weekly field becomes one column per entity, kept exactly as
+    read from processed_data, plus an (entities x weeks) float matrix that
+    rankings read a whole week from at once. Weeks an entity has no entry for
+    are None in the columns and NaN in the matrices. Department mandays are
+    kept per week as {department: mandays}. Entities written over their active
+    range (first_week / last_week) are filled back onto the axis: zero before
+    the range, the last week of the range repeated after it. The axis is
+    `weeks`, the week grid recorded in processed_data, when given; otherwise
+    the weeks the entities have entries for.
+    """
+
+    def __init__(self, entities, id_key, summaries, aliases=(), weeks=None):
+        self.ids = [entity[id_key] for entity in entities]
+        self.positions = {entity_id: i for i, entity_id in enumerate(self.ids)}
+        for alias in aliases:
+            for i, entity in enumerate(entities):
+                self.positions.setdefault(entity.get(alias), i)
+        self.entities = entities
+        self.summaries = summaries
+
+        if weeks is not None:
+            self.weeks = list(weeks)
+        else:
+            # The latest summaries carry the last week of the grid, which active
+            # ranges can end before
+            self.weeks = sorted(
+                {week['week_end_date'] for entity in entities for week in entity['weekly_data']}
+                | {summary['week_end_date'] for entity in entities for summary in _latest_weeks(entity)}
+            )
+        week_positions = {week: i for i, week in enumerate(self.weeks)}
+        self.metric_names = []
+        for entity in entities:
+            for week in entity['weekly_data']:
+                for key, value in week.items():
+                    if key not in self.metric_names and key not in ('week_end_date', DEPARTMENT_KEY) \
+                            and (value is None or isinstance(value, (int, float))):
+                        self.metric_names.append(key)
+
+        has_departments = any(DEPARTMENT_KEY in week for entity in entities for week in entity['weekly_data'])
+        self.columns = []
+        self.departments = []
+        for entity in entities:
+            columns = {name: [None] * len(self.weeks) for name in self.metric_names}
+            departments = [None] * len(self.weeks)
+            for week in entity['weekly_data']:
+                position = week_positions[week['week_end_date']]
+                for name in self.metric_names:
+                    columns[name][position] = week.get(name)
+                if DEPARTMENT_KEY in week:
+                    departments[position] = {row['Department']: row['mandays'] for row in week[DEPARTMENT_KEY]}
+            if 'first_week' in entity:
+                _fill_active_range(entity, columns, departments, week_positions, has_departments)
+            self.columns.append(columns)
+            self.departments.append(departments)
+
+        self.matrices = {
+            name: np.array(
+                [[np.nan if value is None else value for value in columns[name]] for columns in self.columns],
+                dtype='float64'
+            ).reshape(len(entities), len(self.weeks))
+            for name in self.metric_names
+        }
+
+    def position(self, entity_id):
+        if entity_id not in self.positions:
+            raise NotFound(f"Unknown id '{entity_id}'")
+        return self.positions[entity_id]
+
+    def week_range(self, start=None, end=None):
+        """Slice of the week axis with start <= week_end_date <= end."""
+        lo = 0 if start is None else bisect_left(self.weeks, start)
+        hi = len(self.weeks) if end is None else bisect_right(self.weeks, end)
+        return slice(lo, max(lo, hi))
+
+    def week_as_of(self, date=None):
+        """Index of the latest week ending on or before `date` (the last week without one), or None."""
+        index = len(self.weeks) - 1 if date is None else bisect_right(self.weeks, date) - 1
+        return index if index >= 0 else None
+
+    def series(self, entity_id, start=None, end=None, metrics=None):
+        columns = self.columns[self.position(entity_id)]
+        names = self.metric_names if not metrics else metrics
+        unknown = [name for name in names if name not in columns]
+        if unknown:
+            raise BadRequest(f"Unknown metric(s): {', '.join(unknown)}")
+        weeks = self.week_range(start, end)
+        result = {'id': entity_id, 'week_end_date': self.weeks[weeks]}
+        for name in names:
+            result[name] = columns[name][weeks]
+        return result
+
+    def department_series(self, entity_id, start=None, end=None):
+        """Columnar department mandays: {department: [mandays or None per week]}."""
+        weekly = self.departments[self.position(entity_id)]
+        weeks = self.week_range(start, end)
+        names = sorted({name for week in weekly[weeks] if week for name in week})
+        return {
+            'id': entity_id,
+            'week_end_date': self.weeks[weeks],
+            'departments': {name: [(week or {}).get(name) for week in weekly[weeks]] for name in names},
+        }
+
+    def top(self, metric, n=DEFAULT_TOP_N, date=None, ascending=False):
+        """The `n` entities with the highest (or lowest) `metric` in the week as of `date`."""
+        if metric not in self.matrices:
+            raise BadRequest(f"Unknown metric '{metric}', expected one of: {', '.join(self.metric_names)}")
+        week = self.week_as_of(date)
+        if week is None:
+            return {'metric': metric, 'week_end_date': None, 'entries': []}
+        values = self.matrices[metric][:, week]
+        candidates = np.flatnonzero(~np.isnan(values))
+        # Stable sort, so ties keep the pipeline's entity order
+        keys = values[candidates] if ascending else -values[candidates]
+        order = candidates[np.argsort(keys, kind='stable')[:n]]
+        return {
+            'metric': metric,
+            'week_end_date': self.weeks[week],
+            'entries': [
+                {'rank': rank, 'id': self.ids[i], 'value': self.columns[i][metric][week]}
+                for rank, i in enumerate(order.tolist(), start=1)
+            ],
+        }
+
+
+class KpiStore:
+    """Everything the service answers from, loaded from one set of published outputs.
+
+    A store is never modified once built; a reload builds a new store and
+    swaps it in, so requests always see one consistent set of outputs.
+    """
+
+    def __init__(self, processed_data, projects, user_kpis, version):
+        self.version = version
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+        self.project_list = projects
+        self.user_list = user_kpis
+        self.projects = EntitySeries(
+            processed_data.get('projects', []), 'project_id', {project['id']: project for project in projects},
+            aliases=('project_name',), weeks=processed_data.get(WEEK_AXIS)
+        )
+        self.users = EntitySeries(
+            processed_data.get('users', []), 'username', {user['id']: user for user in user_kpis},
+            weeks=processed_data.get(WEEK_AXIS)
+        )
+        self.user_departments = {user['id']: user.get('department') for user in user_kpis}
+        self.responses = {}
+
+    @classmethod
+    def load(cls, paths, shard_dir=None):
+        """Builds a store from the published outputs, or returns None if they cannot be read.
+
+        The version is derived from the size and mtime of the watched `paths`.
+        """
+        processed_data = read_processed_data(PROCESSED_DATA_PATH, shard_dir)
+        if processed_data is None:
+            return None
+        try:
+            with open(PROCESSED_PROJECTS_PATH, 'r') as f:
+                projects = json.load(f)
+            with open(PROCESSED_USERKPIS_PATH, 'r') as f:
+                user_kpis = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Could not read processed outputs - {e}")
+            return None
+        version = hashlib.blake2b(
+            json.dumps(stat_signature(paths), sort_keys=True).encode(), digest_size=8
+        ).hexdigest()
+        return cls(processed_data, projects, user_kpis, version)
+
+    def department_breakdown(self, date=None):
+        """Mandays per department summed over all projects in the week as of `date`, with head counts."""
+        week = self.projects.week_as_of(date)
+        mandays = {}
+        if week is not None:
+            for weekly in self.projects.departments:
+                for name, value in (weekly[week] or {}).items():
+                    mandays[name] = mandays.get(name, 0) + value
+        users = {}
+        for name in self.user_departments.values():
+            users[name] = users.get(name, 0) + 1
+        return {
+            'week_end_date': None if week is None else self.projects.weeks[week],
+            'departments': [
+                {'department': name, 'mandays': mandays.get(name, 0), 'users': users.get(name, 0)}
+                for name in sorted(set(mandays) | set(users), key=str)
+            ],
+        }
+
+
+def _single(query, name, default=None):
+    values = query.get(name)
+    return values[-1] if values else default
+
+
+def _date_param(query, name):
+    value = _single(query, name)
+    return None if value is None else _parse_date(value, name)
+
+
+def _int_param(query, name, default):
+    value = _single(query, name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        raise BadRequest(f"'{name}' must be a non-negative integer, got '{value}'")
+    return number
+
+
+def _metrics_param(query):
+    value = _single(query, 'metrics')
+    return [name.strip() for name in value.split(',') if name.strip()] if value else None
+
+
+def route(store, path, query):
+    """Answers one GET request from `store`. Returns the response as a JSON-serialisable value."""
+    parts = [unquote(part) for part in path.strip('/').split('/') if part]
+    if parts == ['health']:
+        return {
+            'status': 'ok',
+            'version': store.version,
+            'loaded_at': store.loaded_at,
+            'projects': len(store.projects.ids),
+            'users': len(store.users.ids),
+            'weeks': len(store.projects.weeks),
+            'first_week': store.projects.weeks[0] if store.projects.weeks else None,
+            'last_week': store.projects.weeks[-1] if store.projects.weeks else None,
+        }
+    if parts == ['departments']:
+        return store.department_breakdown(_date_param(query, 'date'))
+
+    if parts and parts[0] in ('projects', 'users'):
+        series = store.projects if parts[0] == 'projects' else store.users
+        listing = store.project_list if parts[0] == 'projects' else store.user_list
+        if len(parts) == 1:
+            return listing
+        entity_id = series.ids[series.position(parts[1])]
+        if len(parts) == 2:
+            entity = series.entities[series.position(entity_id)]
+            summary_key = 'latest_summary' if parts[0] == 'projects' else 'annual_summary'
+            return {
+                'id': entity_id,
+                'summary': series.summaries.get(entity_id),
+                summary_key: entity.get(summary_key),
+                'metrics': series.metric_names,
+            }
+        start, end = _date_param(query, 'from'), _date_param(query, 'to')
+        if parts[2:] == ['series']:
+            return series.series(entity_id, start, end, _metrics_param(query))
+        if parts[2:] == ['departments'] and parts[0] == 'projects':
+            return series.department_series(entity_id, start, end)
+
+    if len(parts) == 2 and parts[0] == 'rankings' and parts[1] in ('projects', 'users'):
+        series = store.projects if parts[1] == 'projects' else store.users
+        order = _single(query, 'order', 'desc')
+        if order not in ('asc', 'desc'):
+            raise BadRequest(f"'order' must be asc or desc, got '{order}'")
+        metric = _single(query, 'metric')
+        if metric is None:
+            raise BadRequest(f"Missing 'metric', expected one of: {', '.join(series.metric_names)}")
+        return series.top(metric, _int_param(query, 'n', DEFAULT_TOP_N), _date_param(query, 'date'),
+                          ascending=order == 'asc')
+
+    raise NotFound(f"No route for '{path}'")
+
+
+def _finite(value):
+    # NaN / Infinity are not valid JSON; they are served as null
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_finite(item) for item in value]
+    return value
+
+
+def _json_body(value):
+    return json.dumps(_finite(value), separators=(',', ':'), allow_nan=False).encode()
+
+
+def _etag_matches(if_none_match, etag):
+    if if_none_match is None:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or any(candidate.removeprefix('W/') == etag for candidate in candidates)
+
+
+class KpiService:
+    """Turns requests into responses and holds the current store."""
+
+    def __init__(self, store, watched_paths, shard_dir=None):
+        self.store = store
+        self.watched_paths = watched_paths
+        self.shard_dir = shard_dir
+
+    def respond(self, method, target, headers):
+        """Returns (status, extra headers, body) for one request."""
+        if method not in ('GET', 'HEAD'):
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'Allow': 'GET, HEAD'}, _json_body({'error': 'Method not allowed'})
+        store = self.store
+        if store is None:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {'Retry-After': '5'}, \
+                _json_body({'error': 'No processed outputs loaded yet'})
+
+        # The store never changes, so a target's response (and ETag) is fixed until the next reload
+        cached = store.responses.get(target)
+        if cached is None:
+            url = urlsplit(target)
+            try:
+                body = _json_body(route(store, url.path, parse_qs(url.query)))
+                cached = (HTTPStatus.OK, body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+            except BadRequest as e:
+                cached = (HTTPStatus.BAD_REQUEST, _json_body({'error': str(e)}), None)
+            except NotFound as e:
+                cached = (HTTPStatus.NOT_FOUND, _json_body({'error': str(e)}), None)
+            if len(store.responses) >= RESPONSE_CACHE_SIZE:
+                store.responses.clear()
+            store.responses[target] = cached
+
+        status, body, etag = cached
+        extra = {'X-KPI-Version': store.version}
+        if etag is not None:
+            extra['ETag'] = etag
+            extra['Cache-Control'] = 'no-cache'
+            if _etag_matches(headers.get('if-none-match'), etag):
+                return HTTPStatus.NOT_MODIFIED, extra, b''
+        return status, extra, body
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._write(writer, 'HTTP/1.1', HTTPStatus.BAD_REQUEST, {},
+                                      _json_body({'error': 'Malformed request line'}), False, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                # Request bodies are not used by any endpoint
+                if headers.get('content-length', '0').isdigit():
+                    await reader.readexactly(int(headers.get('content-length', '0')))
+
+                status, extra, body = self.respond(method, target, headers)
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+                await self._write(writer, version, status, extra, body, method == 'HEAD', keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _write(writer, version, status, extra, body, head_only, keep_alive):
+        lines = [f"{version} {status.value} {status.phrase}"]
+        headers = {
+            'Content-Type': 'application/json',
+            'Content-Length': str(len(body)),
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'ETag, X-KPI-Version',
+            'Connection': 'keep-alive' if keep_alive else 'close',
+        }
+        headers.update(extra)
+        if status == HTTPStatus.NOT_MODIFIED:
+            del headers['Content-Type'], headers['Content-Length']
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if not head_only:
+            writer.write(body)
+        await writer.drain()
+
+    async def reload_when_published(self, interval=DEFAULT_RELOAD_INTERVAL):
+        """Reloads the store whenever the published outputs change.
+
+        process_data.py replaces each output atomically but one after the
+        other, so a change is only picked up once the files have stayed the
+        same for a whole poll interval. The store is built off the event loop
+        and swapped in when complete; requests keep using the previous store
+        until then, and keep using it if the new outputs cannot be read.
+        """
+        loop = asyncio.get_running_loop()
+        loaded = seen = stat_signature(self.watched_paths)
+        while True:
+            await asyncio.sleep(interval)
+            current = stat_signature(self.watched_paths)
+            if current != seen:
+                seen = current
+                continue
+            if current == loaded:
+                continue
+            loaded = current
+            started = loop.time()
+            store = await loop.run_in_executor(None, KpiStore.load, self.watched_paths, self.shard_dir)
+            if store is None:
+                _log("Published outputs could not be read, still serving the previous ones")
+                continue
+            self.store = store
+            _log(f"Reloaded outputs (version {store.version}) in {loop.time() - started:.2f}s")
+
+
+def watched_output_paths(shard_dir=None):
+    data_path = f"{shard_dir}/{MANIFEST_FILE}" if shard_dir else PROCESSED_DATA_PATH
+    return [data_path, PROCESSED_PROJECTS_PATH, PROCESSED_USERKPIS_PATH]
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, sharded=False, reload_interval=DEFAULT_RELOAD_INTERVAL):
+    shard_dir = PROCESSED_SHARD_DIR if sharded else None
+    paths = watched_output_paths(shard_dir)
+    store = KpiStore.load(paths, shard_dir)
+    if store is None:
+        _log("No processed outputs yet, serving 503 until process_data.py publishes them")
+    else:
+        _log(f"Loaded {len(store.projects.ids)} projects and {len(store.users.ids)} users "
+             f"over {len(store.projects.weeks)} weeks")
+    service = KpiService(store, paths, shard_dir)
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    reloader = asyncio.create_task(service.reload_when_published(reload_interval))
+    _log(f"Serving KPIs on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        reloader.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the processed KPI outputs over HTTP.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--sharded', action='store_true',
+                        help=f"Read processed_data from the sharded layout in {PROCESSED_SHARD_DIR}")
+    parser.add_argument('--reload-interval', type=float, default=DEFAULT_RELOAD_INTERVAL,
+                        help="Seconds between checks for newly published outputs")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.sharded, args.reload_interval))
+    except KeyboardInterrupt:
+        print("Stopped serving")
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+
+def assignee_projects(ticket_df):
+    """Returns a dict mapping assignee -> set of projects they have tickets in."""
+    pairs = ticket_df[['assignee', 'project_name']].dropna().drop_duplicates()
+    projects = {}
+    for assignee, project_name in zip(pairs['assignee'], pairs['project_name']):
+        projects.setdefault(assignee, set()).add(project_name)
+    return projects
+
+
+def _ticket_dates(ticket_df):
+    """Returns one (assignee, date, ticket_id) row per distinct ticket and date.
+
+    A ticket row belongs to a period when either its due date or its start
+    date falls in it, so every row is listed under both of its dates.
+    """
+    ticket_dates = pd.concat([
+        pd.DataFrame({
+            'assignee': ticket_df['assignee'],
+            'date': ticket_df[col],
+            'ticket_id': ticket_df['ticket_id'],
+        })
+        for col in ('due_date', 'start_date')
+    ], ignore_index=True)
+    return ticket_dates.dropna(subset=['date', 'ticket_id']).drop_duplicates()
+
+
+def ticket_counts_by_period(ticket_df, periods):
+    """Counts distinct ticket ids per reporting period, overall and per assignee.
+
+    `periods` is a list of (label, start, end) with `end` exclusive, see
+    reporting_periods. Periods may overlap. The frame is reduced to distinct
+    (assignee, date, ticket) codes once; each period is then a mask over those
+    arrays, so many periods cost little more than one.
+    Returns {label: (count, {assignee: count})}.
+    """
+    ticket_dates = _ticket_dates(ticket_df)
+    dates = ticket_dates['date'].to_numpy(dtype='datetime64[ns]')
+    ticket_codes, _ = pd.factorize(ticket_dates['ticket_id'])
+    assignee_codes, assignees = pd.factorize(ticket_dates['assignee'])
+    n_tickets = int(ticket_codes.max()) + 1 if len(ticket_codes) else 0
+
+    counts = {}
+    for label, start, end in periods:
+        in_period = (dates >= start.to_datetime64()) & (dates < end.to_datetime64())
+        total = len(np.unique(ticket_codes[in_period]))
+        # Distinct (assignee, ticket) pairs, counted per assignee; rows without an assignee have code -1
+        assigned = in_period & (assignee_codes >= 0)
+        pairs = np.unique(assignee_codes[assigned].astype('int64') * n_tickets + ticket_codes[assigned])
+        per_assignee = np.bincount(pairs // max(n_tickets, 1), minlength=len(assignees))
+        counts[label] = (total, {
+            assignees[code]: int(count) for code, count in enumerate(per_assignee) if count
+        })
+    return counts
+
+
+def primary_departments(timesheet_df):
+    """Returns a dict mapping user -> the Department of their first timesheet row."""
+    if 'Department' not in timesheet_df.columns:
+        return {}
+    first_rows = timesheet_df[['USERNAME', 'Department']].dropna(subset=['USERNAME']).drop_duplicates('USERNAME')
+    return dict(zip(first_rows['USERNAME'], first_rows['Department']))
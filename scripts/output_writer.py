@@ -0,0 +1,400 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from active_weeks import entity_week_slice
+
+# Layouts of weekly_data in processed_data
+OUTPUT_FORMATS = ('pretty', 'compact')
+
+MANIFEST_FILE = 'index.json'
+MANIFEST_VERSION = 1
+
+# Key shared by all weekly entries; the compact layout stores it once per file
+WEEK_AXIS = 'week_end_date'
+DEPARTMENT_KEY = 'department_mandays'
+
+COMPACT_SEPARATORS = (',', ':')
+
+# Characters read at a time when streaming processed_data entity by entity
+STREAM_CHUNK_SIZE = 1024 * 1024
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def columnar_weekly_data(weekly_data):
+    """Turns a list of weekly dicts into one array per metric.
+
+    The week_end_date axis is left out (it is stored once, next to the
+    entities). Department mandays become one array per department, with
+    null for the weeks the department has no timesheet rows.
+    """
+    columns = {}
+    for key in (weekly_data[0] if weekly_data else {}):
+        if key == WEEK_AXIS:
+            continue
+        if key == DEPARTMENT_KEY:
+            departments = {}
+            for week_index, week in enumerate(weekly_data):
+                for entry in week[DEPARTMENT_KEY]:
+                    departments.setdefault(entry['Department'], [None] * len(weekly_data))[week_index] = entry['mandays']
+            columns[key] = {department: departments[department] for department in sorted(departments)}
+        else:
+            columns[key] = [week[key] for week in weekly_data]
+    return columns
+
+
+def row_weekly_data(columns, week_axis):
+    """Inverse of `columnar_weekly_data`."""
+    weekly_data = []
+    if not columns:
+        return weekly_data
+    for week_index, week_end_date in enumerate(week_axis):
+        week = {WEEK_AXIS: week_end_date}
+        for key, values in columns.items():
+            if key == DEPARTMENT_KEY:
+                week[key] = [
+                    {'Department': department, 'mandays': mandays[week_index]}
+                    for department, mandays in values.items()
+                    if mandays[week_index] is not None
+                ]
+            else:
+                week[key] = values[week_index]
+        weekly_data.append(week)
+    return weekly_data
+
+
+def _compact_entity(entity):
+    return dict(entity, weekly_data=columnar_weekly_data(entity['weekly_data']))
+
+
+def _dump(value, output_format):
+    if output_format == 'pretty':
+        return json.dumps(value, indent=4)
+    return json.dumps(value, separators=COMPACT_SEPARATORS)
+
+
+def write_json_atomic(path, value, **dump_options):
+    """Writes JSON to a hidden temporary file next to `path`, then renames it over `path`.
+
+    Readers see either the previous file or the complete new one, never a
+    partially written file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(value, f, **dump_options)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def shard_file_name(name):
+    """Returns a file-system safe, collision free shard name for an entity."""
+    readable = re.sub(r'[^A-Za-z0-9_.-]+', '_', str(name)).strip('._')[:60] or 'entity'
+    digest = hashlib.blake2b(str(name).encode('utf-8'), digest_size=4).hexdigest()
+    return f"{readable}-{digest}.json"
+
+
+class ProcessedDataWriter:
+    """Streams processed_data entities to disk as soon as each one is finished.
+
+    Projects must all be added before the first user. Depending on the
+    options, the output is either
+    - a single processed_data.json (`data_path`), written to a temporary file
+      and moved into place by `close()`, or
+    - with `shard_dir`, one file per project and per user under
+      shard_dir/projects and shard_dir/users plus an index.json manifest
+      listing them, so a page only needs to fetch the entity it shows.
+
+    'pretty' reproduces the historical `json.dump(processed_data, indent=4)`
+    byte for byte; 'compact' drops the whitespace and stores weekly_data as
+    one array per metric along a shared week_end_date axis. With
+    `sparse_weeks` (entities written over their active range only), the
+    pretty layout records that week_end_date axis too, since the grid can
+    no longer be read off the entities.
+    """
+
+    def __init__(self, data_path, week_axis, output_format='pretty', shard_dir=None, sparse_weeks=False):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format {output_format!r}, expected one of {OUTPUT_FORMATS}")
+        self.data_path = data_path
+        self.week_axis = list(week_axis)
+        self.output_format = output_format
+        self.shard_dir = shard_dir
+        self.section = None
+        self.counts = {'projects': 0, 'users': 0}
+        self.manifest = {'projects': [], 'users': []}
+        # Whether a single-file output opens with the week axis
+        self.week_axis_written = output_format == 'compact' or sparse_weeks
+
+        if shard_dir is not None:
+            parent = os.path.dirname(os.path.abspath(shard_dir))
+            os.makedirs(parent, exist_ok=True)
+            self.tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.shards-')
+            for section in ('projects', 'users'):
+                os.makedirs(os.path.join(self.tmp_dir, section))
+            self.file = None
+        else:
+            fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(data_path) or '.', prefix='.', suffix='.tmp')
+            self.file = os.fdopen(fd, 'w')
+            if output_format == 'compact':
+                self.file.write('{' + json.dumps(WEEK_AXIS) + ':' + _dump(self.week_axis, 'compact'))
+            elif sparse_weeks:
+                axis = _dump(self.week_axis, 'pretty').replace('\n', '\n' + ' ' * 4)
+                self.file.write('{\n' + ' ' * 4 + json.dumps(WEEK_AXIS) + ': ' + axis)
+
+    def _start_section(self, section):
+        if self.section == section:
+            return
+        if section == 'projects' and self.section is not None:
+            raise ValueError("Projects must be written before users")
+        if section == 'users' and self.section is None:
+            self._start_section('projects')
+        if self.file is not None:
+            if self.section is None:
+                self.file.write(',' if self.week_axis_written else '{')
+            else:
+                self._end_section()
+                self.file.write(',')
+            if self.output_format == 'pretty':
+                self.file.write(f'\n    "{section}": [')
+            else:
+                self.file.write(f'"{section}":[')
+        self.section = section
+
+    def _end_section(self):
+        if self.output_format == 'pretty' and self.counts[self.section]:
+            self.file.write('\n    ]')
+        else:
+            self.file.write(']')
+
+    def _add(self, section, entity, name_key):
+        self._start_section(section)
+        if self.output_format == 'compact':
+            entity = _compact_entity(entity)
+
+        if self.file is not None:
+            if self.output_format == 'pretty':
+                text = _dump(entity, 'pretty').replace('\n', '\n' + ' ' * 8)
+                self.file.write((',' if self.counts[section] else '') + '\n' + ' ' * 8 + text)
+            else:
+                self.file.write((',' if self.counts[section] else '') + _dump(entity, 'compact'))
+        else:
+            file_name = f"{section}/{shard_file_name(entity[name_key])}"
+            with open(os.path.join(self.tmp_dir, file_name), 'w') as f:
+                f.write(_dump(entity, self.output_format))
+            entry = {name_key: entity[name_key], 'file': file_name}
+            if 'project_id' in entity:
+                entry['project_id'] = entity['project_id']
+            self.manifest[section].append(entry)
+        self.counts[section] += 1
+
+    def add_project(self, project_data):
+        self._add('projects', project_data, 'project_name')
+
+    def add_user(self, user_data):
+        self._add('users', user_data, 'username')
+
+    def close(self):
+        """Finishes the output and moves it into place. Returns the written path."""
+        self._start_section('users')
+
+        if self.file is not None:
+            self._end_section()
+            self.file.write('\n}' if self.output_format == 'pretty' else '}')
+            self.file.close()
+            os.replace(self.tmp_path, self.data_path)
+            return self.data_path
+
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'format': self.output_format,
+            WEEK_AXIS: self.week_axis,
+            'projects': self.manifest['projects'],
+            'users': self.manifest['users'],
+        }
+        with open(os.path.join(self.tmp_dir, MANIFEST_FILE), 'w') as f:
+            f.write(_dump(manifest, self.output_format))
+        # Swap the whole directory, so readers never see half of a run
+        old_dir = None
+        if os.path.exists(self.shard_dir):
+            old_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(self.shard_dir)), prefix='.shards-old-')
+            os.replace(self.shard_dir, os.path.join(old_dir, 'shards'))
+        os.replace(self.tmp_dir, self.shard_dir)
+        if old_dir is not None:
+            shutil.rmtree(old_dir, ignore_errors=True)
+        return os.path.join(self.shard_dir, MANIFEST_FILE)
+
+
+def _row_entity(entity, week_axis, week_positions):
+    # Only the compact layout stores weekly_data as columns
+    if not isinstance(entity['weekly_data'], dict):
+        return entity
+    # Entities written over their active range cover part of the axis only
+    return dict(entity, weekly_data=row_weekly_data(
+        entity['weekly_data'], week_axis[entity_week_slice(entity, week_positions)]
+    ))
+
+
+def _week_positions(week_axis):
+    return {week_end_date: week_index for week_index, week_end_date in enumerate(week_axis)}
+
+
+def _row_entities(entities, week_axis):
+    week_positions = _week_positions(week_axis)
+    return [_row_entity(entity, week_axis, week_positions) for entity in entities]
+
+
+def read_processed_data(data_path, shard_dir=None):
+    """Reads processed_data in any layout written by `ProcessedDataWriter`.
+
+    Always returns the pretty layout: {'projects': [...], 'users': [...]} with
+    weekly_data as a list of weekly dicts, plus the week_end_date axis when
+    the output records it (compact, sharded or sparse outputs). Returns None
+    when the output is missing or unreadable.
+    """
+    try:
+        if shard_dir is not None:
+            with open(os.path.join(shard_dir, MANIFEST_FILE), 'r') as f:
+                manifest = json.load(f)
+            data = {}
+            for section in ('projects', 'users'):
+                data[section] = []
+                for entry in manifest[section]:
+                    with open(os.path.join(shard_dir, entry['file']), 'r') as f:
+                        data[section].append(json.load(f))
+            week_axis = manifest[WEEK_AXIS]
+        else:
+            with open(data_path, 'r') as f:
+                data = json.load(f)
+            week_axis = data.get(WEEK_AXIS)
+    except (OSError, KeyError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read previous output - {e}")
+        return None
+
+    if week_axis is None:
+        return data
+    processed_data = {section: _row_entities(data.get(section, []), week_axis) for section in ('projects', 'users')}
+    processed_data[WEEK_AXIS] = week_axis
+    return processed_data
+
+
+class _JsonStream:
+    """Reads a JSON document piece by piece: structural characters, and whole values.
+
+    Only the value being decoded (plus one chunk) is held in memory. When a
+    value does not fit the buffer, the read size doubles, so decoding a value
+    stays linear in its size.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ''
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, grow=False):
+        chunk = self.f.read(max(STREAM_CHUNK_SIZE, len(self.buffer) - self.pos) if grow else STREAM_CHUNK_SIZE)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Returns the next non-whitespace character without consuming it ('' at the end)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON stream, found {found!r}")
+        self.pos += 1
+
+    def skip(self, char):
+        """Consumes `char` if it is next. Returns whether it was."""
+        if self.peek() == char:
+            self.pos += 1
+            return True
+        return False
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill(grow=True):
+                    raise
+                continue
+            # A number running up to the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and isinstance(value, (int, float)) and self._fill(grow=True):
+                continue
+            self.pos = end
+            return value
+
+
+def _stream_document(path, sections):
+    """Yields (key, value) for the top-level keys of a JSON object in file order.
+
+    The arrays under `sections` are not decoded as a whole: their items are
+    yielded one by one as (section, item) instead.
+    """
+    with open(path, 'r') as f:
+        stream = _JsonStream(f)
+        stream.expect('{')
+        while not stream.skip('}'):
+            key = stream.value()
+            stream.expect(':')
+            if key in sections:
+                stream.expect('[')
+                while not stream.skip(']'):
+                    yield key, stream.value()
+                    stream.skip(',')
+            else:
+                yield key, stream.value()
+            stream.skip(',')
+
+
+def iter_processed_entities(data_path, shard_dir=None):
+    """Yields ('projects' | 'users', entity) from processed_data in any layout, one at a time.
+
+    Unlike `read_processed_data`, the output is never loaded as a whole: only
+    the entity being yielded is in memory, so memory use does not grow with
+    the size of the output. Entities come in the pretty layout and in output
+    order, projects first. Raises OSError / ValueError on unreadable outputs.
+    """
+    sections = ('projects', 'users')
+    week_axis = None
+    if shard_dir is not None:
+        output_format = 'pretty'
+        for key, value in _stream_document(os.path.join(shard_dir, MANIFEST_FILE), sections):
+            if key == 'format':
+                output_format = value
+            elif key == WEEK_AXIS:
+                week_axis, week_positions = value, _week_positions(value)
+            elif key in sections:
+                with open(os.path.join(shard_dir, value['file']), 'r') as f:
+                    entity = json.load(f)
+                if output_format == 'compact':
+                    entity = _row_entity(entity, week_axis, week_positions)
+                yield key, entity
+        return
+
+    # The compact and sparse layouts write the week axis before the entities
+    for key, value in _stream_document(data_path, sections):
+        if key == WEEK_AXIS:
+            week_axis, week_positions = value, _week_positions(value)
+        elif key in sections:
+            if week_axis is not None:
+                value = _row_entity(value, week_axis, week_positions)
+            yield key, value
@@ -1,8 +1,46 @@
+import numpy as np
 import pandas as pd
+import argparse
 import json
 from datetime import datetime, timedelta
 import os
 
+from active_weeks import candidate_weeks, trim_weekly_data
+from change_manifest import ChangeTracker
+from chart_series import ChartSeriesBuilder
+from csv_ingest import TICKET_COLUMNS, TICKET_DATE_COLUMNS, TIMESHEET_COLUMNS, load_ticket_data, load_timesheet_data
+from frame_cache import cached_frame
+from hours_cube import HoursCube
+from incremental_state import (
+    config_fingerprint,
+    load_previous_weekly_data,
+    load_state,
+    rows_digest,
+    save_state,
+)
+from input_store import load_dataset
+from input_watcher import DEFAULT_DEBOUNCE, DEFAULT_POLL_INTERVAL, watch_inputs
+from membership_index import assignee_projects, primary_departments, ticket_counts_by_period
+from output_writer import (
+    COMPACT_SEPARATORS,
+    OUTPUT_FORMATS,
+    ProcessedDataWriter,
+    read_processed_data,
+    write_json_atomic,
+)
+from reporting_periods import REPORTING_PERIODS, parse_as_of, reporting_period
+from snapshot_engine import (
+    TICKET_METRICS,
+    assign_week_bins,
+    empty_ticket_metrics,
+    ticket_snapshots,
+    week_grid,
+)
+from stage_profiler import StageProfiler
+from status_flow import status_flow
+from status_weights import map_status_weights, report_unknown_statuses
+from work_calendar import WorkCalendar
+
 # Define file paths
 TICKET_DATA_PATH = '../src/data/kracker_data_2024_2025.csv'
 TIMESHEET_DATA_PATH = '../src/data/time_record_2024_2025.csv'
@@ -10,91 +48,182 @@ STATIC_DATA_PATH = '../src/data/static_data.json'
 PROJECTS_ADMIN_PATH = '../src/data/projects_admin.json'
 STUDIO_CONFIG_PATH = '../src/data/studio_config.json'
 
+# Inputs watched by --watch
+WATCHED_INPUT_PATHS = [
+    TICKET_DATA_PATH,
+    TIMESHEET_DATA_PATH,
+    STATIC_DATA_PATH,
+    PROJECTS_ADMIN_PATH,
+    STUDIO_CONFIG_PATH,
+]
+
 # Output paths
 PROCESSED_DATA_PATH = '../src/data/processed_data.json'
 PROCESSED_PROJECTS_PATH = '../src/data/processed_projects.json'
 PROCESSED_USERKPIS_PATH = '../src/data/processed_userKpis.json'
+# Per-project / per-user shards of processed_data plus an index.json manifest
+PROCESSED_SHARD_DIR = '../src/data/processed'
+# Per-entity content hashes and the ids that changed since the previous run
+CHANGE_MANIFEST_PATH = '../src/data/processed_changes.json'
+# Only the added and changed entities of the last run (with --patch)
+CHANGE_PATCH_PATH = '../src/data/processed_patch.json'
+# Weekly / monthly / quarterly (and downsampled) chart series of every project
+PROCESSED_CHARTS_PATH = '../src/data/processed_charts.json'
+# Time in each status, lead time and cycle time (p50 / p90) per project and assignee
+PROCESSED_FLOW_PATH = '../src/data/processed_flow.json'
+# User contribution for every --backfill as-of date
+PROCESSED_CONTRIBUTIONS_PATH = '../src/data/processed_contributions.json'
+# Project x department x user x week hours of the last full run (see hours_cube.py)
+HOURS_CUBE_PATH = '../src/data/hours_cube.npz'
+# Default location of the --profile report
+PROFILE_REPORT_PATH = '../.cache/profile/process_data_profile.json'
+
+# Month-partitioned, deduplicated history of the exports (see input_store.py)
+INPUT_STORE_DIR = '../src/data/store'
+
+# Cache of parsed ticket/timesheet frames, keyed by the exports' content hash
+FRAME_CACHE_DIR = '../.cache/frames'
+FRAME_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Incremental processing state (cumulative totals + watermark of the last run)
+PROCESSING_STATE_PATH = '../src/data/processing_state.json'
+# Trailing weeks recomputed on every incremental run, since late rows can still land in them
+INCREMENTAL_REOPEN_WEEKS = 1
 
 # Manday definition (hours per manday)
 HOURS_PER_MANDAY = 8
 
-def calculate_working_days(start_date, end_date, working_day_dates):
-    """Calculates working days between two dates based on a list of working day dates."""
-    if start_date is None or end_date is None:
-        return 0
-    count = 0
-    current_date = start_date
-    while current_date <= end_date:
-        if current_date in working_day_dates:
-            count += 1
-        current_date += timedelta(days=1)
-    return count
-
-def process_data():
-    """Processes raw data to generate project and user KPIs with weekly snapshots."""
+def input_digests(ticket_df, timesheet_df, cutoff):
+    """Digests of the ticket and timesheet rows up to `cutoff`, see rows_digest."""
+    return {
+        'tickets': rows_digest(ticket_df, 'current_status_changed_date', cutoff, TICKET_COLUMNS),
+        'timesheets': rows_digest(timesheet_df, 'DATE', cutoff, TIMESHEET_COLUMNS),
+    }
+
+
+def save_incremental_state(checkpoint, fingerprint, weeks, resume_week, previous_project_states,
+                           project_ticket_snapshots, project_hours_snapshots, project_department_snapshots,
+                           user_ticket_snapshots, user_hours_snapshots, inputs):
+    """Writes the per-project and per-user cumulative totals as of the checkpoint week.
+
+    `inputs` holds the digests of the input rows up to the checkpoint week
+    (see input_digests), so the next run can tell whether they changed.
+    """
+    if checkpoint < 0:
+        return
+
+    projects = {}
+    for project_name, hours in project_hours_snapshots.items():
+        projects[project_name] = {'tickets': None, 'hours': float(hours[checkpoint]), 'departments': [], 'completion': []}
+    for project_name, departments in project_department_snapshots.items():
+        projects[project_name]['departments'] = [
+            [department, float(hours[checkpoint]), int(rows[checkpoint])]
+            for department, hours, rows in departments
+            if rows[checkpoint] > 0
+        ]
+    for project_name, ticket_series in project_ticket_snapshots.items():
+        # Weekly completion numerators, so later runs can rescale past weeks
+        previous_completion = previous_project_states.get(project_name, {}).get('completion', [])
+        completion = previous_completion[:resume_week + 1]
+        completion += [0.0] * (resume_week + 1 - len(completion))
+        completion += ticket_series['completion'][resume_week + 1:checkpoint + 1].tolist()
+        project_state = projects.setdefault(project_name, {'tickets': None, 'hours': 0.0, 'departments': []})
+        project_state['tickets'] = ticket_series['state']
+        project_state['completion'] = completion
+
+    users = {}
+    for username, hours in user_hours_snapshots.items():
+        users[username] = {'tickets': None, 'hours': float(hours[checkpoint])}
+    for username, ticket_series in user_ticket_snapshots.items():
+        users.setdefault(username, {'tickets': None, 'hours': 0.0})['tickets'] = ticket_series['state']
+
+    save_state(PROCESSING_STATE_PATH, {
+        'fingerprint': fingerprint,
+        'week_start': weeks[0].isoformat(),
+        'checkpoint': checkpoint,
+        'watermark': weeks[checkpoint].isoformat(),
+        'inputs': inputs,
+        'projects': list(projects.items()),
+        'users': list(users.items()),
+    })
+
+
+def process_data(incremental=False, use_cache=True, workers=1, output_format='pretty', sharded=False,
+                 profile_path=None, patch=False, as_of=None, period='calendar_year', fiscal_year_start_month=1,
+                 backfill_as_of=(), sparse_weeks=False, from_store=False, window_start=None, window_end=None,
+                 latest_only=False, chart_points=None):
+    """Processes raw data to generate project and user KPIs with weekly snapshots.
+
+    With `incremental`, cumulative totals are restored from the state file of the
+    previous run and only rows newer than its watermark are processed; the weeks
+    up to the watermark are copied from the previous processed_data.json.
+    If rows dated up to the watermark were added, removed or edited since (a
+    late timesheet, say), the run falls back to a full rebuild.
+    With `use_cache`, parsed exports are reused from FRAME_CACHE_DIR when their
+    content has not changed since the last run.
+    With `workers` > 1, the per-project and per-user ticket snapshots are
+    computed on a process pool; the output is identical to a serial run.
+    `output_format` ('pretty' or 'compact') and `sharded` select the layout of
+    processed_data, see ProcessedDataWriter.
+    With `profile_path`, per-stage timings, row counts and memory are written
+    there as JSON and printed as a table.
+    Every run hashes each project and user and writes CHANGE_MANIFEST_PATH
+    listing what was added, changed or removed since the previous run; with
+    `patch`, the added and changed entities are also written to CHANGE_PATCH_PATH.
+    User contribution covers the reporting `period` (see REPORTING_PERIODS)
+    containing `as_of` (a date, default today), so a report can be reproduced
+    later. For every date in `backfill_as_of` the contribution of the same
+    period kind is written to PROCESSED_CONTRIBUTIONS_PATH as well.
+    Every entity gets every week of the grid in weekly_data, the layout
+    src/app/project/[projectId]/page.tsx reads. With `sparse_weeks`, each
+    entity's weekly_data only covers its active range instead, marked by
+    first_week / last_week: before first_week every metric is zero (and there
+    are no department mandays), after last_week every week repeats last_week.
+    Entities without any activity then have empty weekly_data and null markers.
+    With `from_store`, the inputs are read from INPUT_STORE_DIR instead of the
+    CSV exports, and only the month partitions overlapping [`window_start`,
+    `window_end`] (dates, either may be None) are read. Rows outside the
+    window are left out altogether, so cumulative figures start at the window.
+    With `latest_only`, only the last week of the grid (or, with `as_of`, the
+    week containing it) is computed and only the dashboard files
+    (PROCESSED_PROJECTS_PATH, PROCESSED_USERKPIS_PATH) are written, identical
+    to a full run's when `as_of` is not given; processed_data, the incremental state
+    and the change manifest are left to the next full run.
+    Next to processed_data, PROCESSED_CHARTS_PATH gets every project's chart
+    series at each of ROLLUP_RESOLUTIONS, plus with `chart_points` a series
+    downsampled to at most that many points (see ChartSeriesBuilder).
+    All hours series are queries on one HoursCube built from the timesheet;
+    a full run saves it to HOURS_CUBE_PATH for ad-hoc roll-ups.
+    PROCESSED_FLOW_PATH gets the time tickets spend in each status and their
+    lead and cycle times per project and assignee (see status_flow), from the
+    whole transition history of the ticket export.
+    """
+    profiler = StageProfiler(enabled=profile_path is not None)
+    if latest_only and incremental:
+        print("--latest-only computes the latest week directly, ignoring --incremental")
+        incremental = False
     
     # Define default values
     DEFAULT_HOURS_PER_MANDAY = 8
     
     # Read input files
+    profiler.enter('csv_load')
     try:
-        # Try different delimiters and encoding options
-        try:
-            # First try with default settings
-            ticket_df = pd.read_csv(TICKET_DATA_PATH)
-            if len(ticket_df.columns) <= 1:
-                # If only one column is detected, try with explicit delimiter
-                ticket_df = pd.read_csv(TICKET_DATA_PATH, delimiter=',', encoding='utf-8')
-                
-            # If still only one column, check the content of the first row
-            if len(ticket_df.columns) <= 1:
-                with open(TICKET_DATA_PATH, 'r', encoding='utf-8') as f:
-                    first_line = f.readline().strip()
-                    print(f"First line of ticket data: {first_line}")
-                    # Try to determine the delimiter
-                    if ';' in first_line:
-                        ticket_df = pd.read_csv(TICKET_DATA_PATH, delimiter=';', encoding='utf-8')
-                    elif '\t' in first_line:
-                        ticket_df = pd.read_csv(TICKET_DATA_PATH, delimiter='\t', encoding='utf-8')
-        
-        except Exception as e:
-            print(f"Error reading ticket data with standard methods: {e}")
-            # Last resort: read as text and parse manually
-            with open(TICKET_DATA_PATH, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                header = lines[0].strip().split(',')
-                data = []
-                for line in lines[1:]:
-                    data.append(line.strip().split(','))
-                ticket_df = pd.DataFrame(data, columns=header)
-        
+        if from_store:
+            window = [pd.Timestamp(day) if day is not None else None for day in (window_start, window_end)]
+            ticket_df = load_dataset(INPUT_STORE_DIR, 'tickets', *window)
+            timesheet_df = load_dataset(INPUT_STORE_DIR, 'timesheets', *window)
+            if ticket_df is None or timesheet_df is None:
+                print(f"Error: The input store in {INPUT_STORE_DIR} is empty, append the exports with input_store.py")
+                return
+        # Sniff the delimiter once and parse only the typed columns the KPIs need
+        elif use_cache:
+            ticket_df = cached_frame(TICKET_DATA_PATH, load_ticket_data, FRAME_CACHE_DIR, FRAME_CACHE_MAX_BYTES)
+            timesheet_df = cached_frame(TIMESHEET_DATA_PATH, load_timesheet_data, FRAME_CACHE_DIR, FRAME_CACHE_MAX_BYTES)
+        else:
+            ticket_df = load_ticket_data(TICKET_DATA_PATH)
+            timesheet_df = load_timesheet_data(TIMESHEET_DATA_PATH)
         print("Ticket DataFrame columns:", ticket_df.columns.tolist())
-        
-        # Similar approach for timesheet data
-        try:
-            timesheet_df = pd.read_csv(TIMESHEET_DATA_PATH)
-            if len(timesheet_df.columns) <= 1:
-                timesheet_df = pd.read_csv(TIMESHEET_DATA_PATH, delimiter=',', encoding='utf-8')
-                
-            if len(timesheet_df.columns) <= 1:
-                with open(TIMESHEET_DATA_PATH, 'r', encoding='utf-8') as f:
-                    first_line = f.readline().strip()
-                    print(f"First line of timesheet data: {first_line}")
-                    if ';' in first_line:
-                        timesheet_df = pd.read_csv(TIMESHEET_DATA_PATH, delimiter=';', encoding='utf-8')
-                    elif '\t' in first_line:
-                        timesheet_df = pd.read_csv(TIMESHEET_DATA_PATH, delimiter='\t', encoding='utf-8')
-        
-        except Exception as e:
-            print(f"Error reading timesheet data with standard methods: {e}")
-            with open(TIMESHEET_DATA_PATH, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                header = lines[0].strip().split(',')
-                data = []
-                for line in lines[1:]:
-                    data.append(line.strip().split(','))
-                timesheet_df = pd.DataFrame(data, columns=header)
-        
         print("Timesheet DataFrame columns:", timesheet_df.columns.tolist())
         
         with open(STATIC_DATA_PATH, 'r') as f:
@@ -113,8 +242,9 @@ def process_data():
         print(f"Unexpected error: {e}")
         return
 
+    profiler.rows('csv_load', rows_out=len(ticket_df) + len(timesheet_df))
+
     # Extract configuration from static data
-    default_status_weights = static_data.get('default', {})
     config = static_data.get('config', {
         'hours_per_manday': DEFAULT_HOURS_PER_MANDAY, 
         'default_project': 'default',
@@ -126,49 +256,22 @@ def process_data():
     DEFAULT_PROJECT = config.get('default_project', 'default')
     WORKING_DAYS = config.get('working_days', 195)
 
-    # Function to get status weight for a specific project
-    def get_status_weight(project_name, status):
-        """Get the status weight for a specific project and status."""
-        # Try to get project-specific weights first
-        if project_name in static_data:
-            return static_data[project_name].get(status, 0.0)
-        # Fall back to default weights
-        return default_status_weights.get(status, 0.0)
-
-    # Assume studio_config has a list of working dates in 'working_days'
-    working_day_dates = [datetime.strptime(d, '%Y-%m-%d').date() for d in studio_config.get('working_days', [])]
-
     # --- Data Cleaning and Preparation ---
-    # Convert string columns to appropriate types
-    # Convert date columns to datetime
-    for col in ['create_date', 'start_date', 'due_date', 'current_status_changed_date']:
-        if col in ticket_df.columns:
-            ticket_df[col] = pd.to_datetime(ticket_df[col], errors='coerce')
-        else:
+    profiler.enter('date_coercion')
+    # Dates and HOURS are already typed by the loaders; only fill in missing columns
+    for col in TICKET_DATE_COLUMNS:
+        if col not in ticket_df.columns:
             print(f"Warning: '{col}' column not found in ticket data")
             # Create a default column if missing
             ticket_df[col] = pd.to_datetime('today')
 
-    if 'DATE' in timesheet_df.columns:
-        timesheet_df['DATE'] = pd.to_datetime(timesheet_df['DATE'], errors='coerce')
-    else:
+    if 'DATE' not in timesheet_df.columns:
         print("Warning: 'DATE' column not found in timesheet data")
         timesheet_df['DATE'] = pd.to_datetime('today')
 
-    # Convert HOURS to numeric
-    if 'HOURS' in timesheet_df.columns:
-        timesheet_df['HOURS'] = pd.to_numeric(timesheet_df['HOURS'], errors='coerce').fillna(0)
-
     # Calculate ticket duration (in days for simplicity)
     ticket_df['duration'] = (ticket_df['due_date'] - ticket_df['start_date']).dt.days.fillna(0)
 
-    # Calculate ticket weight score using project-specific weights
-    ticket_df['status_weight'] = ticket_df.apply(
-        lambda row: get_status_weight(row['project_name'], row['current_status']), 
-        axis=1
-    )
-    ticket_df['ticket_weight_score'] = ticket_df['status_weight'] * ticket_df['duration']
-
     # Process projects admin data
     projects_admin_map = {p['project_name']: p for p in projects_admin_data}
 
@@ -177,20 +280,135 @@ def process_data():
     all_users = timesheet_df['USERNAME'].unique().tolist()
 
     # Determine the range of weeks for weekly snapshots
-    min_date = min(ticket_df['create_date'].min(), timesheet_df['DATE'].min())
-    max_date = max(ticket_df['current_status_changed_date'].max(), timesheet_df['DATE'].max())
-    # Start from the first Monday before the min_date and end on the last Sunday after the max_date
-    start_week = min_date - timedelta(days=min_date.weekday())
-    end_week = max_date + timedelta(days=(6 - max_date.weekday()))
-    weeks = pd.date_range(start=start_week, end=end_week, freq='W-MON') # Weekly snapshots ending on Sunday
+    start_week, weeks = week_grid(ticket_df, timesheet_df)
+
+    profiler.rows('date_coercion', rows_in=len(ticket_df) + len(timesheet_df),
+                  rows_out=len(ticket_df) + len(timesheet_df))
+
+    # --- Incremental State ---
+    profiler.enter('incremental_state')
+    # Resume from the last run's checkpoint week when possible: everything up to
+    # that week is already in the state file and the previous output.
+    shard_dir = PROCESSED_SHARD_DIR if sharded else None
+    fingerprint = config_fingerprint(
+        static_data, projects_admin_data, studio_config, HOURS_PER_MANDAY, sharded, sparse_weeks,
+        from_store and [window_start, window_end]
+    )
+    state = None
+    previous_weekly_data = None
+    if incremental:
+        state = load_state(PROCESSING_STATE_PATH, fingerprint, weeks[0].isoformat())
+        if state is not None and state['checkpoint'] >= len(weeks) - INCREMENTAL_REOPEN_WEEKS:
+            print("Week grid did not grow past the last checkpoint, running a full rebuild")
+            state = None
+        if state is not None:
+            previous_weekly_data = load_previous_weekly_data(
+                read_processed_data(PROCESSED_DATA_PATH, shard_dir), state['checkpoint'] + 1,
+                [week.strftime('%Y-%m-%d') for week in weeks]
+            )
+            if previous_weekly_data is None:
+                print("Previous output does not match the incremental state, running a full rebuild")
+                state = None
+        if state is not None:
+            # A user who only shows up in the timesheet now may have older tickets,
+            # whose weekly history was never written out
+            known_users = {username for username, _ in state['users']} & set(all_users)
+            if known_users - set(previous_weekly_data['users']):
+                print("Some users in the incremental state have no previous output, running a full rebuild")
+                state = None
+        if state is not None:
+            # Rows dated up to the watermark are never read again, so a late or
+            # edited one would be missed for good
+            watermark = weeks[state['checkpoint']]
+            digests = input_digests(ticket_df, timesheet_df, watermark)
+            changed = [name for name, digest in digests.items() if state['inputs'].get(name) != digest]
+            if changed:
+                print(f"{' and '.join(changed).capitalize()} dated up to the last watermark ({watermark.date()}) "
+                      f"changed since the last run, running a full rebuild")
+                state = None
+
+    resume_week = -1
+    project_states, user_states = {}, {}
+    snapshot_ticket_df, snapshot_timesheet_df = ticket_df, timesheet_df
+    if state is not None:
+        resume_week = state['checkpoint']
+        project_states = dict(state['projects'])
+        user_states = dict(state['users'])
+        watermark = weeks[resume_week]
+        changed_dates = ticket_df['current_status_changed_date']
+        snapshot_ticket_df = ticket_df[(changed_dates > watermark) | changed_dates.isna()].copy()
+        snapshot_timesheet_df = timesheet_df[timesheet_df['DATE'] > watermark]
+        print(f"Incremental run from {watermark}: {len(snapshot_ticket_df)} ticket rows, "
+              f"{len(snapshot_timesheet_df)} timesheet rows")
+    checkpoint = len(weeks) - 1 - INCREMENTAL_REOPEN_WEEKS if incremental else None
+    if latest_only:
+        # Cumulative series over a one-week grid end exactly where the full ones
+        # do; with an as-of date, at the week containing it
+        week_index = len(weeks) - 1
+        if as_of is not None:
+            week_index = min(int(assign_week_bins([pd.Timestamp(as_of)], weeks)[0]), week_index)
+        weeks = weeks[week_index:week_index + 1]
+
+    # Calculate ticket weight score using project-specific weights (falling back
+    # to the default table), looked up once per distinct (project, status) pair
+    profiler.enter('status_weighting')
+    snapshot_ticket_df['status_weight'], unknown_statuses = map_status_weights(snapshot_ticket_df, static_data)
+    report_unknown_statuses(unknown_statuses)
+    snapshot_ticket_df['ticket_weight_score'] = snapshot_ticket_df['status_weight'] * snapshot_ticket_df['duration']
+
+    # --- Weekly Snapshots ---
+    # Bin every row into its week once and build all cumulative series up front,
+    # instead of re-filtering the frames for every entity and every week.
+    profiler.rows('status_weighting', rows_in=len(snapshot_ticket_df), rows_out=len(snapshot_ticket_df))
+    profiler.enter('project_snapshots')
+    week_end_labels = [week_end_date.strftime('%Y-%m-%d') for week_end_date in weeks]
+    ticket_bins = assign_week_bins(snapshot_ticket_df['current_status_changed_date'], weeks)
+    timesheet_bins = assign_week_bins(snapshot_timesheet_df['DATE'], weeks)
+    hours_cube = HoursCube.build(snapshot_timesheet_df, weeks, timesheet_bins)
+    project_ticket_snapshots = ticket_snapshots(
+        snapshot_ticket_df, 'project_name', weeks, ticket_bins,
+        {name: s['tickets'] for name, s in project_states.items() if s['tickets']}, checkpoint, workers
+    )
+    project_hours_snapshots = hours_cube.entity_hours(
+        'project', {name: s['hours'] for name, s in project_states.items()}
+    )
+    project_department_snapshots = hours_cube.group_hours(
+        'project', 'department', {name: s['departments'] for name, s in project_states.items()}
+    )
+    profiler.rows('project_snapshots', rows_in=len(snapshot_ticket_df) + len(snapshot_timesheet_df))
+
+    profiler.enter('user_snapshots')
+    user_ticket_snapshots = ticket_snapshots(
+        snapshot_ticket_df, 'assignee', weeks, ticket_bins,
+        {name: s['tickets'] for name, s in user_states.items() if s['tickets']}, checkpoint, workers
+    )
+    user_hours_snapshots = hours_cube.entity_hours(
+        'user', {name: s['hours'] for name, s in user_states.items()}
+    )
+    profiler.rows('user_snapshots', rows_in=len(snapshot_ticket_df) + len(snapshot_timesheet_df))
+    empty_ticket_series = empty_ticket_metrics(len(weeks))
+    empty_hours_series = np.zeros(len(weeks))
+    # Working days only depend on the week, so count them once for all users
+    work_calendar = WorkCalendar(studio_config, start_week, weeks[-1] if len(weeks) else start_week)
+    working_days_by_week = work_calendar.working_days_between(start_week.date(), weeks)
 
     # Create the three output structures
-    processed_data = {'projects': [], 'users': []}
+    # processed_data entities are streamed to disk as soon as they are complete
+    processed_data = None
+    charts = None
+    if not latest_only:
+        processed_data = ProcessedDataWriter(
+            PROCESSED_DATA_PATH, week_end_labels, output_format, shard_dir, sparse_weeks
+        )
+        charts = ChartSeriesBuilder(week_end_labels, chart_points)
     processed_projects = []
     processed_userkpis = []
+    changes = ChangeTracker(CHANGE_MANIFEST_PATH, keep_changed=patch)
 
     # --- Process Project Data ---
     for project_name in all_projects:
+        profiler.enter('project_snapshots')
+        profiler.count('project_loop_iterations')
         # Get project admin info if available
         project_admin_info = projects_admin_map.get(project_name, {})
         
@@ -204,8 +422,6 @@ def process_data():
             'weekly_data': [],
             'latest_summary': {} # To store the final weekly summary
         }
-        project_tickets = ticket_df[ticket_df['project_name'] == project_name].copy()
-        project_timesheet = timesheet_df[timesheet_df['PROJECT'] == project_name].copy()
 
         project_admin_info = projects_admin_map.get(project_name, {})
         total_manday_allocation = project_admin_info.get('allocatedMandays', 0)
@@ -213,68 +429,81 @@ def process_data():
         project_end_date = pd.to_datetime(project_admin_info.get('endDate'))
 
         # Calculate total project ticket duration for completion rate denominator
-        total_project_ticket_duration = project_tickets.groupby('ticket_id')['duration'].first().sum()
-
-
-        for week_end_date in weeks:
-            week_start_date = week_end_date - timedelta(days=6)
-
-            # Filter data up to the end of the current week
-            tickets_up_to_week = project_tickets[project_tickets['current_status_changed_date'] <= week_end_date].copy()
-            timesheet_up_to_week = project_timesheet[project_timesheet['DATE'] <= week_end_date].copy()
-
-            # Calculate cumulative weekly total ticket weight score
-            cumulative_total_ticket_weight_score = tickets_up_to_week.groupby('ticket_id')['ticket_weight_score'].last().sum()
-
-            # Calculate cumulative weekly actual mandays
-            cumulative_actual_hours = timesheet_up_to_week['HOURS'].sum()
+        ticket_series = project_ticket_snapshots.get(project_name, empty_ticket_series)
+        total_project_ticket_duration = ticket_series['total_duration']
+        project_hours = project_hours_snapshots.get(project_name, empty_hours_series)
+        project_department_hours = project_department_snapshots.get(project_name, [])
+
+        # Weeks up to the resume point come from the previous output; only the
+        # completion rate is rescaled, since new tickets change its denominator.
+        first_week = 0
+        if previous_weekly_data is not None and project_name in previous_weekly_data['projects']:
+            project_state = project_states.get(project_name, {})
+            previous_completion = project_state.get('completion', [0.0] * (resume_week + 1))
+            for week_index, previous_week in enumerate(previous_weekly_data['projects'][project_name][:resume_week + 1]):
+                if previous_week is None:
+                    # Before the project's active range
+                    continue
+                completion_rate = 0
+                if total_project_ticket_duration > 0:
+                    completion_rate = (previous_completion[week_index] / total_project_ticket_duration) * 100
+                project_data['weekly_data'].append(dict(previous_week, completion_rate=completion_rate))
+            first_week = resume_week + 1
+
+        # Only weeks in the active range can differ from an empty or a repeated
+        # entry; the last week is always computed for the latest summary
+        week_indices = range(first_week, len(weeks))
+        if sparse_weeks:
+            week_indices = candidate_weeks(
+                [ticket_series[name] for name in TICKET_METRICS] + [project_hours]
+                + [series for _, hours, rows in project_department_hours for series in (hours, rows)],
+                start=first_week
+            )
+        summary_only = len(weeks) > 0 and (not week_indices or week_indices[-1] < len(weeks) - 1)
+        if summary_only:
+            week_indices = list(week_indices) + [len(weeks) - 1]
+
+        profiler.count('project_week_iterations', len(week_indices))
+        for week_index in week_indices:
+            # Cumulative weekly total ticket weight score
+            cumulative_total_ticket_weight_score = ticket_series['weight_score'][week_index]
+
+            # Cumulative weekly actual mandays
+            cumulative_actual_hours = project_hours[week_index]
             cumulative_actual_mandays = cumulative_actual_hours / HOURS_PER_MANDAY
 
             # Calculate weekly project KPI ratio
             # Avoid division by zero
             kpis_ratio = 0
             if total_manday_allocation > 0 and cumulative_actual_mandays > 0:
-                 # Sum of the total weight score from status divide by sum total ticket weight score
-                sum_of_current_status_weight_score = tickets_up_to_week.groupby('ticket_id')['status_weight'].last().sum()
-                total_possible_weight_score = tickets_up_to_week.groupby('ticket_id')['duration'].first().sum() * 1.0 # Assuming max status weight is 1.0
+                # Sum of the total weight score from status divide by sum total ticket weight score
+                sum_of_current_status_weight_score = ticket_series['status_weight'][week_index]
+                total_possible_weight_score = ticket_series['duration'][week_index] * 1.0 # Assuming max status weight is 1.0
                 if total_possible_weight_score > 0:
                      kpi_numerator = sum_of_current_status_weight_score / total_possible_weight_score
                 else:
                      kpi_numerator = 0
 
-
                 kpi_denominator = cumulative_actual_mandays / total_manday_allocation
 
                 if kpi_denominator > 0:
                     kpis_ratio = kpi_numerator / kpi_denominator
 
-
-            # Calculate weekly completion rate
+            # Calculate weekly completion rate from the latest status of every ticket
             completion_rate = 0
             if total_project_ticket_duration > 0:
-                # Fix the calculation to avoid summing datetime values
-                cumulative_ticket_duration_weighted = 0
-                for ticket_id, group in tickets_up_to_week.groupby('ticket_id'):
-                    # Sort by current_status_changed_date to get the latest status
-                    latest_status = group.sort_values('current_status_changed_date').iloc[-1]
-                    # Get the duration from the first row (should be the same for all rows with this ticket_id)
-                    duration = group.iloc[0]['duration']
-                    # Calculate weighted duration
-                    status_weight = latest_status['status_weight']
-                    weighted_duration = status_weight * duration
-                    cumulative_ticket_duration_weighted += weighted_duration
-
+                cumulative_ticket_duration_weighted = ticket_series['completion'][week_index]
                 completion_rate = (cumulative_ticket_duration_weighted / total_project_ticket_duration) * 100
 
-
             # Aggregate by department weekly
-            department_mandays_weekly = timesheet_up_to_week.groupby('Department')['HOURS'].sum().reset_index()
-            department_mandays_weekly['mandays'] = department_mandays_weekly['HOURS'] / HOURS_PER_MANDAY
-            department_mandays_weekly = department_mandays_weekly[['Department', 'mandays']].to_dict('records')
-
+            department_mandays_weekly = [
+                {'Department': department, 'mandays': float(hours[week_index] / HOURS_PER_MANDAY)}
+                for department, hours, rows in project_department_hours
+                if rows[week_index] > 0
+            ]
 
             project_data['weekly_data'].append({
-                'week_end_date': week_end_date.strftime('%Y-%m-%d'),
+                'week_end_date': week_end_labels[week_index],
                 'cumulative_total_ticket_weight_score': cumulative_total_ticket_weight_score,
                 'cumulative_actual_mandays': cumulative_actual_mandays,
                 'kpis_ratio': kpis_ratio,
@@ -285,8 +514,19 @@ def process_data():
         # Store the latest weekly summary
         if project_data['weekly_data']:
             project_data['latest_summary'] = project_data['weekly_data'][-1]
-
-        processed_data['projects'].append(project_data)
+        if summary_only:
+            project_data['weekly_data'].pop()
+        if sparse_weeks:
+            project_data['weekly_data'], project_data['first_week'], project_data['last_week'] = \
+                trim_weekly_data(project_data['weekly_data'])
+
+        profiler.rows('project_snapshots', rows_out=len(project_data['weekly_data']))
+        if processed_data is not None:
+            profiler.enter('chart_series')
+            charts.add_project(project_data)
+            profiler.enter('json_write')
+            processed_data.add_project(project_data)
+            profiler.enter('project_snapshots')
         
         # 2. For processed_projects.json (matches projects_dev.json structure)
         # Extract department allocations from the latest data
@@ -325,36 +565,73 @@ def process_data():
         }
         
         processed_projects.append(project_entry)
+        if not latest_only:
+            profiler.enter('change_manifest')
+            changes.add('projects', project_id, project_data, project_entry)
 
 
     # --- Process User Data ---
+    # Build the per-user lookups once instead of scanning the frames for every user
+    profiler.enter('user_project_membership')
+    as_of = as_of or datetime.now().date()
+    report_period = reporting_period(period, as_of, fiscal_year_start_month)
+    backfill_periods = [(reporting_period(period, date, fiscal_year_start_month), date) for date in backfill_as_of]
+    # Distinct tickets of every requested period, in one pass over the ticket frame
+    period_ticket_counts = ticket_counts_by_period(
+        ticket_df, [report_period] + [backfill_period for backfill_period, _ in backfill_periods]
+    )
+    total_project_tickets_this_year, user_ticket_counts_this_year = period_ticket_counts[report_period[0]]
+    print(f"Reporting contribution over {period} {report_period[0]} "
+          f"({report_period[1].date()} to {(report_period[2] - timedelta(days=1)).date()})")
+    user_departments = primary_departments(timesheet_df)
+    project_order = {project['name']: i for i, project in enumerate(processed_projects)}
+    user_project_names = {
+        username: [name for name in names if name in project_order]
+        for username, names in assignee_projects(ticket_df).items()
+    }
+    profiler.rows('user_project_membership', rows_in=len(ticket_df) + len(timesheet_df),
+                  rows_out=len(user_project_names))
     for username in all_users:
+        profiler.enter('user_snapshots')
+        profiler.count('user_loop_iterations')
         user_data = {
             'username': username,
             'weekly_data': [],
             'annual_summary': {} # To store the final annual summary
         }
-        user_tickets = ticket_df[ticket_df['assignee'] == username].copy()
-        user_timesheet = timesheet_df[timesheet_df['USERNAME'] == username].copy()
-
-        # Filter tickets assigned to the user with due dates within the current year for Contribution
-        current_year = datetime.now().year
-        user_tickets_this_year = user_tickets[(user_tickets['due_date'].dt.year == current_year) | (user_tickets['start_date'].dt.year == current_year)].copy()
-        total_project_tickets_this_year = ticket_df[(ticket_df['due_date'].dt.year == current_year) | (ticket_df['start_date'].dt.year == current_year)].groupby('ticket_id').first().shape[0]
-        user_assigned_tickets_this_year = user_tickets_this_year.groupby('ticket_id').first().shape[0]
-
-
-        for week_end_date in weeks:
-            week_start_date = week_end_date - timedelta(days=6)
-
-            # Filter data up to the end of the current week
-            user_tickets_up_to_week = user_tickets[user_tickets['current_status_changed_date'] <= week_end_date].copy()
-            user_timesheet_up_to_week = user_timesheet[user_timesheet['DATE'] <= week_end_date].copy()
-
+        ticket_series = user_ticket_snapshots.get(username, empty_ticket_series)
+        user_mandays = user_hours_snapshots.get(username, empty_hours_series) / HOURS_PER_MANDAY
+        with np.errstate(divide='ignore', invalid='ignore'):
+            user_utilization_series = (user_mandays / working_days_by_week) * 100  # As percentage
+
+        # Tickets assigned to the user with due or start dates within the reporting period for Contribution
+        user_assigned_tickets_this_year = user_ticket_counts_this_year.get(username, 0)
+
+        # Weeks up to the resume point come from the previous output
+        first_week = 0
+        if previous_weekly_data is not None and username in previous_weekly_data['users']:
+            user_data['weekly_data'].extend(
+                week for week in previous_weekly_data['users'][username][:resume_week + 1] if week is not None
+            )
+            first_week = resume_week + 1
+
+        week_indices = range(first_week, len(weeks))
+        if sparse_weeks:
+            # Utilization keeps changing with the working days even without activity
+            week_indices = candidate_weeks(
+                [ticket_series['weight_score'], ticket_series['duration'], user_mandays],
+                varying=[working_days_by_week], start=first_week
+            )
+        summary_only = len(weeks) > 0 and (not week_indices or week_indices[-1] < len(weeks) - 1)
+        if summary_only:
+            week_indices = list(week_indices) + [len(weeks) - 1]
+
+        profiler.count('user_week_iterations', len(week_indices))
+        for week_index in week_indices:
             # Calculate cumulative weekly user timeliness to complete score
             # Similar logic to project KPI numerator, but for user's tickets
-            cumulative_user_ticket_weight_score = user_tickets_up_to_week.groupby('ticket_id')['ticket_weight_score'].last().sum()
-            total_user_possible_weight_score = user_tickets_up_to_week.groupby('ticket_id')['duration'].first().sum() * 1.0 # Assuming max status weight is 1.0
+            cumulative_user_ticket_weight_score = ticket_series['weight_score'][week_index]
+            total_user_possible_weight_score = ticket_series['duration'][week_index] * 1.0 # Assuming max status weight is 1.0
 
             user_timeliness_score = 0
             if total_user_possible_weight_score > 0:
@@ -362,18 +639,15 @@ def process_data():
 
 
             # Calculate cumulative weekly user actual mandays
-            cumulative_user_actual_hours = user_timesheet_up_to_week['HOURS'].sum()
-            cumulative_user_actual_mandays = cumulative_user_actual_hours / HOURS_PER_MANDAY
+            cumulative_user_actual_mandays = user_mandays[week_index]
 
-            # Calculate weekly user utilization
-            current_total_working_days = calculate_working_days(start_week.date(), week_end_date.date(), working_day_dates) # Working days up to this week
+            # Calculate weekly user utilization against the working days up to this week
             user_utilization = 0
-            if current_total_working_days > 0:
-                # Use the actual working days up to this week
-                user_utilization = (cumulative_user_actual_mandays / current_total_working_days) * 100  # As percentage
+            if working_days_by_week[week_index] > 0:
+                user_utilization = user_utilization_series[week_index]
 
             user_data['weekly_data'].append({
-                'week_end_date': week_end_date.strftime('%Y-%m-%d'),
+                'week_end_date': week_end_labels[week_index],
                 'cumulative_user_ticket_weight_score': cumulative_user_ticket_weight_score,
                 'cumulative_user_actual_mandays': cumulative_user_actual_mandays,
                 'user_timeliness_score': user_timeliness_score,
@@ -391,25 +665,25 @@ def process_data():
         # Add the latest weekly data to the annual summary for convenience if needed
         if user_data['weekly_data']:
              user_data['annual_summary']['latest_weekly_data'] = user_data['weekly_data'][-1]
+        if summary_only:
+            user_data['weekly_data'].pop()
+        if sparse_weeks:
+            user_data['weekly_data'], user_data['first_week'], user_data['last_week'] = \
+                trim_weekly_data(user_data['weekly_data'])
         
-        processed_data['users'].append(user_data)
+        profiler.rows('user_snapshots', rows_out=len(user_data['weekly_data']))
+        if processed_data is not None:
+            profiler.enter('json_write')
+            processed_data.add_user(user_data)
+        profiler.enter('user_project_membership')
         
         # 2. For processed_userKpis.json (matches userKpis_dev.json structure)
         # Get user's department from timesheet if available
-        user_department = "Unassigned"
-        user_timesheet = timesheet_df[timesheet_df['USERNAME'] == username]
-        if not user_timesheet.empty and 'Department' in user_timesheet.columns:
-            departments = user_timesheet['Department'].unique()
-            if len(departments) > 0:
-                user_department = departments[0]
+        user_department = user_departments.get(username, "Unassigned")
         
-        # Get projects this user is assigned to
-        user_projects = []
-        for project in processed_projects:
-            project_tickets = ticket_df[(ticket_df['project_name'] == project['name']) & 
-                                       (ticket_df['assignee'] == username)]
-            if not project_tickets.empty:
-                user_projects.append(project['name'])
+        # Get projects this user is assigned to, in project order
+        user_projects = sorted(user_project_names.get(username, ()), key=project_order.__getitem__)
+        profiler.enter('user_snapshots')
         
         # Get latest timeliness and utilization from annual summary
         timeliness = 0
@@ -432,21 +706,145 @@ def process_data():
         }
         
         processed_userkpis.append(user_entry)
+        if not latest_only:
+            profiler.enter('change_manifest')
+            changes.add('users', username, user_data, user_entry)
+
+    profiler.enter('json_write')
+    processed_data_path = processed_data.close() if processed_data is not None else None
+
+    # Save the cumulative totals as of the checkpoint week for the next incremental run
+    if incremental:
+        profiler.enter('incremental_state')
+        save_incremental_state(
+            checkpoint, fingerprint, weeks, resume_week, project_states,
+            project_ticket_snapshots, project_hours_snapshots, project_department_snapshots,
+            user_ticket_snapshots, user_hours_snapshots,
+            input_digests(ticket_df, timesheet_df, weeks[checkpoint]) if checkpoint >= 0 else None
+        )
 
     # Write output JSON files
-    with open(PROCESSED_DATA_PATH, 'w') as f:
-        json.dump(processed_data, f, indent=4)
-    
-    with open(PROCESSED_PROJECTS_PATH, 'w') as f:
-        json.dump(processed_projects, f, indent=4)
-    
-    with open(PROCESSED_USERKPIS_PATH, 'w') as f:
-        json.dump(processed_userkpis, f, indent=4)
+    profiler.enter('json_write')
+    # Written next to the target and renamed over it, so readers never see half a file
+    write_json_atomic(PROCESSED_PROJECTS_PATH, processed_projects, indent=4)
+    write_json_atomic(PROCESSED_USERKPIS_PATH, processed_userkpis, indent=4)
+    if charts is not None:
+        write_json_atomic(PROCESSED_CHARTS_PATH, charts.document(), separators=COMPACT_SEPARATORS)
+    if not latest_only:
+        profiler.enter('status_flow')
+        # The whole transition log, also on incremental runs: one sorted pass over it
+        flow = status_flow(ticket_df, static_data, weeks)
+        profiler.rows('status_flow', rows_in=len(ticket_df))
+        profiler.enter('json_write')
+        write_json_atomic(PROCESSED_FLOW_PATH, flow, separators=COMPACT_SEPARATORS)
+    # An incremental run's cube only holds the rows after the watermark
+    save_cube = resume_week < 0 and not latest_only
+    if save_cube:
+        hours_cube.save(HOURS_CUBE_PATH)
 
     print(f"Data processing complete. Output saved to:")
-    print(f"- {PROCESSED_DATA_PATH}")
+    if processed_data_path is not None:
+        print(f"- {processed_data_path}")
+        print(f"- {PROCESSED_CHARTS_PATH}")
+        print(f"- {PROCESSED_FLOW_PATH}")
     print(f"- {PROCESSED_PROJECTS_PATH}")
     print(f"- {PROCESSED_USERKPIS_PATH}")
+    if save_cube:
+        print(f"- {HOURS_CUBE_PATH}")
+
+    if backfill_periods:
+        backfill = {'period': period, 'periods': []}
+        for (label, start, end), date in backfill_periods:
+            total, per_user = period_ticket_counts[label]
+            backfill['periods'].append({
+                'as_of': date.isoformat(),
+                'label': label,
+                'start': start.date().isoformat(),
+                'end': (end - timedelta(days=1)).date().isoformat(),
+                'total_tickets': total,
+                'contribution': {
+                    username: (per_user.get(username, 0) / total) * 100 if total > 0 else 0
+                    for username in all_users
+                },
+            })
+        write_json_atomic(PROCESSED_CONTRIBUTIONS_PATH, backfill, indent=4)
+        print(f"- {PROCESSED_CONTRIBUTIONS_PATH} ({len(backfill_periods)} periods)")
+
+    if not latest_only:
+        profiler.enter('change_manifest')
+        changes.write({'format': output_format, 'sharded': sharded}, CHANGE_PATCH_PATH if patch else None)
+
+    profiler.rows('json_write', rows_in=len(processed_projects) + len(processed_userkpis))
+    profiler.rows('change_manifest', rows_in=len(processed_projects) + len(processed_userkpis))
+    if profile_path is not None:
+        profiler.write_report(profile_path)
 
 if __name__ == "__main__":
-    process_data()
+    parser = argparse.ArgumentParser(description="Process ticket and timesheet exports into KPI snapshots.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only process rows newer than the last run's watermark (see PROCESSING_STATE_PATH)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Always parse the CSV exports instead of reusing FRAME_CACHE_DIR")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of processes computing the per-project and per-user snapshots")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='pretty',
+                        help="'pretty' keeps the indented processed_data layout; 'compact' stores weekly_data "
+                             "as one array per metric along a shared week_end_date axis")
+    parser.add_argument('--sharded', action='store_true',
+                        help="Write processed_data as per-project / per-user files under PROCESSED_SHARD_DIR")
+    parser.add_argument('--profile', nargs='?', const=PROFILE_REPORT_PATH, metavar='REPORT_PATH',
+                        help="Record per-stage timings, row counts and memory, and write them as JSON "
+                             "(default: PROFILE_REPORT_PATH)")
+    parser.add_argument('--patch', action='store_true',
+                        help="Also write the added and changed projects and users to CHANGE_PATCH_PATH")
+    parser.add_argument('--as-of', type=parse_as_of, metavar='YYYY-MM-DD',
+                        help="Date the reporting period is taken relative to (default: today)")
+    parser.add_argument('--period', choices=REPORTING_PERIODS, default='calendar_year',
+                        help="Reporting period of user contribution")
+    parser.add_argument('--fiscal-year-start-month', type=int, default=1, choices=range(1, 13), metavar='MONTH',
+                        help="With --period fiscal_year, the month (1-12) the fiscal year starts in")
+    parser.add_argument('--backfill', nargs='+', type=parse_as_of, default=[], metavar='YYYY-MM-DD',
+                        help="Also compute contribution as of each of these dates, "
+                             "written to PROCESSED_CONTRIBUTIONS_PATH")
+    parser.add_argument('--sparse-weeks', action='store_true',
+                        help="Only write each project's and user's active range of weeks, marked by "
+                             "first_week / last_week (see scripts/explain_output.md); the dashboard "
+                             "page expects every week")
+    parser.add_argument('--store', action='store_true',
+                        help="Read the inputs from INPUT_STORE_DIR (filled by input_store.py) instead of the CSV exports")
+    parser.add_argument('--window-start', type=parse_as_of, metavar='YYYY-MM-DD',
+                        help="With --store, only read rows dated on or after this day")
+    parser.add_argument('--window-end', type=parse_as_of, metavar='YYYY-MM-DD',
+                        help="With --store, only read rows dated on or before this day")
+    parser.add_argument('--latest-only', action='store_true',
+                        help="Only compute the latest week and write the dashboard files (processed_projects, "
+                             "processed_userKpis), leaving processed_data to a full run")
+    parser.add_argument('--chart-points', type=int, metavar='N',
+                        help="Also give every project a chart series downsampled (LTTB) to at most N points "
+                             "in PROCESSED_CHARTS_PATH")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running and reprocess whenever the exports or config files change")
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help="With --watch, seconds the inputs must be stable before a run")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="With --watch, seconds between checks of the inputs")
+    args = parser.parse_args()
+    if args.chart_points is not None and args.chart_points < 3:
+        parser.error("--chart-points must be at least 3")
+
+    def run():
+        process_data(incremental=args.incremental, use_cache=not args.no_cache, workers=max(args.workers, 1),
+                     output_format=args.output_format, sharded=args.sharded, profile_path=args.profile,
+                     patch=args.patch, as_of=args.as_of, period=args.period,
+                     fiscal_year_start_month=args.fiscal_year_start_month, backfill_as_of=args.backfill,
+                     sparse_weeks=args.sparse_weeks, from_store=args.store, window_start=args.window_start,
+                     window_end=args.window_end, latest_only=args.latest_only,
+                     chart_points=args.chart_points)
+
+    if args.watch:
+        try:
+            watch_inputs(WATCHED_INPUT_PATHS, run, poll_interval=args.poll_interval, debounce=args.debounce)
+        except KeyboardInterrupt:
+            print("Stopped watching")
+    else:
+        run()
@@ -0,0 +1,66 @@
+import heapq
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Batches handed out per worker, so uneven partitions still balance out
+BATCHES_PER_WORKER = 4
+
+# Arrays attached by each worker process, keyed by name
+_worker_arrays = {}
+
+
+def _shared_dir():
+    """Prefers a RAM-backed directory for the shared arrays when there is one."""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return None
+
+
+def _attach(paths):
+    for name, path in paths.items():
+        _worker_arrays[name] = np.load(path, mmap_mode='r')
+
+
+def _run_batch(func, batch, args):
+    return [(index, func(_worker_arrays, task, *args)) for index, task in batch]
+
+
+def _batches(tasks, weights, n_batches):
+    """Splits tasks into batches of similar total weight, heaviest tasks first."""
+    heap = [(0, i, []) for i in range(n_batches)]
+    for index in sorted(range(len(tasks)), key=lambda i: -weights[i]):
+        load, i, batch = heapq.heappop(heap)
+        batch.append((index, tasks[index]))
+        heapq.heappush(heap, (load + weights[index], i, batch))
+    return [batch for _, _, batch in sorted(heap, key=lambda item: item[1]) if batch]
+
+
+def map_partitions(func, arrays, tasks, workers, args=(), weights=None):
+    """Runs `func(arrays, task, *args)` for every task on a pool of `workers` processes.
+
+    `arrays` is a dict of numpy arrays every task reads from (typically rows
+    sorted so that each task is a contiguous slice). They are written once to
+    memory-mapped files that the workers map read-only, so only the small task
+    descriptions and results travel between processes. Results come back in
+    task order, whatever order the workers finish in.
+    """
+    if weights is None:
+        weights = [1] * len(tasks)
+    results = [None] * len(tasks)
+
+    with tempfile.TemporaryDirectory(dir=_shared_dir(), prefix='kpi-pool-') as tmp_dir:
+        paths = {}
+        for name, array in arrays.items():
+            paths[name] = os.path.join(tmp_dir, f'{name}.npy')
+            np.save(paths[name], np.ascontiguousarray(array))
+
+        batches = _batches(tasks, weights, workers * BATCHES_PER_WORKER)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(paths,)) as pool:
+            futures = [pool.submit(_run_batch, func, batch, args) for batch in batches]
+            for future in futures:
+                for index, result in future.result():
+                    results[index] = result
+    return results
@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+# Periods user contribution can be reported over
+REPORTING_PERIODS = ('calendar_year', 'fiscal_year', 'rolling_52_weeks')
+
+
+def parse_as_of(value):
+    """Parses an --as-of date (YYYY-MM-DD); None means today."""
+    if value is None:
+        return date.today()
+    return date.fromisoformat(value)
+
+
+def reporting_period(kind, as_of, fiscal_year_start_month=1):
+    """Returns (label, start, end) of the reporting period of kind `kind` that contains `as_of`.
+
+    `start` is inclusive and `end` exclusive, both as midnight timestamps.
+    - calendar_year: the calendar year of `as_of`, labelled '2024'
+    - fiscal_year: the year starting on the first of `fiscal_year_start_month`,
+      labelled by the year it ends in ('FY2025' for April 2024 - March 2025)
+    - rolling_52_weeks: the 52 weeks ending on (and including) `as_of`
+    """
+    if kind == 'calendar_year':
+        start = date(as_of.year, 1, 1)
+        end = date(as_of.year + 1, 1, 1)
+        label = str(as_of.year)
+    elif kind == 'fiscal_year':
+        if not 1 <= fiscal_year_start_month <= 12:
+            raise ValueError(f"Fiscal year start month must be 1-12, got {fiscal_year_start_month}")
+        start_year = as_of.year if as_of.month >= fiscal_year_start_month else as_of.year - 1
+        start = date(start_year, fiscal_year_start_month, 1)
+        end = date(start_year + 1, fiscal_year_start_month, 1)
+        label = f"FY{end.year if fiscal_year_start_month > 1 else start_year}"
+    elif kind == 'rolling_52_weeks':
+        end = as_of + timedelta(days=1)
+        start = end - timedelta(weeks=52)
+        label = f"52w-{as_of.isoformat()}"
+    else:
+        raise ValueError(f"Unknown reporting period {kind!r}, expected one of {REPORTING_PERIODS}")
+    return label, pd.Timestamp(start), pd.Timestamp(end)
@@ -0,0 +1,307 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from process_pool import map_partitions
+from ticket_timeline import TicketTimeline
+
+# Fixed-point scale used to accumulate HOURS exactly (1/10000 hour)
+HOUR_SCALE = 10000
+
+# Ticket metrics tracked per week
+TICKET_METRICS = ('weight_score', 'status_weight', 'duration', 'completion')
+
+# Per-ticket values carried between runs by the incremental mode
+TICKET_STATE_FIELDS = (
+    'first_any_duration',
+    'first_duration',
+    'last_weight_score',
+    'last_status_weight',
+    'latest_status_weight',
+)
+
+# Per-row ticket arrays read by `_ticket_series`, next to the timeline's own
+_TICKET_ARRAYS = ('bins', 'weight_score', 'status_weight', 'duration', 'segment_tickets', 'weeks')
+
+
+def assign_week_bins(dates, weeks):
+    """Returns, for every date, the index of the first week ending on or after it.
+
+    Dates that fall after the last week (or could not be parsed) get len(weeks),
+    which means the row never shows up in any weekly snapshot.
+    """
+    week_values = np.asarray(weeks, dtype='datetime64[ns]')
+    date_values = np.asarray(dates, dtype='datetime64[ns]')
+    bins = np.searchsorted(week_values, date_values, side='left')
+    bins[np.isnat(date_values)] = len(week_values)
+    return bins
+
+
+def week_grid(ticket_df, timesheet_df):
+    """Returns (start_week, weeks): the week-end dates of the weekly snapshots.
+
+    The grid covers every ticket and timesheet date, from the Monday before the
+    earliest one to the Sunday after the latest one.
+    """
+    min_date = min(ticket_df['create_date'].min(), timesheet_df['DATE'].min())
+    max_date = max(ticket_df['current_status_changed_date'].max(), timesheet_df['DATE'].max())
+    # Start from the first Monday before the min_date and end on the last Sunday after the max_date
+    start_week = min_date - timedelta(days=min_date.weekday())
+    end_week = max_date + timedelta(days=(6 - max_date.weekday()))
+    weeks = pd.date_range(start=start_week, end=end_week, freq='W-MON') # Weekly snapshots ending on Sunday
+    return start_week, weeks
+
+
+def native(value):
+    """Converts numpy scalars to plain Python values so json.dump accepts them."""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def hour_units(hours):
+    """Returns HOURS as exact integer units plus the scale to divide by afterwards.
+
+    Timesheets log hours with a couple of decimals, so accumulating them as
+    integers keeps running totals exact and independent of summation order.
+    Falls back to plain floats when the values do not fit the fixed scale.
+    """
+    scaled = np.round(hours * HOUR_SCALE)
+    if np.all(np.isfinite(hours)) and np.all(scaled / HOUR_SCALE == hours):
+        return scaled.astype('int64'), HOUR_SCALE
+    return hours, 1
+
+
+def to_units(hours, scale):
+    """Converts already accumulated hours back to the units used by `hour_units`."""
+    hours = np.asarray(hours, dtype=float)
+    if scale == 1:
+        return hours
+    return np.round(hours * scale).astype('int64')
+
+
+def cumulative_bincount(keys, weights, n_rows, n_weeks):
+    """Sums weights per (row, week) key and accumulates them along the week axis."""
+    weekly = np.zeros(n_rows * (n_weeks + 1), dtype=weights.dtype)
+    np.add.at(weekly, keys, weights)
+    return weekly.reshape(n_rows, n_weeks + 1)[:, :n_weeks].cumsum(axis=1)
+
+
+def empty_ticket_metrics(n_weeks):
+    """Returns the ticket metrics of an entity without any tickets."""
+    return {
+        'weight_score': np.zeros(n_weeks),
+        'status_weight': np.zeros(n_weeks),
+        'duration': np.zeros(n_weeks),
+        'completion': np.zeros(n_weeks),
+        'total_duration': 0.0,
+    }
+
+
+def _ticket_series(timeline, segment_start, segment_end, arrays, state=None, checkpoint=None):
+    """Computes the cumulative weekly ticket metrics of one entity.
+
+    The entity's tickets are the timeline segments `segment_start` to
+    `segment_end`, in ticket_id order. For every week this reproduces what the
+    old per-week loop did on `tickets[current_status_changed_date <= week_end_date]`:
+    - weight_score / status_weight: sum of the last row (file order) per ticket
+    - duration: sum of the first row (file order) per ticket
+    - completion: status weight of the latest row (by changed date) per ticket
+      times its first duration, summed ticket by ticket
+    Only tickets with a status change in a week are looked up again (as of
+    that week's end) and sums run over tickets in ticket_id order, so floats
+    round exactly as before.
+
+    `state` holds per-ticket values from rows handled by an earlier run (all of
+    them earlier than the timeline's rows). When `checkpoint` is set, the
+    per-ticket values as of that week index are returned under 'state'.
+    """
+    bins, weight_score, status_weight, duration = (
+        arrays[name] for name in ('bins', 'weight_score', 'status_weight', 'duration')
+    )
+    weeks = arrays['weeks']
+    n_weeks = len(weeks)
+    series = empty_ticket_metrics(n_weeks)
+
+    segment_tickets = np.asarray(arrays['segment_tickets'][segment_start:segment_end])
+    state_codes = state['codes'] if state is not None else np.empty(0, dtype='int64')
+    ticket_codes = np.union1d(state_codes, segment_tickets)
+    n_tickets = len(ticket_codes)
+    local = np.searchsorted(ticket_codes, segment_tickets)
+
+    first_any = np.full(n_tickets, np.nan)
+    present = np.zeros(n_tickets, dtype=bool)
+    from_state = np.zeros(n_tickets, dtype=bool)
+    first_dur = np.zeros(n_tickets)
+    last_ws = np.zeros(n_tickets)
+    last_sw = np.zeros(n_tickets)
+    latest_sw = np.zeros(n_tickets)
+    if state is not None:
+        known = np.searchsorted(ticket_codes, state_codes)
+        present[known] = True
+        from_state[known] = True
+        first_any[known] = state['first_any_duration']
+        first_dur[known] = state['first_duration']
+        last_ws[known] = state['last_weight_score']
+        last_sw[known] = state['last_status_weight']
+        latest_sw[known] = state['latest_status_weight']
+
+    unset = np.isnan(first_any[local])
+    first_rows = timeline.first_rows_overall(np.arange(segment_start, segment_end))
+    first_any[local[unset]] = duration[first_rows[unset]]
+    if n_tickets:
+        series['total_duration'] = first_any.sum()
+
+    def capture():
+        return {
+            'codes': ticket_codes[present],
+            'first_any_duration': first_any[present],
+            'first_duration': first_dur[present],
+            'last_weight_score': last_ws[present],
+            'last_status_weight': last_sw[present],
+            'latest_status_weight': latest_sw[present],
+        }
+
+    def totals():
+        rows = np.flatnonzero(present)
+        if len(rows) == 0:
+            return (0.0, 0.0, 0.0, 0.0)
+        return (
+            np.sum(last_ws[rows]),
+            np.sum(last_sw[rows]),
+            np.sum(first_dur[rows]),
+            np.cumsum(latest_sw[rows] * first_dur[rows])[-1],
+        )
+
+    # The weeks in which each ticket has a status change inside the week grid
+    event_segments, event_rows = timeline.segment_events(segment_start, segment_end)
+    event_bins = bins[event_rows]
+    eligible = event_bins < n_weeks
+    stride = segment_end - segment_start + 1
+    touched = np.unique(event_bins[eligible] * stride + (event_segments[eligible] - segment_start))
+    touched_weeks, touched_segments = np.divmod(touched, stride)
+    active_weeks, starts = np.unique(touched_weeks, return_index=True)
+    ends = np.append(starts[1:], len(touched_segments))
+
+    current = totals()
+    previous_week = 0
+    for week, start, end in zip(active_weeks, starts, ends):
+        for name, value in zip(TICKET_METRICS, current):
+            series[name][previous_week:week] = value
+        if checkpoint is not None and week > checkpoint and 'state' not in series:
+            series['state'] = capture()
+
+        # Re-read the tickets changed this week as of the week's end
+        week_segments = touched_segments[start:end]
+        _, latest_rows, week_first_rows, week_last_rows = timeline.as_of(weeks[week], week_segments + segment_start)
+        tickets = local[week_segments]
+        last_ws[tickets] = weight_score[week_last_rows]
+        last_sw[tickets] = status_weight[week_last_rows]
+        new_tickets = ~from_state[tickets]
+        first_dur[tickets[new_tickets]] = duration[week_first_rows[new_tickets]]
+        latest_sw[tickets] = status_weight[latest_rows]
+        present[tickets] = True
+
+        current = totals()
+        previous_week = week
+
+    for name, value in zip(TICKET_METRICS, current):
+        series[name][previous_week:] = value
+    if checkpoint is not None and 'state' not in series:
+        series['state'] = capture()
+    return series
+
+
+def _ticket_partition(arrays, task, checkpoint):
+    """Pool task: computes the series of one entity from the shared timeline arrays."""
+    segment_start, segment_end, state = task
+    return _ticket_series(TicketTimeline.from_arrays(arrays), segment_start, segment_end, arrays, state, checkpoint)
+
+
+def ticket_snapshots(ticket_df, entity_col, weeks, bins=None, initial_states=None, checkpoint=None,
+                     workers=1):
+    """Computes cumulative weekly ticket metrics for every value of `entity_col`.
+
+    Returns a dict mapping entity -> dict of per-week numpy arrays
+    ('weight_score', 'status_weight', 'duration', 'completion') plus the
+    scalar 'total_duration' over all of the entity's tickets.
+
+    `initial_states` maps entity -> ticket state saved by an earlier run, and
+    `checkpoint` is the week index whose ticket state should be returned under
+    each entity's 'state' key, as JSON-ready lists keyed like
+    TICKET_STATE_FIELDS plus 'ticket_id'.
+
+    The rows are indexed once into a TicketTimeline with one segment per
+    (entity, ticket), sorted so that every entity is a contiguous range of
+    segments. With `workers` > 1 the entities are spread over a process pool
+    that shares the timeline arrays; results are identical to the serial run.
+    """
+    n_weeks = len(weeks)
+    initial_states = initial_states or {}
+    if bins is None:
+        bins = assign_week_bins(ticket_df['current_status_changed_date'], weeks)
+    # Sorted codes keep ticket_id order inside every entity subset
+    state_ids = [ticket_id for state in initial_states.values() for ticket_id in state['ticket_id']]
+    all_ids = pd.concat(
+        [ticket_df['ticket_id'], pd.Series(state_ids, dtype=ticket_df['ticket_id'].dtype)],
+        ignore_index=True
+    )
+    all_codes, ticket_ids = pd.factorize(all_ids, sort=True)
+    codes, state_codes = all_codes[:len(ticket_df)], all_codes[len(ticket_df):]
+
+    # One segment per (entity, ticket) pair, ordered by entity then ticket_id
+    groups = ticket_df.groupby(entity_col, sort=False).indices
+    entity_codes = np.full(len(ticket_df), -1, dtype='int64')
+    for i, positions in enumerate(groups.values()):
+        entity_codes[positions] = i
+    valid = (entity_codes >= 0) & (codes >= 0)
+    pair_codes = np.where(valid, entity_codes * max(len(ticket_ids), 1) + codes, -1)
+    pairs, segment_codes = np.unique(pair_codes, return_inverse=True)
+    if len(pairs) > 0 and pairs[0] < 0:
+        # Rows without an entity or ticket_id are not part of any segment
+        pairs, segment_codes = pairs[1:], segment_codes - 1
+    timeline = TicketTimeline.build(segment_codes, ticket_df['current_status_changed_date'], len(pairs))
+    segment_entities, segment_tickets = np.divmod(pairs, max(len(ticket_ids), 1))
+    entity_bounds = np.searchsorted(segment_entities, np.arange(len(groups) + 1))
+
+    arrays = dict(timeline.arrays(), **{
+        'bins': bins,
+        'weight_score': ticket_df['ticket_weight_score'].to_numpy(dtype=float),
+        'status_weight': ticket_df['status_weight'].to_numpy(dtype=float),
+        'duration': ticket_df['duration'].to_numpy(dtype=float),
+        'segment_tickets': segment_tickets,
+        'weeks': np.asarray(weeks, dtype='datetime64[ns]'),
+    })
+
+    states = {}
+    offset = 0
+    for entity, state in initial_states.items():
+        size = len(state['ticket_id'])
+        states[entity] = {field: np.asarray(state[field], dtype=float) for field in TICKET_STATE_FIELDS}
+        states[entity]['codes'] = state_codes[offset:offset + size]
+        offset += size
+
+    tasks = [
+        (int(entity_bounds[i]), int(entity_bounds[i + 1]), states.get(entity))
+        for i, entity in enumerate(groups)
+    ]
+    if workers > 1 and len(groups) > 1:
+        event_counts = timeline.offsets[entity_bounds[1:]] - timeline.offsets[entity_bounds[:-1]]
+        results = map_partitions(
+            _ticket_partition, arrays, tasks, workers, args=(checkpoint,), weights=event_counts.tolist()
+        )
+    else:
+        results = [_ticket_series(timeline, start, end, arrays, state, checkpoint) for start, end, state in tasks]
+    snapshots = dict(zip(groups, results))
+
+    for entity, state in states.items():
+        if entity not in snapshots:
+            snapshots[entity] = _ticket_series(timeline, 0, 0, arrays, state, checkpoint)
+
+    if checkpoint is not None:
+        for series in snapshots.values():
+            state = series['state']
+            series['state'] = {field: state[field].tolist() for field in TICKET_STATE_FIELDS}
+            series['state']['ticket_id'] = [native(ticket_ids[code]) for code in state['codes']]
+    return snapshots
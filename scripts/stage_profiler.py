@@ -0,0 +1,131 @@
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+REPORT_VERSION = 1
+
+
+def _max_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+class StageProfiler:
+    """Per-stage wall time, CPU time, row counts and memory for one pipeline run.
+
+    Exactly one stage is current at a time: `enter(name)` closes the current
+    stage and opens `name`. Entering a stage again adds to its totals, so a
+    loop can switch back and forth between stages per entity without nesting.
+    Peak memory is measured with tracemalloc (Python and numpy allocations) as
+    the highest traced memory during the stage minus the traced memory when
+    it was entered.
+
+    A disabled profiler does nothing, so the calls can stay in the hot path.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = {}
+        self.current = None
+        self.started = None
+        if enabled:
+            tracemalloc.start()
+            self.started = time.perf_counter()
+            self.started_cpu = time.process_time()
+
+    def _stage(self, name):
+        return self.stages.setdefault(name, {
+            'wall_seconds': 0.0,
+            'cpu_seconds': 0.0,
+            'rows_in': None,
+            'rows_out': None,
+            'peak_memory_delta_bytes': 0,
+            'max_rss_bytes': 0,
+            'entries': 0,
+        })
+
+    def _close_current(self):
+        if self.current is None:
+            return
+        name, wall_start, cpu_start, traced_start = self.current
+        stage = self._stage(name)
+        stage['wall_seconds'] += time.perf_counter() - wall_start
+        stage['cpu_seconds'] += time.process_time() - cpu_start
+        _, traced_peak = tracemalloc.get_traced_memory()
+        stage['peak_memory_delta_bytes'] = max(stage['peak_memory_delta_bytes'], traced_peak - traced_start)
+        stage['max_rss_bytes'] = _max_rss_bytes()
+        self.current = None
+
+    def enter(self, name):
+        """Makes `name` the current stage."""
+        if not self.enabled:
+            return
+        self._close_current()
+        tracemalloc.reset_peak()
+        traced, _ = tracemalloc.get_traced_memory()
+        self._stage(name)['entries'] += 1
+        self.current = (name, time.perf_counter(), time.process_time(), traced)
+
+    def rows(self, name, rows_in=None, rows_out=None):
+        """Adds to the rows a stage consumed and produced."""
+        if not self.enabled:
+            return
+        stage = self._stage(name)
+        if rows_in is not None:
+            stage['rows_in'] = (stage['rows_in'] or 0) + int(rows_in)
+        if rows_out is not None:
+            stage['rows_out'] = (stage['rows_out'] or 0) + int(rows_out)
+
+    def count(self, name, n=1):
+        """Adds `n` to an iteration counter."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self):
+        """Closes the current stage and returns the report as a dict."""
+        self._close_current()
+        report = {
+            'version': REPORT_VERSION,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'total_wall_seconds': time.perf_counter() - self.started,
+            'total_cpu_seconds': time.process_time() - self.started_cpu,
+            'max_rss_bytes': _max_rss_bytes(),
+            'stages': self.stages,
+            'counters': self.counters,
+        }
+        tracemalloc.stop()
+        return report
+
+    @staticmethod
+    def summary_table(report):
+        """Formats a report as a fixed-width table, one line per stage."""
+        header = f"{'stage':<26}{'wall s':>10}{'cpu s':>10}{'rows in':>12}{'rows out':>12}{'peak MiB':>10}"
+        lines = [header, '-' * len(header)]
+        for name, stage in report['stages'].items():
+            rows_in = '-' if stage['rows_in'] is None else stage['rows_in']
+            rows_out = '-' if stage['rows_out'] is None else stage['rows_out']
+            lines.append(
+                f"{name:<26}{stage['wall_seconds']:>10.3f}{stage['cpu_seconds']:>10.3f}"
+                f"{rows_in:>12}{rows_out:>12}{stage['peak_memory_delta_bytes'] / 1024 ** 2:>10.1f}"
+            )
+        lines.append('-' * len(header))
+        lines.append(f"{'total':<26}{report['total_wall_seconds']:>10.3f}{report['total_cpu_seconds']:>10.3f}")
+        for name, value in report['counters'].items():
+            lines.append(f"{name}: {value}")
+        return '\n'.join(lines)
+
+    def write_report(self, path):
+        """Finishes profiling, writes the JSON report and prints the summary table."""
+        report = self.finish()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(self.summary_table(report))
+        print(f"Profile report saved to {path}")
+        return report
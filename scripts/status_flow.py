@@ -0,0 +1,339 @@
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from snapshot_engine import assign_week_bins, native, week_grid
+from status_weights import map_status_weights
+
+# Quantiles reported for every distribution
+FLOW_QUANTILES = (0.5, 0.9)
+# Relative error of the sketched quantiles
+SKETCH_RELATIVE_ACCURACY = 0.01
+# Durations (in days) below about a minute share the lowest sketch bucket,
+# and (absurd) ones above about a century the highest
+SKETCH_MIN_VALUE = 1 / 1440
+SKETCH_MAX_VALUE = 36500
+# Counted sketch cells held back before they are merged into the table
+SKETCH_MERGE_MIN = 1 << 18
+# A status at (or above) this weight means the ticket is done
+DONE_WEIGHT = 1.0
+# Metrics besides the time in each status
+LEAD_TIME = 'lead_time'
+CYCLE_TIME = 'cycle_time'
+# Status rows walked (and sketched) at a time; a chunk always holds whole tickets
+FLOW_CHUNK_ROWS = 100_000
+
+_SECONDS_PER_DAY = 86400.0
+
+
+def _count_cells(cells, counts):
+    """Sorts (cell, count) entries by cell, summing the counts of equal cells."""
+    # Stable sorting runs on int64 is a merge, so concatenated sorted tables sort fast
+    order = np.argsort(cells, kind='stable')
+    cells, counts = cells[order], counts[order]
+    first = np.ones(len(cells), dtype=bool)
+    first[1:] = cells[1:] != cells[:-1]
+    starts = np.flatnonzero(first)
+    return cells[starts], np.add.reduceat(counts, starts) if len(starts) else counts
+
+
+class QuantileSketches:
+    """Quantile sketches of non-negative values, one per integer key, in bounded memory.
+
+    Each sketch counts its values in logarithmic buckets (as in DDSketch), so
+    every quantile is within `relative_accuracy` of an actual value of the
+    stream; values below `min_value` share the lowest bucket and values above
+    `max_value` the highest, which bounds the number of buckets a sketch can
+    use. All the sketches are one table of (key, bucket) cells, each packed
+    into one integer, with their counts, sorted by key and bucket, so memory
+    follows the keys and their buckets, never the number of values. Added
+    values are counted per cell straight away but only merged into the table
+    once as many cells are pending as the table holds (and at least
+    SKETCH_MERGE_MIN), so adding a stream in chunks does not re-sort the
+    whole table for every chunk.
+    """
+
+    def __init__(self, relative_accuracy=SKETCH_RELATIVE_ACCURACY, min_value=SKETCH_MIN_VALUE,
+                 max_value=SKETCH_MAX_VALUE):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.min_bucket = int(np.ceil(np.log(min_value) / self.log_gamma))
+        self.max_bucket = int(np.ceil(np.log(max_value) / self.log_gamma))
+        # Cells per key: slot 0 holds the zeros (which have no logarithm), slot
+        # 1 + b - min_bucket bucket b
+        self.n_slots = self.max_bucket - self.min_bucket + 2
+        self.cells = np.empty(0, dtype='int64')
+        self.counts = np.empty(0, dtype='int64')
+        self.pending = []
+        self.pending_size = 0
+
+    def add(self, keys, values):
+        """Adds every value to the sketch of its key."""
+        values = np.asarray(values, dtype=float)
+        slots = np.zeros(len(values), dtype='int64')
+        positive = values > 0
+        buckets = np.clip(np.ceil(np.log(values[positive]) / self.log_gamma), self.min_bucket, self.max_bucket)
+        slots[positive] = buckets - self.min_bucket + 1
+        counted = _count_cells(np.asarray(keys, dtype='int64') * self.n_slots + slots, np.ones(len(values), dtype='int64'))
+        self.pending.append(counted)
+        self.pending_size += len(counted[0])
+        if self.pending_size >= max(len(self.cells), SKETCH_MERGE_MIN):
+            self._merge()
+
+    def _merge(self):
+        if not self.pending:
+            return
+        parts = [(self.cells, self.counts)] + self.pending
+        self.pending = []
+        self.pending_size = 0
+        self.cells, self.counts = _count_cells(*(np.concatenate(column) for column in zip(*parts)))
+
+    def quantiles(self, qs):
+        """Returns (keys, value counts, {q: values}) of every non-empty sketch, by key.
+
+        The value at quantile q is the nearest-rank one: the ceil(q * count)-th
+        smallest, so a tail quantile of a few values is the largest of them
+        rather than collapsing onto the smallest. It is given as the middle
+        (in relative terms) of the bucket holding it.
+        """
+        self._merge()
+        keys, slots = np.divmod(self.cells, self.n_slots)
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        starts = np.flatnonzero(first)
+        totals = np.add.reduceat(self.counts, starts) if len(starts) else self.counts
+        cumulative = np.cumsum(self.counts)
+        before = cumulative[starts] - self.counts[starts]
+        values = {}
+        for q in qs:
+            # Rounded first, so e.g. 0.9 * 30 is not taken for a bit more than 27
+            rank = np.maximum(np.ceil(np.round(q * totals, 9)).astype('int64') - 1, 0)
+            found = slots[np.searchsorted(cumulative, before + rank, side='right')]
+            middle = 2 * self.gamma ** (found + self.min_bucket - 1).astype(float) / (self.gamma + 1)
+            values[q] = np.where(found == 0, 0.0, middle)
+        return keys[starts], totals, values
+
+
+def _chunk_intervals(ticket_df, events, new_ticket, status_weights):
+    """Stays and completions of the whole tickets whose sorted status rows are `events`."""
+    dates = ticket_df['current_status_changed_date'].array.take(events).to_numpy(dtype='datetime64[ns]')
+    # Only compared within the chunk, so chunk-local codes do
+    status_codes = pd.factorize(ticket_df['current_status'].array.take(events))[0]
+    done = status_weights[events] >= DONE_WEIGHT
+    started = status_weights[events] > 0
+
+    ticket_starts = np.flatnonzero(new_ticket)
+    ticket_ends = np.append(ticket_starts[1:], len(events)) - 1
+    # A stay starts wherever the status changes within a ticket and ends at the next stay
+    stay_start = new_ticket.copy()
+    stay_start[1:] |= status_codes[1:] != status_codes[:-1]
+    starts = np.flatnonzero(stay_start)
+    ends = np.append(starts[1:], len(events))
+    closed = np.append(~new_ticket[ends[:-1]], False) if len(starts) else np.zeros(0, dtype=bool)
+    closed &= status_codes[starts] >= 0
+    stay_rows, end_rows = starts[closed], ends[closed]
+    stays = pd.DataFrame({
+        'project_name': ticket_df['project_name'].array.take(events[stay_rows]),
+        'assignee': ticket_df['assignee'].array.take(events[stay_rows]),
+        'status': ticket_df['current_status'].array.take(events[stay_rows]),
+        'end': dates[end_rows],
+        'days': (dates[end_rows] - dates[stay_rows]) / np.timedelta64(1, 's') / _SECONDS_PER_DAY,
+    })
+
+    # A ticket done as of its latest row was completed by the first row of its
+    # trailing done rows (the ticket may go from approve to drop, say)
+    completed = done[ticket_ends]
+    ticket_starts, ticket_ends = ticket_starts[completed], ticket_ends[completed]
+    not_done_rows = np.flatnonzero(~done)
+    last_not_done = np.searchsorted(not_done_rows, ticket_ends, side='right') - 1
+    last_not_done = np.where(last_not_done >= 0, not_done_rows[np.maximum(last_not_done, 0)], -1)
+    completion_rows = np.maximum(last_not_done + 1, ticket_starts)
+    # Work starts with the ticket's first row of non-zero weight
+    started_rows = np.flatnonzero(started)
+    first_started = np.searchsorted(started_rows, ticket_starts)
+    first_started = np.where(first_started < len(started_rows),
+                             started_rows[np.minimum(first_started, len(started_rows) - 1)], len(events))
+    completion_dates = dates[completion_rows]
+    created = ticket_df['create_date'].array.take(events[completion_rows]).to_numpy(dtype='datetime64[ns]')
+    work_started = np.where(first_started <= ticket_ends, dates[np.minimum(first_started, len(events) - 1)],
+                            np.datetime64('NaT'))
+    completions = pd.DataFrame({
+        'project_name': ticket_df['project_name'].array.take(events[completion_rows]),
+        'assignee': ticket_df['assignee'].array.take(events[completion_rows]),
+        'end': completion_dates,
+        LEAD_TIME: (completion_dates - created) / np.timedelta64(1, 's') / _SECONDS_PER_DAY,
+        CYCLE_TIME: (completion_dates - work_started) / np.timedelta64(1, 's') / _SECONDS_PER_DAY,
+    })
+    return stays, completions
+
+
+def status_intervals(ticket_df, status_weights, chunk_rows=FLOW_CHUNK_ROWS):
+    """Walks the status transitions once, sorted by ticket and change date.
+
+    Consecutive rows of a ticket with the same status are one stay in that
+    status, lasting until the ticket's next change of status; the stay a
+    ticket is still in has no end yet and is left out. A ticket whose latest
+    status is done (a weight of at least DONE_WEIGHT) is completed when it
+    last became done: its lead time runs from create_date and its cycle time
+    from its first status with a non-zero weight (work started).
+
+    The tickets are walked in chunks of whole tickets, about `chunk_rows`
+    status rows each. Yields, per chunk, two frames of durations in days: the
+    stays (project_name, assignee, status, end, days) and the completed
+    tickets (project_name, assignee, end, lead_time, cycle_time; NaN where a
+    date is missing). The project and assignee are those of the row that
+    opened the stay, or that completed the ticket.
+    """
+    # Only the sort order and the ticket boundaries span the whole log; the
+    # rest is taken chunk by chunk
+    changed = ticket_df['current_status_changed_date']
+    ticket_codes = pd.factorize(ticket_df['ticket_id'], sort=True)[0]
+    # Stable, so rows changed at the same time keep their file order; rows
+    # without a change date sort last within their ticket and are dropped
+    events = np.lexsort((changed.to_numpy(), ticket_codes))
+    events = events[changed.notna().to_numpy()[events]]
+    ticket_codes = ticket_codes[events]
+    new_ticket = np.ones(len(events), dtype=bool)
+    new_ticket[1:] = ticket_codes[1:] != ticket_codes[:-1]
+    del ticket_codes
+    ticket_starts = np.flatnonzero(new_ticket)
+    # Chunks start at the first row of the ticket holding every chunk_rows-th row
+    bounds = np.unique(ticket_starts[
+        np.searchsorted(ticket_starts, np.arange(0, len(events), chunk_rows), side='right') - 1
+    ])
+    for lo, hi in zip(bounds, np.append(bounds[1:], len(events))):
+        yield _chunk_intervals(ticket_df, events[lo:hi], new_ticket[lo:hi], status_weights)
+
+
+def _distribution(counts, values, index):
+    distribution = {'count': int(counts[index])}
+    for q in FLOW_QUANTILES:
+        distribution[f'p{round(q * 100)}'] = round(float(values[q][index]), 3)
+    return distribution
+
+
+def _weekly_distributions(week_labels, weeks, counts, values, indices):
+    weekly = {'week_end_date': [week_labels[week] for week in weeks], 'count': counts[indices].tolist()}
+    for q in FLOW_QUANTILES:
+        weekly[f'p{round(q * 100)}'] = np.round(values[q][indices], 3).tolist()
+    return weekly
+
+
+class FlowSketches:
+    """Duration sketches per project and per assignee, fed one chunk of durations at a time.
+
+    Every (entity, metric) gets its overall distribution plus one per week of
+    `end`, listed for the weeks that have any value. Entities and metrics are
+    coded against the lists given up front, so the result does not depend
+    on how the durations are chunked; memory follows the sketches, not the
+    number of durations added.
+    """
+
+    def __init__(self, weeks, projects, assignees, metrics):
+        self.weeks = weeks
+        self.entities = {'projects': pd.Index(projects), 'assignees': pd.Index(assignees)}
+        self.metrics = pd.Index(metrics)
+        self.sketches = {scope: QuantileSketches() for scope in self.entities}
+
+    def add(self, durations):
+        """Adds `durations` (project_name, assignee, metric, end, days) to the sketches.
+
+        Negative durations (dates out of order in the export) and missing ones
+        are skipped.
+        """
+        n_weeks = len(self.weeks)
+        days = durations['days'].to_numpy(dtype=float)
+        valid = np.isfinite(days) & (days >= 0)
+        durations, days = durations[valid], days[valid]
+        week_bins = assign_week_bins(durations['end'], self.weeks)
+        metric_codes = self.metrics.get_indexer(durations['metric'])
+        for scope, column in (('projects', 'project_name'), ('assignees', 'assignee')):
+            entity_codes = self.entities[scope].get_indexer(durations[column])
+            known = entity_codes >= 0
+            series = (entity_codes[known].astype('int64') * len(self.metrics) + metric_codes[known]) * (n_weeks + 2)
+            # Every value counts in its week and overall (slot n_weeks + 1; n_weeks is past the grid)
+            self.sketches[scope].add(
+                np.concatenate([series + week_bins[known], series + n_weeks + 1]), np.tile(days[known], 2)
+            )
+
+    def document(self):
+        """The p50/p90 distributions of every (entity, metric) that has any duration."""
+        week_labels = [week.strftime('%Y-%m-%d') for week in self.weeks]
+        n_weeks = len(self.weeks)
+        all_weeks = n_weeks + 1
+        document = {
+            'unit': 'days',
+            'quantiles': list(FLOW_QUANTILES),
+            'relative_accuracy': SKETCH_RELATIVE_ACCURACY,
+            'as_of': week_labels[-1] if week_labels else None,
+        }
+        for scope, column in (('projects', 'project_name'), ('assignees', 'assignee')):
+            entities = self.entities[scope]
+            keys, counts, values = self.sketches[scope].quantiles(FLOW_QUANTILES)
+            series, week_slots = np.divmod(keys, n_weeks + 2)
+            # Keys are sorted, so every (entity, metric) is a run ending with its overall slot
+            run_ends = np.flatnonzero(week_slots == all_weeks)
+            run_starts = np.append(0, run_ends[:-1] + 1)
+            entries = {}
+            for start, end in zip(run_starts, run_ends):
+                entity_code, metric_code = divmod(int(series[end]), len(self.metrics))
+                entry = entries.setdefault(entity_code, {'time_in_status': {}})
+                distribution = _distribution(counts, values, end)
+                in_grid = np.arange(start, end)[week_slots[start:end] < n_weeks]
+                distribution['weekly'] = _weekly_distributions(week_labels, week_slots[in_grid], counts, values, in_grid)
+                metric = self.metrics[metric_code]
+                if metric in (LEAD_TIME, CYCLE_TIME):
+                    entry[metric] = distribution
+                else:
+                    entry['time_in_status'][metric] = distribution
+            document[scope] = [
+                {column: native(entities[entity_code]),
+                 **{metric: entries[entity_code][metric] for metric in (LEAD_TIME, CYCLE_TIME) if metric in entries[entity_code]},
+                 'time_in_status': dict(sorted(entries[entity_code]['time_in_status'].items()))}
+                for entity_code in sorted(entries)
+            ]
+        return document
+
+
+def status_flow(ticket_df, static_data, weeks):
+    """Time in each status, lead time and cycle time of the tickets, as p50/p90 per project and assignee.
+
+    See status_intervals for how the durations are measured and FlowSketches
+    for how they are aggregated; stays count in the week the ticket left the
+    status, lead and cycle times in the week it was completed. Each chunk of
+    tickets is sketched as soon as it is walked, so memory does not grow with
+    the number of transitions.
+    """
+    status_weights, _ = map_status_weights(ticket_df, static_data)
+    statuses = pd.factorize(ticket_df['current_status'], sort=True)[1]
+    sketches = FlowSketches(
+        weeks,
+        pd.factorize(ticket_df['project_name'], sort=True)[1],
+        pd.factorize(ticket_df['assignee'], sort=True)[1],
+        [status for status in statuses if status not in (LEAD_TIME, CYCLE_TIME)] + [LEAD_TIME, CYCLE_TIME],
+    )
+    for stays, completions in status_intervals(ticket_df, status_weights):
+        sketches.add(stays.rename(columns={'status': 'metric'}))
+        for metric in (LEAD_TIME, CYCLE_TIME):
+            sketches.add(completions[['project_name', 'assignee', 'end']].assign(metric=metric, days=completions[metric]))
+    return sketches.document()
+
+
+if __name__ == "__main__":
+    from csv_ingest import load_ticket_data, load_timesheet_data
+    from output_writer import COMPACT_SEPARATORS, write_json_atomic
+    from process_data import PROCESSED_FLOW_PATH, STATIC_DATA_PATH, TICKET_DATA_PATH, TIMESHEET_DATA_PATH
+
+    parser = argparse.ArgumentParser(description="Time-in-status, lead time and cycle time distributions.")
+    parser.add_argument('--output', default=PROCESSED_FLOW_PATH)
+    args = parser.parse_args()
+
+    ticket_df = load_ticket_data(TICKET_DATA_PATH)
+    timesheet_df = load_timesheet_data(TIMESHEET_DATA_PATH)
+    with open(STATIC_DATA_PATH, 'r') as f:
+        static_data = json.load(f)
+    _, weeks = week_grid(ticket_df, timesheet_df)
+    write_json_atomic(args.output, status_flow(ticket_df, static_data, weeks), separators=COMPACT_SEPARATORS)
+    print(f"Status flow written to {args.output}")
@@ -0,0 +1,291 @@
+import argparse
+import copy
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from hours_cube import HoursCube
+from snapshot_engine import assign_week_bins, week_grid
+from status_weights import compile_weight_table
+from ticket_timeline import TicketTimeline
+
+# Scenario evaluated next to the candidates: the weights of static_data.json as they are
+CURRENT_SCENARIO = 'current'
+# Where the CLI writes the side-by-side comparison
+SCENARIOS_OUTPUT_PATH = '../src/data/processed_scenarios.json'
+
+# Weight-dependent ticket terms: (row the status is read from, coefficient)
+# - status_weight: status of the last row (file order) per ticket, counted once
+# - weight_score: same status, times the duration of that row
+# - completion: status of the latest row (by changed date), times the first duration
+WEIGHTED_TERMS = ('status_weight', 'weight_score', 'completion')
+
+
+def merge_weight_tables(static_data, overrides):
+    """Returns static_data with the weight tables of `overrides` applied on top.
+
+    `overrides` maps a table name ('default' or a project) to {status: weight};
+    only the listed statuses change. A project without its own table starts
+    from a copy of 'default'.
+    """
+    merged = copy.deepcopy(static_data)
+    for table_name, weights in overrides.items():
+        if not isinstance(weights, dict):
+            raise ValueError(f"Weight table {table_name!r} must map statuses to weights")
+        for status, weight in weights.items():
+            if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+                raise ValueError(f"Weight of {status!r} in {table_name!r} must be a number, got {weight!r}")
+        table = merged.setdefault(table_name, dict(merged.get('default', {})))
+        table.update(weights)
+    return merged
+
+
+class _TicketTerms:
+    """Per-entity ticket terms of the weekly snapshots, linear in the status weights.
+
+    For every (entity, ticket) the timeline is read as of each week the ticket
+    changes in. Each weighted term is kept as sparse weekly deltas: at such a
+    week the ticket's previous (status, coefficient) is taken out and the new
+    one put in. A weight vector over (project, status) pairs turns the deltas
+    into weekly sums with one bincount and a cumulative sum along the weeks.
+    The unweighted durations are summed once here.
+    """
+
+    def __init__(self, ticket_df, entity_col, weeks, bins, pair_keys, duration):
+        n_weeks = len(weeks)
+        entity_codes, entities = pd.factorize(ticket_df[entity_col])
+        ticket_codes, ticket_ids = pd.factorize(ticket_df['ticket_id'], sort=True)
+        n_ticket_ids = max(len(ticket_ids), 1)
+        valid = (entity_codes >= 0) & (ticket_codes >= 0)
+        pair_codes = np.where(valid, entity_codes.astype('int64') * n_ticket_ids + ticket_codes, -1)
+        pairs, segment_codes = np.unique(pair_codes, return_inverse=True)
+        if len(pairs) > 0 and pairs[0] < 0:
+            pairs, segment_codes = pairs[1:], segment_codes - 1
+        n_segments = len(pairs)
+        timeline = TicketTimeline.build(segment_codes, ticket_df['current_status_changed_date'], n_segments)
+        segment_entities = pairs // n_ticket_ids
+
+        self.entities = list(entities)
+        self.n_weeks = n_weeks
+        first_rows = timeline.first_rows_overall(np.arange(n_segments))
+        self.total_duration = np.bincount(segment_entities, weights=duration[first_rows], minlength=len(entities))
+
+        # Every (week, segment) with a status change inside the week grid
+        event_segments, event_rows = timeline.segment_events(0, n_segments)
+        event_bins = bins[event_rows]
+        eligible = event_bins < n_weeks
+        touched = np.unique(event_bins[eligible] * max(n_segments, 1) + event_segments[eligible])
+        touched_weeks, touched_segments = np.divmod(touched, max(n_segments, 1))
+        latest_rows = np.empty(len(touched), dtype='int64')
+        week_first_rows = np.empty(len(touched), dtype='int64')
+        week_last_rows = np.empty(len(touched), dtype='int64')
+        week_values = np.asarray(weeks, dtype='datetime64[ns]')
+        active_weeks, starts = np.unique(touched_weeks, return_index=True)
+        ends = np.append(starts[1:], len(touched))
+        for week, start, end in zip(active_weeks, starts, ends):
+            _, latest_rows[start:end], week_first_rows[start:end], week_last_rows[start:end] = \
+                timeline.as_of(week_values[week], touched_segments[start:end])
+
+        # Order the touches ticket by ticket so each one follows the ticket's previous touch
+        order = np.lexsort((touched_weeks, touched_segments))
+        touched_weeks, touched_segments = touched_weeks[order], touched_segments[order]
+        latest_rows, week_first_rows, week_last_rows = latest_rows[order], week_first_rows[order], week_last_rows[order]
+        has_previous = np.zeros(len(touched), dtype=bool)
+        has_previous[1:] = touched_segments[1:] == touched_segments[:-1]
+        previous = np.flatnonzero(has_previous)
+        cells = segment_entities[touched_segments] * n_weeks + touched_weeks
+        self.n_cells = len(entities) * n_weeks
+
+        first_duration = duration[week_first_rows]
+        duration_deltas = first_duration.copy()
+        duration_deltas[previous] -= first_duration[previous - 1]
+        self.duration = self._accumulate(np.bincount(cells, weights=duration_deltas, minlength=self.n_cells))
+
+        self.terms = {}
+        for name, keys, coefficients in (
+            ('status_weight', pair_keys[week_last_rows], np.ones(len(touched))),
+            ('weight_score', pair_keys[week_last_rows], duration[week_last_rows]),
+            ('completion', pair_keys[latest_rows], first_duration),
+        ):
+            # The new (status, coefficient) of every touch, minus the one it replaces
+            self.terms[name] = (
+                np.concatenate([cells, cells[previous]]),
+                np.concatenate([keys, keys[previous - 1]]),
+                np.concatenate([coefficients, -coefficients[previous - 1]]),
+            )
+
+    def _accumulate(self, weekly_deltas):
+        return weekly_deltas.reshape(len(self.entities), self.n_weeks).cumsum(axis=1)
+
+    def weighted(self, name, weight_vectors):
+        """Weekly sums of a weighted term, one (entities x weeks) matrix per column of `weight_vectors`."""
+        cells, keys, coefficients = self.terms[name]
+        values = coefficients[:, None] * weight_vectors[keys]
+        return [
+            self._accumulate(np.bincount(cells, weights=values[:, i], minlength=self.n_cells))
+            for i in range(weight_vectors.shape[1])
+        ]
+
+
+class StatusScenarios:
+    """What-if evaluation of the weighted KPIs under alternative status weight tables.
+
+    Building reads the ticket timeline once per entity kind; after that, each
+    candidate weight table is a weight vector over the (project, status)
+    pairs, and kpis_ratio, completion_rate and user_timeliness_score of every
+    project, user and week follow from a few vectorized sums. Several
+    candidates are evaluated together in one call. Figures match process_data
+    up to float rounding (sums are taken in another order).
+    """
+
+    def __init__(self, ticket_df, timesheet_df, static_data, projects_admin_data):
+        self.static_data = static_data
+        hours_per_manday = static_data.get('config', {}).get('hours_per_manday', 8)
+        ticket_df = ticket_df.copy()
+        ticket_df['duration'] = (ticket_df['due_date'] - ticket_df['start_date']).dt.days.fillna(0)
+        _, self.weeks = week_grid(ticket_df, timesheet_df)
+        self.week_labels = [week.strftime('%Y-%m-%d') for week in self.weeks]
+
+        project_codes, projects = pd.factorize(ticket_df['project_name'])
+        status_codes, statuses = pd.factorize(ticket_df['current_status'])
+        self.projects, self.statuses = list(projects), list(statuses)
+        # Same layout as compile_weight_table: missing names index the extra row / column
+        pair_keys = (
+            np.where(project_codes < 0, len(projects), project_codes).astype('int64') * (len(statuses) + 1)
+            + np.where(status_codes < 0, len(statuses), status_codes)
+        )
+        duration = ticket_df['duration'].to_numpy(dtype=float)
+        bins = assign_week_bins(ticket_df['current_status_changed_date'], self.weeks)
+        self.project_terms = _TicketTerms(ticket_df, 'project_name', self.weeks, bins, pair_keys, duration)
+        self.user_terms = _TicketTerms(ticket_df, 'assignee', self.weeks, bins, pair_keys, duration)
+
+        project_hours = HoursCube.build(timesheet_df, self.weeks).entity_hours('project')
+        empty_hours = np.zeros(len(self.weeks))
+        self.project_mandays = np.array(
+            [project_hours.get(project_name, empty_hours) for project_name in self.project_terms.entities]
+        ).reshape(len(self.project_terms.entities), len(self.weeks)) / hours_per_manday
+        allocations = {p['project_name']: p.get('allocatedMandays', 0) for p in projects_admin_data}
+        self.allocations = np.array(
+            [allocations.get(project_name, 0) for project_name in self.project_terms.entities], dtype=float
+        )
+
+    def weight_vectors(self, scenarios):
+        """Turns {name: weight table overrides} into a (pairs x scenarios) weight matrix."""
+        vectors = []
+        for overrides in scenarios.values():
+            weights, _ = compile_weight_table(
+                merge_weight_tables(self.static_data, overrides), self.projects, self.statuses
+            )
+            vectors.append(weights.ravel())
+        return np.column_stack(vectors) if vectors else np.zeros(((len(self.projects) + 1) * (len(self.statuses) + 1), 0))
+
+    def evaluate(self, scenarios):
+        """Evaluates several weight scenarios side by side.
+
+        `scenarios` maps a scenario name to weight table overrides (see
+        merge_weight_tables; {} is the current weights). Returns
+        {name: {'projects': {metric: matrix}, 'users': {metric: matrix}}} with
+        one (entities x weeks) matrix per metric, rows in the order of
+        `project_names()` / `usernames()`.
+        """
+        vectors = self.weight_vectors(scenarios)
+        projects, users = self.project_terms, self.user_terms
+        project_status = projects.weighted('status_weight', vectors)
+        project_completion = projects.weighted('completion', vectors)
+        user_weight_score = users.weighted('weight_score', vectors)
+
+        allocations = self.allocations[:, None]
+        total_duration = projects.total_duration[:, None]
+        results = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for i, name in enumerate(scenarios):
+                kpi_numerator = np.where(projects.duration > 0, project_status[i] / projects.duration, 0)
+                kpis_ratio = np.where(
+                    (allocations > 0) & (self.project_mandays > 0),
+                    kpi_numerator / (self.project_mandays / allocations), 0
+                )
+                completion_rate = np.where(total_duration > 0, project_completion[i] / total_duration * 100, 0)
+                timeliness = np.where(users.duration > 0, user_weight_score[i] / users.duration, 0)
+                results[name] = {
+                    'projects': {'kpis_ratio': kpis_ratio, 'completion_rate': completion_rate},
+                    'users': {'user_timeliness_score': timeliness},
+                }
+        return results
+
+    def project_names(self):
+        return self.project_terms.entities
+
+    def usernames(self):
+        return self.user_terms.entities
+
+    def comparison(self, results):
+        """JSON-ready view of `evaluate()` results: per scenario, entity and metric, the weekly series."""
+        names = {'projects': self.project_names(), 'users': self.usernames()}
+        return {
+            'week_end_date': self.week_labels,
+            'scenarios': {
+                scenario: {
+                    section: {
+                        entity: {metric: matrix[row].tolist() for metric, matrix in metrics.items()}
+                        for row, entity in enumerate(names[section])
+                    }
+                    for section, metrics in sections.items()
+                }
+                for scenario, sections in results.items()
+            },
+        }
+
+
+def print_latest(scenarios, results, row_names):
+    """Prints the latest week's project KPIs of every scenario side by side."""
+    names = list(scenarios)
+    print(f"{'project':<24}{'metric':<18}" + ''.join(f"{name:>16}" for name in names))
+    for row, project_name in enumerate(row_names):
+        for metric in ('kpis_ratio', 'completion_rate'):
+            values = ''.join(f"{results[name]['projects'][metric][row, -1]:>16.4f}" for name in names)
+            print(f"{str(project_name):<24}{metric:<18}{values}")
+
+
+if __name__ == "__main__":
+    from csv_ingest import load_ticket_data, load_timesheet_data
+    from frame_cache import cached_frame
+    from output_writer import write_json_atomic
+    from process_data import (
+        FRAME_CACHE_DIR,
+        FRAME_CACHE_MAX_BYTES,
+        PROJECTS_ADMIN_PATH,
+        STATIC_DATA_PATH,
+        TICKET_DATA_PATH,
+        TIMESHEET_DATA_PATH,
+    )
+
+    parser = argparse.ArgumentParser(description="Compare the KPIs under alternative status weight tables.")
+    parser.add_argument('candidates',
+                        help="JSON file mapping a scenario name to weight table overrides, "
+                             "e.g. {\"lower hold\": {\"twh\": {\"hold\": 0.3}}}")
+    parser.add_argument('--output', default=SCENARIOS_OUTPUT_PATH,
+                        help="Where to write the weekly series of every scenario")
+    args = parser.parse_args()
+
+    with open(args.candidates, 'r') as f:
+        candidates = json.load(f)
+    with open(STATIC_DATA_PATH, 'r') as f:
+        static_data = json.load(f)
+    with open(PROJECTS_ADMIN_PATH, 'r') as f:
+        projects_admin_data = json.load(f)
+    ticket_df = cached_frame(TICKET_DATA_PATH, load_ticket_data, FRAME_CACHE_DIR, FRAME_CACHE_MAX_BYTES)
+    timesheet_df = cached_frame(TIMESHEET_DATA_PATH, load_timesheet_data, FRAME_CACHE_DIR, FRAME_CACHE_MAX_BYTES)
+
+    started = time.perf_counter()
+    status_scenarios = StatusScenarios(ticket_df, timesheet_df, static_data, projects_admin_data)
+    built = time.perf_counter()
+    scenarios = dict({CURRENT_SCENARIO: {}}, **candidates)
+    results = status_scenarios.evaluate(scenarios)
+    evaluated = time.perf_counter()
+    print(f"Built in {built - started:.2f}s, evaluated {len(scenarios)} scenarios in {evaluated - built:.3f}s")
+
+    print_latest(scenarios, results, status_scenarios.project_names())
+    write_json_atomic(args.output, status_scenarios.comparison(results), indent=4)
+    print(f"Scenario series written to {args.output}")
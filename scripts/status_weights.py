@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+
+def compile_weight_table(static_data, projects, statuses):
+    """Builds a (project, status) -> weight matrix from static_data.json.
+
+    A project with its own table in static_data uses it; any other project
+    falls back to the 'default' table. A status missing from the table that
+    applies gets 0.0 and is flagged in the returned `known` mask.
+
+    One extra row and column are appended for missing project names and
+    statuses, so pandas' -1 codes index them directly.
+    """
+    default_weights = static_data.get('default', {})
+    weights = np.zeros((len(projects) + 1, len(statuses) + 1))
+    known = np.zeros((len(projects) + 1, len(statuses) + 1), dtype=bool)
+    for i, project_name in enumerate(list(projects) + [None]):
+        table = static_data.get(project_name, default_weights) if project_name is not None else default_weights
+        for j, status in enumerate(statuses):
+            if status in table:
+                weights[i, j] = table[status]
+                known[i, j] = True
+    return weights, known
+
+
+def map_status_weights(ticket_df, static_data):
+    """Returns the status weight of every ticket row, plus the rows whose status has no weight.
+
+    The weights are looked up for the distinct (project, status) pairs only and
+    then gathered for the whole frame by their integer codes. Unknown statuses
+    are returned as a dict mapping (project_name, current_status) -> row count.
+    """
+    project_codes, projects = pd.factorize(ticket_df['project_name'])
+    status_codes, statuses = pd.factorize(ticket_df['current_status'])
+    projects, statuses = list(projects), list(statuses)
+    weights, known = compile_weight_table(static_data, projects, statuses)
+    row_weights = weights[project_codes, status_codes]
+
+    unknown_rows = ~known[project_codes, status_codes]
+    unknown = {}
+    if unknown_rows.any():
+        # Move the -1 codes of missing values onto the extra row/column
+        project_index = np.where(project_codes < 0, len(projects), project_codes)[unknown_rows]
+        status_index = np.where(status_codes < 0, len(statuses), status_codes)[unknown_rows]
+        pairs = project_index.astype('int64') * (len(statuses) + 1) + status_index
+        pair_values, counts = np.unique(pairs, return_counts=True)
+        for pair, count in zip(pair_values, counts):
+            project_code, status_code = divmod(int(pair), len(statuses) + 1)
+            project_name = (projects + [None])[project_code]
+            status = (statuses + [None])[status_code]
+            unknown[(project_name, status)] = int(count)
+    return row_weights, unknown
+
+
+def report_unknown_statuses(unknown):
+    """Prints one summary line per status that was weighted as 0.0 for lack of a weight."""
+    if not unknown:
+        return
+    total = sum(unknown.values())
+    print(f"Warning: {total} ticket rows have a status without a weight and count as 0.0:")
+    for (project_name, status), count in sorted(unknown.items(), key=lambda item: -item[1]):
+        print(f"  - {status!r} in project {project_name!r}: {count} rows")
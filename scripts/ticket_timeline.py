@@ -0,0 +1,113 @@
+import numpy as np
+
+
+def _as_ns(values):
+    return np.asarray(values, dtype='datetime64[ns]').view('int64')
+
+
+class TicketTimeline:
+    """Status-change rows grouped into segments and sorted by changed date.
+
+    A segment is one ticket (or one ticket within one project / assignee).
+    Events are stored sorted by (segment, changed date, file row), with
+    `offsets[s]:offsets[s + 1]` being segment s. Rows without a changed date
+    sort last and are never part of an as-of view.
+
+    Besides the file row of every event, the running minimum and maximum file
+    row inside each segment are kept, so that for any prefix of a segment's
+    history (everything changed on or before some date) the first and last
+    row in file order are a single array read.
+
+    "As of date D" lookups are a binary search on one sorted key array, for
+    any number of segments at once.
+    """
+
+    ARRAYS = ('rows', 'keys', 'offsets', 'first_rows', 'last_rows', 'dates')
+
+    def __init__(self, rows, keys, offsets, first_rows, last_rows, dates):
+        self.rows = rows
+        self.keys = keys
+        self.offsets = offsets
+        self.first_rows = first_rows
+        self.last_rows = last_rows
+        self.dates = dates
+
+    @classmethod
+    def build(cls, segment_codes, changed, n_segments):
+        """Builds the timeline of every row with a segment code >= 0.
+
+        `changed` holds the changed date of every row (NaT allowed).
+        """
+        changed = _as_ns(changed)
+        rows = np.flatnonzero(segment_codes >= 0)
+        segments = segment_codes[rows].astype('int64')
+        row_changed = changed[rows]
+        missing = row_changed == np.iinfo('int64').min
+
+        # Dates are replaced by their rank among the distinct dates, so that
+        # (segment, date) fits a single sortable integer key
+        dates = np.unique(row_changed[~missing])
+        ranks = np.where(missing, len(dates), np.searchsorted(dates, row_changed))
+        order = np.lexsort((rows, ranks, segments))
+        rows, segments, ranks = rows[order], segments[order], ranks[order]
+        keys = segments * (len(dates) + 1) + ranks
+        offsets = np.searchsorted(segments, np.arange(n_segments + 1))
+
+        # Running min / max of the file row, restarting at every segment: later
+        # segments get a larger (max) or smaller (min) base so nothing leaks across
+        span = len(segment_codes) + 1
+        last_rows = np.maximum.accumulate(segments * span + rows) - segments * span
+        first_base = (n_segments - segments) * span
+        first_rows = np.minimum.accumulate(first_base + rows) - first_base
+        return cls(rows, keys, offsets, first_rows, last_rows, dates)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(*(arrays[name] for name in cls.ARRAYS))
+
+    def arrays(self):
+        """Returns the backing arrays by name, e.g. to share them with other processes."""
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def counts_as_of(self, date, segments):
+        """Number of events of each segment changed on or before `date`."""
+        known_dates = np.searchsorted(self.dates, _as_ns(date), side='right')
+        queries = segments * (len(self.dates) + 1) + known_dates
+        return np.searchsorted(self.keys, queries, side='left') - self.offsets[segments]
+
+    def as_of(self, date, segments):
+        """Looks up every segment as of `date`.
+
+        Returns (present, latest_rows, first_rows, last_rows): whether the
+        segment has any event changed on or before `date`, the file row of the
+        latest such event (by changed date, then file row), and the first and
+        last such row in file order. Rows are -1 where nothing is present.
+        """
+        segments = np.asarray(segments, dtype='int64')
+        counts = self.counts_as_of(date, segments)
+        present = counts > 0
+        positions = np.where(present, self.offsets[segments] + counts - 1, 0)
+        if len(self.rows) == 0:
+            missing = np.full(len(segments), -1)
+            return present, missing, missing, missing
+        return (
+            present,
+            np.where(present, self.rows[positions], -1),
+            np.where(present, self.first_rows[positions], -1),
+            np.where(present, self.last_rows[positions], -1),
+        )
+
+    def first_rows_overall(self, segments):
+        """First file row of each segment over its whole history, dated or not (-1 if empty)."""
+        segments = np.asarray(segments, dtype='int64')
+        ends = self.offsets[segments + 1]
+        present = ends > self.offsets[segments]
+        if len(self.rows) == 0:
+            return np.full(len(segments), -1)
+        return np.where(present, self.first_rows[np.maximum(ends - 1, 0)], -1)
+
+    def segment_events(self, segment_start, segment_end):
+        """Returns (segment, file row) of every event of a contiguous range of segments."""
+        start, end = self.offsets[segment_start], self.offsets[segment_end]
+        counts = np.diff(self.offsets[segment_start:segment_end + 1])
+        return np.repeat(np.arange(segment_start, segment_end), counts), self.rows[start:end]
@@ -0,0 +1,96 @@
+from datetime import date, datetime
+
+import numpy as np
+
+WEEKDAY_NAMES = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+DEFAULT_WEEKENDS = ['saturday', 'sunday']
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def _weekday_index(day):
+    """Accepts a weekday as 0-6 (Monday = 0) or by name."""
+    if isinstance(day, int):
+        return day
+    return WEEKDAY_NAMES.index(str(day).strip().lower())
+
+
+class WorkCalendar:
+    """Cumulative working-day index over a fixed date span.
+
+    Built once per run; the number of working days between any two dates is
+    then a difference of two entries of a cumulative array, so whole vectors of
+    week ranges can be answered at once.
+
+    Two configurations are understood:
+    - `studio_annual_config` (what studio_config.json ships): weekdays minus
+      `weekends` and the per-year `holidays` are working days. When a year also
+      has an entry in `working_days`, that annual count is authoritative and is
+      spread evenly over the year's working days, so the cumulative count hits
+      it exactly on December 31st.
+    - a legacy top-level `working_days` list of 'YYYY-MM-DD' dates, where only
+      the listed dates count.
+    """
+
+    def __init__(self, studio_config, first_day, last_day):
+        self.first_day = _to_date(first_day)
+        self.last_day = _to_date(last_day)
+        days = np.arange(
+            np.datetime64(self.first_day, 'D'), np.datetime64(self.last_day, 'D') + 1
+        )
+
+        explicit_days = studio_config.get('working_days')
+        if isinstance(explicit_days, list):
+            listed = np.unique(np.array(explicit_days, dtype='datetime64[D]'))
+            weights = np.isin(days, listed).astype(float)
+        else:
+            weights = self._annual_weights(studio_config.get('studio_annual_config', {}), days)
+
+        # cumulative[i] = working days strictly before days[i]
+        self.cumulative = np.concatenate([[0.0], np.cumsum(weights)])
+
+    @staticmethod
+    def _annual_weights(annual_config, days):
+        weekends = [_weekday_index(day) for day in annual_config.get('weekends', DEFAULT_WEEKENDS)]
+        # numpy counts weekdays from Monday = 0, with 1970-01-01 being a Thursday
+        weekdays = (days.astype('int64') + 3) % 7
+        working = ~np.isin(weekdays, weekends)
+
+        holidays = annual_config.get('holidays', {})
+        all_holidays = [holiday for year_holidays in holidays.values() for holiday in year_holidays]
+        if all_holidays:
+            working &= ~np.isin(days, np.array(all_holidays, dtype='datetime64[D]'))
+
+        weights = working.astype(float)
+        years = days.astype('datetime64[Y]').astype(int) + 1970
+        for year, annual_days in annual_config.get('working_days', {}).items():
+            year = int(year)
+            year_working = np.busday_count(
+                np.datetime64(f'{year}-01-01'), np.datetime64(f'{year + 1}-01-01'),
+                weekmask=[0 if i in weekends else 1 for i in range(7)],
+                holidays=holidays.get(str(year), []),
+            )
+            if year_working > 0:
+                weights[(years == year) & working] = annual_days / year_working
+        return weights
+
+    def _index(self, dates, side):
+        values = np.asarray(dates, dtype='datetime64[D]')
+        offsets = (values - np.datetime64(self.first_day, 'D')).astype('int64')
+        if side == 'end':
+            offsets = offsets + 1
+        return np.clip(offsets, 0, len(self.cumulative) - 1)
+
+    def working_days_between(self, start_dates, end_dates):
+        """Number of working days from start to end (both inclusive), vectorized.
+
+        Dates outside the calendar's span are clamped to it.
+        """
+        counts = self.cumulative[self._index(end_dates, 'end')] - self.cumulative[self._index(start_dates, 'start')]
+        return np.maximum(counts, 0.0)